@@ -4,20 +4,32 @@ Main entry point for the exam management system
 Supports offline mode and web deployment
 """
 
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for, send_file, flash
+from flask import Flask, render_template, request, jsonify, session, redirect, url_for, send_file, flash, Response, g
 from werkzeug.middleware.proxy_fix import ProxyFix
 from functools import wraps
+import atexit
 import json
 import os
-import zipfile
-from io import BytesIO
 from datetime import datetime
 import time
 from config import app_config
 from services.auth_service import AuthService
 from services.file_service import FileService
 from services.exam_session_service import ExamSessionManager
+from services.exam_session_store import ExamSessionStore, ExamIdSequence
+from services.exam_events_service import ExamEventBroadcaster
+from services.autosave_service import AutosaveWriter
 from services.exam_builder_service import ExamBuilder
+from services.exam_cache_service import exam_cache
+from services.results_writer_service import results_writer
+from services.results_index_service import ResultsIndex, split_folder_name
+from services.zip_stream_service import ZipArchiveCache, list_zip_entries, content_disposition
+from services.translation_service import translation_registry, RESULTS_PAGE_STRINGS
+from services.results_page_service import results_page_renderer
+from services.language_service import detect_language
+from services.regrade_service import RegradeJob, RegradeJobs, grades_score_text
+from services.submission_log import build_submission_record, dumps_record, submissions_path, iter_submissions
+from services.item_stats_service import ItemStatsStore, discrimination_index
 
 # Initialize Flask app
 app = Flask(__name__)
@@ -31,7 +43,21 @@ app.wsgi_app = ProxyFix(
 # Initialize services
 auth_service = AuthService()
 file_service = FileService()
-exam_session_manager = ExamSessionManager()
+exam_session_manager = ExamSessionManager(
+    store=ExamSessionStore() if app_config.PERSIST_EXAM_SESSIONS else None,
+    id_sequence=None if app_config.PERSIST_EXAM_SESSIONS else ExamIdSequence(),
+    retention_seconds=app_config.ENDED_SESSION_RETENTION_SECONDS
+)
+exam_events = ExamEventBroadcaster(store=exam_session_manager.store)
+autosave_writer = AutosaveWriter(store=exam_session_manager.store,
+                                 flush_interval=app_config.AUTOSAVE_FLUSH_SECONDS)
+atexit.register(autosave_writer.close)
+results_index = ResultsIndex()
+item_stats = ItemStatsStore()
+zip_cache = ZipArchiveCache()
+regrade_jobs = RegradeJobs(app_config.REGRADE_JOBS_DIR)
+# Replays result writes a crashed worker had queued (before any new submit)
+results_writer.enable_journal(app_config.RESULTS_JOURNAL_DIR)
 
 # ==========================================
 # HELPER FUNCTIONS
@@ -50,7 +76,13 @@ def login_required(f):
 def get_current_user():
     """Get current logged in user"""
     if 'user_id' in session:
-        return auth_service.get_user(session['user_id'])
+        # NEW v5: Looked up once per request (views + inject_user share it)
+        # REMARK: Previously every call queried SQLite
+        if g.get('current_user_id') != session['user_id']:
+            g.current_user = auth_service.get_user(session['user_id'])
+            g.current_user_id = session['user_id']
+        # A copy per caller - one view editing its dict must not change another's
+        return dict(g.current_user) if g.current_user is not None else None
     return None
 
 
@@ -347,48 +379,27 @@ def api_get_results():
         
         results_folders = []
         
-        if os.path.exists(teacher_results_dir):
-            # Scan all folders in teacher's results directory
-            for folder_name in os.listdir(teacher_results_dir):
-                folder_path = os.path.join(teacher_results_dir, folder_name)
-                
-                if os.path.isdir(folder_path):
-                    # Check if GRADES.txt exists (confirms it's a results folder)
-                    grades_file = os.path.join(folder_path, 'GRADES.txt')
-                    all_exams_file = os.path.join(folder_path, 'All_Exams.txt')
-                    
-                    if os.path.exists(grades_file):
-                        # Parse folder name: "ExamName YYYY-MM-DD HH-MM"
-                        parts = folder_name.rsplit(' ', 2)  # Split from right, max 2 splits
-                        if len(parts) >= 3:
-                            exam_name = ' '.join(parts[:-2])
-                            exam_date = parts[-2]  # YYYY-MM-DD
-                            exam_time = parts[-1]  # HH-MM
-                        else:
-                            exam_name = folder_name
-                            exam_date = ''
-                            exam_time = ''
-                        
-                        # Count students from GRADES.txt
-                        student_count = 0
-                        if os.path.exists(grades_file):
-                            with open(grades_file, 'r', encoding='utf-8') as f:
-                                student_count = len([line for line in f if line.strip()])
-                        
-                        # Get folder stats
-                        html_files = [f for f in os.listdir(folder_path) if f.endswith('.html')]
-                        
-                        results_folders.append({
-                            'folder_name': folder_name,
-                            'exam_name': exam_name,
-                            'exam_date': exam_date,
-                            'exam_time': exam_time,
-                            'student_count': student_count,
-                            'html_count': len(html_files),
-                            'has_grades': os.path.exists(grades_file),
-                            'has_all_exams': os.path.exists(all_exams_file),
-                            'teacher_id': teacher_id
-                        })
+        # NEW v5: Counts come from the results index (no GRADES.txt reads, no per-folder listdir)
+        # REMARK: Previously every folder was listed and its GRADES.txt re-read on each request
+        for entry in results_index.list_folders(teacher_id, teacher_results_dir):
+            # Only folders with GRADES.txt are results folders
+            if not entry['has_grades']:
+                continue
+            
+            # Parse folder name: "ExamName YYYY-MM-DD HH-MM"
+            exam_name, exam_date, exam_time = split_folder_name(entry['folder_name'])
+            
+            results_folders.append({
+                'folder_name': entry['folder_name'],
+                'exam_name': exam_name,
+                'exam_date': exam_date,
+                'exam_time': exam_time,
+                'student_count': entry['student_count'],
+                'html_count': entry['html_count'],
+                'has_grades': entry['has_grades'],
+                'has_all_exams': entry['has_all_exams'],
+                'teacher_id': teacher_id
+            })
         
         # Sort by date/time (newest first)
         results_folders.sort(key=lambda x: f"{x.get('exam_date', '')} {x.get('exam_time', '')}", reverse=True)
@@ -562,27 +573,12 @@ def api_download_folder_zip(folder_name):
         if not os.path.exists(folder_path):
             return "Folder not found", 404
         
-        # Create ZIP in memory
-        memory_file = BytesIO()
-        with zipfile.ZipFile(memory_file, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            # Walk through the folder and add all files
-            for root, dirs, files in os.walk(folder_path):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    arcname = os.path.relpath(file_path, folder_path)
-                    zipf.write(file_path, arcname)
-        
-        memory_file.seek(0)
-        
         # Generate ZIP filename
         zip_filename = f"{folder_name}.zip"
         
-        return send_file(
-            memory_file,
-            mimetype='application/zip',
-            as_attachment=True,
-            download_name=zip_filename
-        )
+        # NEW v5: Streamed (bounded memory) and cached until a file in the folder changes
+        # REMARK: Previously the whole archive was built in BytesIO before sending
+        return send_zip(folder_path, zip_filename)
     
     except Exception as e:
         import traceback
@@ -608,29 +604,12 @@ def api_download_all_folders_zip():
         if not os.path.exists(results_path):
             return "No results found", 404
         
-        # Create ZIP in memory
-        memory_file = BytesIO()
-        with zipfile.ZipFile(memory_file, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            # Walk through all folders in results
-            for root, dirs, files in os.walk(results_path):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    # Create archive name relative to results folder
-                    arcname = os.path.relpath(file_path, results_path)
-                    zipf.write(file_path, arcname)
-        
-        memory_file.seek(0)
-        
         # Generate ZIP filename with timestamp
         timestamp = datetime.now().strftime('%Y-%m-%d_%H-%M')
         zip_filename = f"All_Results_{timestamp}.zip"
         
-        return send_file(
-            memory_file,
-            mimetype='application/zip',
-            as_attachment=True,
-            download_name=zip_filename
-        )
+        # NEW v5: Streamed entry by entry instead of building in memory
+        return send_zip(results_path, zip_filename)
     
     except Exception as e:
         import traceback
@@ -638,6 +617,125 @@ def api_download_all_folders_zip():
         return f"Error creating ZIP: {str(e)}", 500
 
 
+@app.route('/api/results/<folder_name>/regrade', methods=['POST'])
+@login_required
+def api_regrade_result_folder(folder_name):
+    """
+    Re-score all submissions of a results folder with the current exam file
+    Optional JSON: {"exam_filename": "..."} (default: exam name from the folder name)
+    Runs in the background - returns 202 with a job id; poll /api/results/regrade-jobs/<job_id>
+    for the diff report of changed grades
+    """
+    try:
+        user = get_current_user()
+        teacher_id = f"teacher_{user['id']}"
+        
+        folder_path = os.path.join(
+            app_config.TEACHERS_DIR,
+            teacher_id,
+            'results',
+            folder_name
+        )
+        
+        if not os.path.exists(os.path.join(folder_path, 'All_Exams.txt')):
+            return jsonify({'success': False, 'message': 'No submissions in this folder'}), 404
+        
+        data = request.get_json(silent=True) or {}
+        exam_filename = str(data.get('exam_filename') or split_folder_name(folder_name)[0] + '.txt')
+        # Security: the exam must be one of this teacher's files (no path traversal)
+        safe_filename = exam_filename.replace('\\', '').replace('/', '').replace('\0', '').replace('..', '')
+        if not safe_filename or safe_filename != exam_filename:
+            return jsonify({'success': False, 'message': 'Invalid exam filename'}), 400
+        exam_path = get_exam_path(teacher_id, exam_filename)
+        if not os.path.exists(exam_path):
+            return jsonify({'success': False, 'message': f'Exam file not found: {exam_filename}'}), 404
+        
+        compiled = exam_cache.get(exam_path, ExamBuilder.compile_exam_file)
+        job = RegradeJob(
+            folder_path,
+            compiled['question_answer_dict'],
+            translation_registry.resolve_table(compiled['language'], 'results_page', RESULTS_PAGE_STRINGS),
+            max_workers=app_config.REGRADE_MAX_WORKERS,
+            chunk_size=app_config.REGRADE_CHUNK_SIZE
+        )
+        
+        def run():
+            # GRADES.txt is replaced on the results writer thread - no submit can append in between
+            report = job.run(results_writer)
+            if os.path.exists(submissions_path(folder_path)):
+                results_writer.call(
+                    lambda: item_stats.rebuild(teacher_id, folder_name, iter_submissions(folder_path))
+                ).result()
+            return report
+        
+        # NEW v5: Large folders take minutes - graded in the background, the client polls
+        # REMARK: Previously the request held a worker until the whole folder was regraded
+        job_id = regrade_jobs.start(teacher_id, folder_name, run)
+        return jsonify({'success': True, 'exam_filename': exam_filename, 'job_id': job_id,
+                        'status_url': url_for('api_regrade_job', job_id=job_id)}), 202
+    
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+
+@app.route('/api/results/regrade-jobs/<job_id>')
+@login_required
+def api_regrade_job(job_id):
+    """Status of a regrade: running, done (with the report) or failed (with a message)"""
+    user = get_current_user()
+    status = regrade_jobs.get(f"teacher_{user['id']}", job_id)
+    if status is None:
+        return jsonify({'success': False, 'message': 'Regrade job not found'}), 404
+    status.pop('teacher_id')
+    return jsonify({'success': True, **status})
+
+
+@app.route('/api/results/<folder_name>/stats')
+@login_required
+def api_result_folder_stats(folder_name):
+    """
+    Item analysis of a results folder: difficulty, discrimination and option counts per question
+    Served from live counters (updated on every submit); ?full=1 adds the upper-lower
+    discrimination index computed from submissions.jsonl
+    """
+    try:
+        user = get_current_user()
+        teacher_id = f"teacher_{user['id']}"
+        
+        folder_path = os.path.join(
+            app_config.TEACHERS_DIR,
+            teacher_id,
+            'results',
+            folder_name
+        )
+        
+        if not os.path.exists(folder_path):
+            return jsonify({'success': False, 'message': 'Folder not found'}), 404
+        
+        stats = item_stats.get_stats(teacher_id, folder_name)
+        has_log = os.path.exists(submissions_path(folder_path))
+        if stats['summary']['submissions'] == 0 and has_log:
+            # Counters missing (folder from before them) - built once from the log
+            results_writer.call(
+                lambda: item_stats.rebuild(teacher_id, folder_name, iter_submissions(folder_path))
+            ).result()
+            stats = item_stats.get_stats(teacher_id, folder_name)
+        
+        if request.args.get('full') and has_log:
+            index = discrimination_index(iter_submissions(folder_path))
+            for item in stats['items']:
+                item['discrimination_index'] = index.get(item['question'])
+        
+        return jsonify({'success': True, 'folder_name': folder_name, **stats})
+    
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+
 @app.route('/api/results/<folder_name>/delete', methods=['DELETE'])
 @login_required
 def api_delete_result_folder(folder_name):
@@ -660,6 +758,10 @@ def api_delete_result_folder(folder_name):
         # Delete the folder and all its contents
         import shutil
         shutil.rmtree(folder_path)
+        results_index.folder_deleted(teacher_id, folder_name)
+        item_stats.folder_deleted(teacher_id, folder_name)
+        zip_cache.invalidate(folder_path)
+        zip_cache.invalidate(os.path.dirname(folder_path))  # "Download all" archive
         
         return jsonify({'success': True, 'message': 'Folder deleted successfully'})
     
@@ -695,7 +797,11 @@ def api_delete_all_result_folders():
             item_path = os.path.join(results_path, item)
             if os.path.isdir(item_path):
                 shutil.rmtree(item_path)
+                zip_cache.invalidate(item_path)
                 deleted_count += 1
+        results_index.teacher_cleared(teacher_id)
+        item_stats.teacher_cleared(teacher_id)
+        zip_cache.invalidate(results_path)
         
         return jsonify({
             'success': True, 
@@ -756,32 +862,21 @@ def api_check_existing_folders():
         
         existing_folders = []
         
-        if os.path.exists(teacher_results_dir):
-            for folder_name in os.listdir(teacher_results_dir):
-                folder_path = os.path.join(teacher_results_dir, folder_name)
-                
-                if os.path.isdir(folder_path):
-                    # Check if folder starts with exam title
-                    if folder_name.startswith(exam_title + ' '):
-                        # Parse folder: "ExamName YYYY-MM-DD HH-MM"
-                        parts = folder_name.rsplit(' ', 2)
-                        if len(parts) >= 3:
-                            date_part = parts[-2]  # YYYY-MM-DD
-                            time_part = parts[-1]  # HH-MM
-                            
-                            # Count students
-                            grades_file = os.path.join(folder_path, 'GRADES.txt')
-                            student_count = 0
-                            if os.path.exists(grades_file):
-                                with open(grades_file, 'r', encoding='utf-8') as f:
-                                    student_count = len([line for line in f if line.strip()])
-                            
-                            existing_folders.append({
-                                'folder_name': folder_name,
-                                'date': date_part,
-                                'time': time_part.replace('-', ':'),
-                                'student_count': student_count
-                            })
+        # NEW v5: Answered from the results index
+        # REMARK: Previously scanned the results dir and re-read every GRADES.txt
+        for entry in results_index.list_folders(teacher_id, teacher_results_dir):
+            folder_name = entry['folder_name']
+            # Check if folder starts with exam title
+            if folder_name.startswith(exam_title + ' '):
+                # Parse folder: "ExamName YYYY-MM-DD HH-MM"
+                _, date_part, time_part = split_folder_name(folder_name)
+                if date_part:
+                    existing_folders.append({
+                        'folder_name': folder_name,
+                        'date': date_part,
+                        'time': time_part.replace('-', ':'),
+                        'student_count': entry['student_count']
+                    })
         
         # Sort by date/time (newest first)
         existing_folders.sort(key=lambda x: f"{x['date']} {x['time']}", reverse=True)
@@ -835,6 +930,10 @@ def start_exam_with_settings():
         # Handle results folder
         exam_session = exam_session_manager.get_session(exam_id)
         if exam_session:
+            # NEW v5: Compile exam once for the whole session
+            # REMARK: Previously every student request re-parsed (and re-shuffled) the file
+            get_session_exam(exam_session)
+            
             if append_to_folder:
                 # Append to existing folder
                 results_folder = os.path.join(
@@ -844,16 +943,16 @@ def start_exam_with_settings():
                     append_to_folder
                 )
                 if os.path.exists(results_folder):
-                    exam_session.results_folder = results_folder
+                    exam_session.set_results_folder(results_folder)
                     print(f"Appending to existing folder: {results_folder}")
                 else:
                     # Fallback: create new if folder doesn't exist
                     results_folder = create_exam_results_folder(teacher_id, exam_title, exam_session.exam_filename)
-                    exam_session.results_folder = results_folder
+                    exam_session.set_results_folder(results_folder)
             else:
                 # Create new results folder
                 results_folder = create_exam_results_folder(teacher_id, exam_title, exam_session.exam_filename)
-                exam_session.results_folder = results_folder
+                exam_session.set_results_folder(results_folder)
         
         # Generate monitor URL
         monitor_url = url_for('exam_monitor', exam_id=exam_id)
@@ -923,16 +1022,12 @@ def student_exam_session(exam_id):
     
     # TRANSLATION FIX v1: Determine exam language from exam content
     # REMARK: Previously no language detection - used localStorage (dashboard language)
-    exam_dir = os.path.join(app_config.TEACHERS_DIR, exam_session.teacher_id, 'exams')
-    exam_path = os.path.join(exam_dir, exam_session.exam_filename)
-    
     try:
         # FIXED v3: Always use detect_exam_language() with percentage threshold
         # Previously: Used text_direction from ExamBuilder which could be wrong
-        # Now: Direct language detection from content with 5% threshold
-        with open(exam_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        exam_language = detect_exam_language(content)  # Returns 'ru', 'en', or 'he' with 5% threshold
+        # NEW v5: Language detected once per exam version and kept with the compiled exam
+        # REMARK: Previously the exam file was read and scanned on every page load
+        exam_language = get_session_exam(exam_session).get('language', 'en')
     except Exception as e:
         print(f"Error detecting exam language: {e}")
         exam_language = 'en'  # Fallback to English
@@ -962,14 +1057,13 @@ def get_translations(language):
         language = app_config.DEFAULT_LANGUAGE
     
     try:
-        translations_path = os.path.join(
-            app_config.DATA_DIR,
-            'translations',
-            f'{language}.json'
-        )
-        with open(translations_path, 'r', encoding='utf-8') as f:
-            translations = json.load(f)
-        return jsonify(translations)
+        # NEW v5: Served from the translation registry with ETag - unchanged bundles get 304
+        # REMARK: Previously the JSON file was read and parsed on every request
+        bundle = translation_registry.get_bundle(language)
+        response = app.response_class(bundle.body, mimetype='application/json')
+        response.set_etag(bundle.etag)
+        response.headers['Cache-Control'] = 'no-cache'  # Always revalidate (hot-reload on edit)
+        return response.make_conditional(request)
     except Exception as e:
         print(f"Error loading translations: {e}")
         return jsonify({}), 500
@@ -987,35 +1081,10 @@ def detect_exam_language(content):
     Example: Russian manual with Hebrew word "עברית" stays Russian, not Hebrew.
     
     Returns: 'he' for Hebrew, 'ru' for Russian, 'en' for English
+    NEW v5: Same engine as ExamBuilder.detect_language (services/language_service.py)
+    REMARK: Previously a separate per-character loop duplicated here
     """
-    if not content or len(content) == 0:
-        return 'en'
-    
-    hebrew_count = 0
-    russian_count = 0
-    total_chars = len(content)
-    
-    for char in content:
-        # Hebrew Unicode range: U+0590 to U+05FF
-        if "\u0590" <= char <= "\u05FF":
-            hebrew_count += 1
-        # Russian Cyrillic range: U+0400 to U+04FF
-        elif "\u0400" <= char <= "\u04FF":
-            russian_count += 1
-    
-    # Calculate percentages
-    hebrew_percent = (hebrew_count / total_chars) * 100
-    russian_percent = (russian_count / total_chars) * 100
-    
-    # Threshold: at least 5% of text must be in that language
-    THRESHOLD = 5.0
-    
-    if hebrew_percent >= THRESHOLD:
-        return 'he'  # RTL язык, требует CSS dir="rtl"
-    elif russian_percent >= THRESHOLD:
-        return 'ru'  # LTR язык
-    else:
-        return 'en'  # LTR язык (по умолчанию)
+    return detect_language(content)
 
 
 @app.route('/api/exam/<exam_filename>')
@@ -1035,8 +1104,8 @@ def get_exam(exam_filename):
                 # Parse exam questions
                 questions = parse_exam_questions(content)
                 
-                # Detect language
-                language = detect_exam_language(content)
+                # Detect language (cached per exam file version)
+                language = exam_cache.get(filepath, ExamBuilder.compile_exam_file)['language']
                 
                 return jsonify({
                     'success': True,
@@ -1222,6 +1291,7 @@ def upload_exam():
         
         # Save file
         file.save(filepath)
+        exam_cache.invalidate(filepath)
         
         return jsonify({
             'success': True,
@@ -1264,6 +1334,7 @@ def delete_exam(filename):
         
         if os.path.exists(filepath):
             os.remove(filepath)
+            exam_cache.invalidate(filepath)
             return jsonify({'success': True, 'message': 'Exam deleted'})
         else:
             return jsonify({'success': False, 'message': 'File not found'}), 404
@@ -1302,6 +1373,8 @@ def upload_exam_overwrite():
         
         # Save file (overwrite if exists)
         file.save(filepath)
+        # NEW v5: Drop parsed copy so the next student gets the new version
+        exam_cache.invalidate(filepath)
         
         return jsonify({
             'success': True,
@@ -1331,9 +1404,9 @@ def get_exam_source(filename):
             with open(filepath, 'r', encoding='utf-8') as f:
                 content = f.read()
             
-            # Detect language
-            from services.exam_builder_service import ExamBuilder
-            language = ExamBuilder.detect_language(content)
+            # NEW v5: Language from the exam cache (detected once per file version)
+            # REMARK: Previously the content was scanned again on every GET
+            language = exam_cache.get(filepath, ExamBuilder.compile_exam_file)['language']
             
             return jsonify({
                 'success': True,
@@ -1360,6 +1433,9 @@ def get_exam_source(filename):
             with open(filepath, 'w', encoding='utf-8') as f:
                 f.write(new_content)
             
+            # NEW v5: Drop parsed copy; running exams see the new file version and recompile
+            exam_cache.invalidate(filepath)
+            
             print(f"Exam file updated: {filename} by teacher_{session['user_id']}")
             
             return jsonify({
@@ -1388,12 +1464,11 @@ def get_exam_preview(filename):
         if not os.path.exists(filepath):
             return jsonify({'success': False, 'message': 'File not found'}), 404
         
-        with open(filepath, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
         # Parse exam without shuffling
         questions = ExamBuilder.parse_exam_file_for_preview(filepath, shuffle=False)
-        language = ExamBuilder.detect_language(content)
+        # NEW v5: Language from the exam cache (detected once per file version)
+        # REMARK: Previously the file was read a second time just to detect language
+        language = exam_cache.get(filepath, ExamBuilder.compile_exam_file)['language']
         
         return jsonify({
             'success': True,
@@ -1616,29 +1691,32 @@ def api_start_student(exam_id):
         if not exam_session:
             return jsonify({'success': False, 'message': 'Exam not found'}), 404
         
-        # Add student to session
-        student_session_id = exam_session_manager.add_student_to_exam(
-            exam_id, first_name, last_name
-        )
+        # NEW v5: Same browser (or a new one with the saved id) continues its autosaved attempt
+        # REMARK: Previously every start created a new student and in-progress answers were lost
+        student_session_id = data.get('student_session_id')
+        student = exam_session.find_resumable_student(student_session_id, first_name, last_name)
+        if student:
+            saved_answers, autosave_seq = autosave_writer.saved_answers(student_session_id, student)
+        else:
+            saved_answers, autosave_seq = {}, 0
+            # Add student to session
+            student_session_id = exam_session_manager.add_student_to_exam(
+                exam_id, first_name, last_name
+            )
         
-        # Get exam settings
-        settings = getattr(exam_session, 'settings', {})
-        max_questions = settings.get('max_questions', 1000)
-        shuffle = settings.get('shuffle_exam', False)
-        
-        # Load exam questions with settings
-        teacher_id = exam_session.teacher_id
-        exam_data = load_exam_questions(
-            teacher_id, 
-            exam_session.exam_filename,
-            max_questions=max_questions,
-            shuffle=shuffle
-        )
+        # NEW v5: Questions come from the session's compiled exam, ordered by the student's seed
+        # REMARK: Previously the exam file was parsed and shuffled here on every start
+        exam_session = exam_session_manager.get_session(exam_id)
+        get_session_exam(exam_session)
+        exam_data = exam_session.get_student_payload(student_session_id) or {'questions': [], 'text_direction': 'ltr'}
         
         return jsonify({
             'success': True,
             'student_session_id': student_session_id,
-            'exam_data': exam_data
+            'exam_data': exam_data,
+            'resumed': student is not None,
+            'saved_answers': saved_answers,
+            'autosave_seq': autosave_seq
         })
     
     except Exception as e:
@@ -1654,26 +1732,15 @@ def api_get_exam_questions(exam_id):
         if not exam_session:
             return jsonify({'success': False, 'message': 'Exam not found'}), 404
         
-        # Get exam settings
-        settings = getattr(exam_session, 'settings', {})
-        max_questions = settings.get('max_questions', 1000)
-        shuffle = settings.get('shuffle_exam', False)
-        
-        # Load exam questions using ExamBuilder
-        exam_data = load_exam_questions(
-            exam_session.teacher_id,
-            exam_session.exam_filename,
-            max_questions=max_questions,
-            shuffle=shuffle
-        )
-        
-        questions = exam_data.get('questions', []) if isinstance(exam_data, dict) else []
-        text_direction = exam_data.get('text_direction', 'ltr') if isinstance(exam_data, dict) else 'ltr'
+        # NEW v5: Same order as at start - payload cached per student_session_id
+        # REMARK: Previously re-parsed and re-shuffled, so a reload changed the order
+        get_session_exam(exam_session)
+        exam_data = exam_session.get_student_payload(request.args.get('student_session_id')) or {}
         
         return jsonify({
             'success': True,
-            'questions': questions,
-            'text_direction': text_direction
+            'questions': exam_data.get('questions', []),
+            'text_direction': exam_data.get('text_direction', 'ltr')
         })
     
     except Exception as e:
@@ -1681,6 +1748,46 @@ def api_get_exam_questions(exam_id):
         return jsonify({'success': False, 'message': str(e)}), 500
 
 
+@app.route('/api/exam/<int:exam_id>/autosave', methods=['POST'])
+def api_autosave_answers(exam_id):
+    """
+    Autosave in-progress answers
+    JSON: {"student_session_id": "...", "seq": 7, "answers": {question text: answer}} - changed answers only
+    seq increases with every request of the student; older deltas never overwrite newer answers
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        student_session_id = data.get('student_session_id')
+        seq = data.get('seq')
+        answers = data.get('answers')
+        
+        if not isinstance(seq, int) or isinstance(seq, bool) or seq < 1 or not isinstance(answers, dict):
+            return jsonify({'success': False, 'message': 'seq and answers are required'}), 400
+        if not all(isinstance(answer, str) and len(answer) <= app_config.AUTOSAVE_MAX_ANSWER_CHARS
+                   for answer in answers.values()):
+            return jsonify({'success': False, 'message': 'Invalid answer'}), 400
+        
+        exam_session = exam_session_manager.get_session(exam_id)
+        if not exam_session:
+            return jsonify({'success': False, 'message': 'Exam not found'}), 404
+        # NEW v5: Pause is enforced here, not only by the student page overlay
+        if exam_session.status == 'paused':
+            return jsonify({'success': False, 'message': 'Exam is paused', 'paused': True}), 409
+        
+        accepted = exam_session.autosave_answers(student_session_id, seq, answers)
+        if accepted is None:
+            return jsonify({'success': False, 'message': 'Exam already submitted'}), 409
+        
+        # Coalesced - written at most once per AUTOSAVE_FLUSH_SECONDS per student
+        autosave_writer.save(student_session_id, accepted)
+        
+        return jsonify({'success': True, 'seq': seq, 'accepted': len(accepted)})
+    
+    except Exception as e:
+        print(f"Error autosaving answers: {e}")
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+
 @app.route('/api/exam/<int:exam_id>/submit', methods=['POST'])
 def api_submit_exam(exam_id):
     """Student submits exam answers"""
@@ -1710,83 +1817,49 @@ def api_submit_exam(exam_id):
         student = exam_session.get_student(student_session_id)
         if not student:
             return jsonify({'success': False, 'message': 'Student not found'}), 404
+        if exam_session.status == 'paused':
+            return jsonify({'success': False, 'message': 'Exam is paused', 'paused': True}), 409
         
-        # Load full exam file for answer dictionary
-        exam_dir = os.path.join(app_config.TEACHERS_DIR, exam_session.teacher_id, 'exams')
-        exam_path = os.path.join(exam_dir, exam_session.exam_filename)
-        
-        full_exam_data = ExamBuilder.parse_exam_file(exam_path)
+        # NEW v5: Grade against the exam compiled for this session
+        # REMARK: Previously the exam file was parsed again on every submit
+        full_exam_data = get_session_exam(exam_session)
         question_answer_dict = full_exam_data.get('question_answer_dict', {})
         text_direction = full_exam_data.get('text_direction', 'ltr')
         
         # TRANSLATION FIX v3: Load translations for results page based on exam language
         # FIXED v3: Always use detect_exam_language() with percentage threshold
         # REMARK: Previously results were hard-coded in English, then used text_direction which could be wrong
-        # NOW: Direct language detection from content with 5% threshold
-        with open(exam_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        exam_language = detect_exam_language(content)  # Returns 'ru', 'en', or 'he' with 5% threshold
-        
-        # Load translations
-        translations_path = os.path.join(app_config.DATA_DIR, 'translations', f'{exam_language}.json')
-        try:
-            with open(translations_path, 'r', encoding='utf-8') as f:
-                translations = json.load(f)
-        except Exception as e:
-            print(f"Error loading translations: {e}")
-            # Fallback to English hard-coded text
-            translations = {
-                'exam_submitted_successfully': 'your exam was submitted successfully',
-                'your_answers': 'Your Answers:',
-                'your_grade_is': 'Your grade is'
-            }
-        
-        # Calculate score using ExamBuilder logic
-        score = ExamBuilder.calculate_score(answers, question_answer_dict)
+        # NEW v5: Language cached with the compiled exam (5% threshold, detected once)
+        # REMARK: Previously the exam file was read again on every submit to detect language
+        exam_language = full_exam_data.get('language', 'en')
         
-        # Build response HTML using questions student actually saw
-        # TRANSLATION FIX v3: Improved RTL support - use div instead of html tag
-        # REMARK: Previously used <html dir='rtl'> which didn't apply properly inside results-content div
-        if text_direction == 'rtl':
-            dir_attr = 'dir="rtl" style="text-align: right; direction: rtl;"'
-        else:
-            dir_attr = 'style="text-align: left;"'
-        
-        response_html = f"<div {dir_attr}>"
-        response_html += f"<h2>{first_name} {last_name}, {translations.get('exam_submitted_successfully', 'your exam was submitted successfully')}</h2>"
-        response_html += f"<h3>{translations.get('your_answers', 'Your Answers:')}</h3><ol>"
+        # NEW v5: Pre-resolved results page strings (English fallback built in)
+        # REMARK: Previously the translation file was loaded on every submission
+        translations = translation_registry.resolve_table(exam_language, 'results_page', RESULTS_PAGE_STRINGS)
         
-        # Loop through questions student saw (from client) in order
-        for question in questions_list:
-            question_text = question.get('text', '')
-            
-            # Find submitted answer for this question
-            submitted_answer = answers.get(question_text, 'No answer')
-            
-            # If exam is RTL (Hebrew), keep answers RTL too
-            # Otherwise, check if answer contains English and apply LTR
-            if text_direction == 'rtl':
-                align_dir = ""
-            else:
-                is_english = any(ord('A') <= ord(char) <= ord('z') for char in submitted_answer)
-                align_dir = "align='left' dir='ltr'" if is_english else ""
-            
-            response_html += f"<li><b>{question_text}</b><pre {align_dir}>{submitted_answer}</pre></li>"
+        # Calculate score using ExamBuilder logic
+        score = ExamBuilder.calculate_score(answers, question_answer_dict, full_exam_data.get('answer_key'))
         
-        # Add grade
         # TRANSLATION FIX v2: Use translated "Your grade is" text
         # REMARK: Previously "Your grade is" was hard-coded in English
         if score < 0:
-            grade_text = translations.get('open_exam_grade_pending', 'Unknown yet, exam will be evaluated later')
+            grade_text = translations['open_exam_grade_pending']
         else:
             grade_text = f"{score} %"
         
-        # TRANSLATION FIX v3: Close div instead of html/body tags
-        # REMARK: Previously closed with </body></html>
-        response_html += f"<h1>{translations.get('your_grade_is', 'Your grade is')} {grade_text}</h1></ol></div>"
+        # Build response HTML using questions student actually saw (in order)
+        # NEW v5: Precompiled template per language/direction, answers HTML-escaped; the one
+        # rendered string is both the response and the saved HTML file
+        # REMARK: Previously built with += per answer (quadratic copying for long code answers),
+        # and answers were inserted unescaped
+        response_html = results_page_renderer.render(
+            exam_language, text_direction, translations,
+            first_name, last_name, questions_list, answers, grade_text
+        )
         
         # Mark exam as completed
         exam_session.submit_student_exam(student_session_id, answers, score)
+        autosave_writer.discard(student_session_id)
         
         # Save results to files (HTML, GRADES.txt, All_Exams.txt)
         save_exam_results(exam_id, exam_session, student_session_id, student, score, answers, response_html, questions_list, device_info)
@@ -1834,28 +1907,28 @@ def api_get_active_exams():
         user = get_current_user()
         teacher_id = f"teacher_{user['id']}"
         
-        active_sessions = exam_session_manager.get_all_active_sessions()
+        # NEW v5: Only this teacher's active exams are looked up (teacher/status index)
+        # REMARK: Previously all sessions were listed and filtered by teacher here
+        active_sessions = exam_session_manager.get_active_sessions(teacher_id)
         
         exams_list = []
         base_url = request.url_root.rstrip('/')
         
         for exam_id, exam_session in active_sessions.items():
-            # Only show exams for this teacher
-            if exam_session.teacher_id == teacher_id:
-                students_summary = exam_session_manager.get_session_students_summary(exam_id)
-                
-                completed_count = sum(1 for s in students_summary if s['status'] == 'completed')
-                
-                exams_list.append({
-                    'exam_id': exam_id,
-                    'exam_title': exam_session.exam_title,
-                    'exam_filename': exam_session.exam_filename,
-                    'start_time': exam_session.start_time.isoformat(),
-                    'status': exam_session.status,
-                    'students_count': len(students_summary),
-                    'completed_count': completed_count,
-                    'student_url': f"{base_url}/exam/{exam_id}"
-                })
+            students_summary = exam_session_manager.get_session_students_summary(exam_id)
+            
+            completed_count = sum(1 for s in students_summary if s['status'] == 'completed')
+            
+            exams_list.append({
+                'exam_id': exam_id,
+                'exam_title': exam_session.exam_title,
+                'exam_filename': exam_session.exam_filename,
+                'start_time': exam_session.start_time.isoformat(),
+                'status': exam_session.status,
+                'students_count': len(students_summary),
+                'completed_count': completed_count,
+                'student_url': f"{base_url}/exam/{exam_id}"
+            })
         
         return jsonify({
             'success': True,
@@ -1883,8 +1956,11 @@ def api_end_exam(exam_id):
         if exam_session.teacher_id != teacher_id:
             return jsonify({'success': False, 'message': 'Not authorized'}), 403
         
-        # End the exam
-        exam_session.status = 'ended'
+        # End the exam (persisted so every worker sees it)
+        exam_session_manager.end_session(exam_id)
+        # NEW v5: Tell connected students right away
+        # REMARK: Previously students only noticed through the timer or a failed submit
+        exam_events.publish(exam_id, 'end')
         
         return jsonify({
             'success': True,
@@ -1900,6 +1976,139 @@ def api_end_exam(exam_id):
         return jsonify({'success': False}), 500
 
 
+@app.route('/api/exam/<int:exam_id>/control', methods=['POST'])
+@login_required
+def api_control_exam(exam_id):
+    """
+    Teacher controls a running exam: pause, resume, extend_time, announce
+    JSON: {"action": "...", "minutes": 10, "message": "..."}
+    Every action is pushed to connected students as an exam event
+    """
+    try:
+        exam_session = exam_session_manager.get_session(exam_id)
+        if not exam_session:
+            return jsonify({'success': False, 'message': 'Exam not found'}), 404
+        
+        user = get_current_user()
+        teacher_id = f"teacher_{user['id']}"
+        if exam_session.teacher_id != teacher_id:
+            return jsonify({'success': False, 'message': 'Not authorized'}), 403
+        if exam_session.status == 'ended':
+            return jsonify({'success': False, 'message': 'Exam already ended'}), 400
+        
+        data = request.get_json(silent=True) or {}
+        action = data.get('action')
+        
+        if action == 'pause':
+            exam_session.pause()
+            event = exam_events.publish(exam_id, 'pause')
+        elif action == 'resume':
+            exam_session.resume()
+            event = exam_events.publish(exam_id, 'resume')
+        elif action == 'extend_time':
+            try:
+                minutes = int(data.get('minutes', 0))
+            except (TypeError, ValueError):
+                minutes = 0
+            if not 1 <= minutes <= 600:
+                return jsonify({'success': False, 'message': 'Minutes must be between 1 and 600'}), 400
+            exam_duration = exam_session.extend_time(minutes)
+            event = exam_events.publish(exam_id, 'extend_time', {'minutes': minutes, 'exam_duration': exam_duration})
+        elif action == 'announce':
+            message = (data.get('message') or '').strip()
+            if not message or len(message) > 500:
+                return jsonify({'success': False, 'message': 'Message must be 1-500 characters'}), 400
+            event = exam_events.publish(exam_id, 'announcement', {'message': message})
+        else:
+            return jsonify({'success': False, 'message': 'Unknown action'}), 400
+        
+        return jsonify({'success': True, 'status': exam_session.status, 'event': event})
+    
+    except Exception as e:
+        print(f"Error controlling exam: {e}")
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+
+def long_request_seconds(requested, limit):
+    """Seconds a request may wait for changes - 0 unless long requests are enabled"""
+    if not app_config.LONG_REQUESTS_ENABLED:
+        return 0
+    return max(0, min(requested, limit))
+
+
+def format_sse(event_type, data, event_id=None):
+    """One Server-Sent Events message"""
+    message = f"event: {event_type}\n"
+    if event_id is not None:
+        message += f"id: {event_id}\n"
+    return message + f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@app.route('/api/exam/<int:exam_id>/events')
+def api_exam_events(exam_id):
+    """
+    Exam control events for students (end, pause, resume, extend_time, announcement)
+    Server-Sent Events stream; starts with a "state" message, resumes after Last-Event-ID
+    ?wait=<seconds>&after=<id> - long-poll JSON fallback for clients without EventSource
+    Without LONG_REQUESTS_ENABLED the stream sends what is pending and closes
+    (the browser reconnects after EXAM_EVENTS_POLL_SECONDS) - no worker is held open
+    """
+    exam_session = exam_session_manager.get_session(exam_id)
+    if not exam_session:
+        return jsonify({'success': False, 'message': 'Exam not found'}), 404
+    
+    after = request.headers.get('Last-Event-ID', request.args.get('after'))
+    try:
+        after = int(after)
+    except (TypeError, ValueError):
+        after = exam_events.last_event_id(exam_id)  # New client - state message covers the past
+    
+    state = {
+        'status': exam_session.status,
+        'exam_duration': exam_session.settings.get('exam_duration')
+    }
+    
+    if 'wait' in request.args:
+        wait = long_request_seconds(request.args.get('wait', 0, type=float), app_config.MONITOR_LONG_POLL_SECONDS)
+        events = exam_events.wait(exam_id, after, wait) if wait > 0 else exam_events.events_since(exam_id, after)
+        return jsonify({
+            'success': True,
+            'state': state,
+            'events': events,
+            'last_event_id': events[-1]['id'] if events else after
+        })
+    
+    def stream():
+        if not app_config.LONG_REQUESTS_ENABLED:
+            yield f"retry: {app_config.EXAM_EVENTS_POLL_SECONDS * 1000}\n\n"
+            yield format_sse('state', state, after)
+            for event in exam_events.events_since(exam_id, after):
+                yield format_sse(event['type'], event['data'], event['id'])
+            return  # EventSource reconnects with Last-Event-ID
+        yield "retry: 3000\n\n"
+        yield format_sse('state', state, after)
+        last_id = after
+        deadline = time.monotonic() + app_config.EXAM_EVENTS_STREAM_SECONDS
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return  # EventSource reconnects with Last-Event-ID
+            events = exam_events.wait(exam_id, last_id, min(remaining, app_config.EXAM_EVENTS_KEEPALIVE_SECONDS))
+            if not events:
+                yield ": keepalive\n\n"
+                continue
+            for event in events:
+                last_id = event['id']
+                yield format_sse(event['type'], event['data'], event['id'])
+                if event['type'] == 'end':
+                    return
+    
+    return Response(stream(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # Do not buffer in nginx
+    })
+
+
 @app.route('/api/exam/<int:exam_id>/log-event', methods=['POST'])
 def api_log_event(exam_id):
     """Log a general event for a student"""
@@ -1916,7 +2125,7 @@ def api_log_event(exam_id):
         # Log event (could be stored in a log file)
         student = exam_session.get_student(student_session_id)
         if student:
-            print(f"[EVENT] {event_type} - {student['first_name']} {student['last_name']}")
+            print(f"[EVENT] {event_type} - {student.first_name} {student.last_name}")
         
         return jsonify({'success': True})
     
@@ -1925,20 +2134,95 @@ def api_log_event(exam_id):
         return jsonify({'success': False}), 500
 
 
+def parse_client_timestamp(value, earliest, latest):
+    """Browser ISO timestamp as local naive datetime, clamped to [earliest, latest]; None if invalid"""
+    try:
+        timestamp = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone().replace(tzinfo=None)
+    return min(max(timestamp, earliest), latest)
+
+
+@app.route('/api/exam/<int:exam_id>/log-batch', methods=['POST'])
+def api_log_events_batch(exam_id):
+    """
+    Log buffered proctoring events of a student in one request (fetch or navigator.sendBeacon)
+    JSON: {"student_session_id": "...", "events": [{"kind": "cheating"|"event", "type": "...",
+           "details": {...}, "timestamp": "<ISO>"}]}
+    NEW v5: Replaces one /log-cheating or /log-event request per blur/copy/paste
+    """
+    try:
+        # sendBeacon may not set the JSON content type
+        data = request.get_json(force=True, silent=True) or {}
+        student_session_id = data.get('student_session_id')
+        events = data.get('events')
+        if not isinstance(events, list) or len(events) > app_config.PROCTORING_BATCH_MAX_EVENTS:
+            return jsonify({'success': False, 'message': 'Invalid events'}), 400
+        
+        exam_session = exam_session_manager.get_session(exam_id)
+        if not exam_session:
+            return jsonify({'success': False}), 404
+        
+        student = exam_session.get_student(student_session_id)
+        if not student:
+            return jsonify({'success': False, 'message': 'Student not found'}), 404
+        
+        now = datetime.now()
+        attempts = []
+        for event in events:
+            if not isinstance(event, dict) or not isinstance(event.get('type'), str):
+                continue
+            if event.get('kind') == 'cheating':
+                timestamp = parse_client_timestamp(event.get('timestamp'), student.start_datetime, now)
+                attempts.append((event['type'], event.get('details'), timestamp))
+            else:
+                print(f"[EVENT] {event['type']} - {student.first_name} {student.last_name}")
+        
+        # All attempts of the batch in one write
+        logged = exam_session.log_cheating_attempts(student_session_id, attempts)
+        
+        return jsonify({'success': True, 'cheating_logged': logged})
+    
+    except Exception as e:
+        print(f"Error logging event batch: {e}")
+        return jsonify({'success': False}), 500
+
+
 @app.route('/api/exam/<int:exam_id>/students', methods=['GET'])
 def api_get_exam_students(exam_id):
-    """Get all students in exam with their current status"""
+    """
+    Get students in exam with their current status
+    NEW v5: ?since=<version> returns only students changed after that version,
+    ?wait=<seconds> long-polls until something changes (only with LONG_REQUESTS_ENABLED -
+    a waiting request holds its worker; otherwise poll_seconds tells the monitor when to ask again)
+    REMARK: Previously the full list was rebuilt and polled every 2 seconds
+    """
     try:
-        exam_session = exam_session_manager.get_session(exam_id)
+        since = request.args.get('since', type=int)
+        wait = long_request_seconds(request.args.get('wait', 0, type=float), app_config.MONITOR_LONG_POLL_SECONDS)
+        
+        if since is not None and wait > 0:
+            exam_session = exam_session_manager.wait_for_change(exam_id, since, wait)
+        else:
+            exam_session = exam_session_manager.get_session(exam_id)
         if not exam_session:
             return jsonify({'success': False, 'message': 'Exam not found'}), 404
         
-        students = exam_session_manager.get_session_students_summary(exam_id)
+        # Unknown future version (e.g. server restarted) - send everything
+        full = since is None or since > exam_session.version
+        students = exam_session_manager.get_session_students_summary(exam_id, None if full else since)
         
         return jsonify({
             'success': True,
             'exam_id': exam_id,
             'exam_title': exam_session.exam_title,
+            'status': exam_session.status,
+            'version': exam_session.version,
+            'full': full,
+            'server_time': time.time(),
+            'poll_seconds': 0 if app_config.LONG_REQUESTS_ENABLED else app_config.MONITOR_POLL_SECONDS,
             'students': students
         })
     
@@ -1947,6 +2231,26 @@ def api_get_exam_students(exam_id):
         return jsonify({'success': False, 'message': str(e)}), 500
 
 
+@app.route('/api/exam/<int:exam_id>/memory', methods=['GET'])
+@login_required
+def api_exam_memory_report(exam_id):
+    """Approximate memory held by an exam session (students, cheating logs, payload cache)"""
+    try:
+        exam_session = exam_session_manager.get_session(exam_id)
+        if not exam_session:
+            return jsonify({'success': False, 'message': 'Exam not found'}), 404
+        
+        user = get_current_user()
+        if exam_session.teacher_id != f"teacher_{user['id']}":
+            return jsonify({'success': False, 'message': 'Not authorized'}), 403
+        
+        return jsonify({'success': True, 'report': exam_session.memory_report()})
+    
+    except Exception as e:
+        print(f"Error building memory report: {e}")
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+
 # ==========================================
 # HELPER FUNCTIONS - EXAM LOGIC
 # ==========================================
@@ -1971,6 +2275,7 @@ def create_exam_results_folder(teacher_id, exam_title, exam_filename=None):
         
         results_folder = os.path.join(teacher_results_dir, folder_name)
         os.makedirs(results_folder, exist_ok=True)
+        results_index.folder_created(teacher_id, folder_name)
         
         # Copy exam file to results folder
         if exam_filename:
@@ -2001,32 +2306,50 @@ def create_exam_results_folder(teacher_id, exam_title, exam_filename=None):
         return results_folder
 
 
-def load_exam_questions(teacher_id, exam_filename, max_questions=1000, shuffle=False):
-    """Load and parse exam file using ExamBuilder"""
-    try:
-        exam_dir = os.path.join(app_config.TEACHERS_DIR, teacher_id, 'exams')
-        exam_path = os.path.join(exam_dir, exam_filename)
-        
-        if not os.path.exists(exam_path):
-            return {'questions': []}
-        
-        # ПРАВИЛЬНАЯ ЛОГИКА: сначала загружаем ВСЕ вопросы, потом shuffle, потом limit
-        # Load ALL questions first (no limit)
-        exam_data = ExamBuilder.parse_exam_file(exam_path, max_questions=9999)
-        
-        # Apply shuffle FIRST if requested (shuffles ALL questions)
-        if shuffle:
-            exam_data['questions'] = ExamBuilder.shuffle_exam(exam_data['questions'], shuffle)
-        
-        # THEN limit to max_questions (takes first N from shuffled list)
-        if max_questions < len(exam_data['questions']):
-            exam_data['questions'] = exam_data['questions'][:max_questions]
-        
-        return exam_data
+def send_zip(base_path, zip_filename):
+    """
+    Send base_path as a ZIP download
+    Served from the archive cache when no file changed, otherwise streamed while compressing
+    """
+    entries = list_zip_entries(base_path)
+    cached_path = zip_cache.get(base_path, entries)
+    if cached_path:
+        return send_file(
+            cached_path,
+            mimetype='application/zip',
+            as_attachment=True,
+            download_name=zip_filename
+        )
     
+    return Response(
+        zip_cache.stream(base_path, entries),
+        mimetype='application/zip',
+        headers={'Content-Disposition': content_disposition(zip_filename)}
+    )
+
+
+def get_exam_path(teacher_id, exam_filename):
+    """Path of an exam file in the teacher's exams folder"""
+    return os.path.join(app_config.TEACHERS_DIR, teacher_id, 'exams', exam_filename)
+
+
+def get_session_exam(exam_session):
+    """
+    Compiled exam of a running session
+    Compiled once per exam file version - an edited file is picked up by the running exam
+    (every worker checks the same file, so all grade against the same answer key)
+    Shuffle and limit are applied per student by ExamSession.get_student_payload
+    """
+    exam_path = get_exam_path(exam_session.teacher_id, exam_session.exam_filename)
+    try:
+        version = exam_cache.file_version(exam_path)
+        if exam_session.exam_data is None or exam_session.exam_version != version:
+            exam_session.set_exam_data(exam_cache.get(exam_path, ExamBuilder.compile_exam_file), version)
     except Exception as e:
         print(f"Error loading exam questions: {e}")
-        return {'questions': [], 'text_direction': 'ltr', 'question_answer_dict': {}}
+        if exam_session.exam_data is None:
+            return {'questions': [], 'text_direction': 'ltr', 'question_answer_dict': {}}
+    return exam_session.exam_data
 
 
 def calculate_exam_score(answers, exam_filename, teacher_id):
@@ -2038,15 +2361,16 @@ def calculate_exam_score(answers, exam_filename, teacher_id):
         if not os.path.exists(exam_path):
             return 0
         
-        # Use ExamBuilder to get question-answer dictionary
-        exam_data = ExamBuilder.parse_exam_file(exam_path)
+        # NEW v5: Compiled exam (and its answer key) from the exam cache
+        # REMARK: Previously parse_exam_file copied every question just to read the answers
+        exam_data = exam_cache.get(exam_path, ExamBuilder.compile_exam_file)
         question_answer_dict = exam_data.get('question_answer_dict', {})
         
         if not question_answer_dict:
             return 0
         
         # Calculate score using ExamBuilder
-        score = ExamBuilder.calculate_score(answers, question_answer_dict)
+        score = ExamBuilder.calculate_score(answers, question_answer_dict, exam_data['answer_key'])
         
         # If -1, it means there are open questions that can't be auto-graded
         if score < 0:
@@ -2101,6 +2425,27 @@ def simplify_user_agent(user_agent):
         return 'Unknown'
 
 
+def build_all_exams_header(exam_file_path):
+    """Exam content block written at the top of a new All_Exams.txt"""
+    try:
+        with open(exam_file_path, 'r', encoding='utf-8') as f:
+            exam_content = f.read()
+    except Exception as e:
+        print(f"Error adding exam content to All_Exams.txt: {e}")
+        return ""
+    
+    header = "=" * 80 + "\n"
+    header += "EXAM CONTENT\n"
+    header += "=" * 80 + "\n\n"
+    header += exam_content
+    header += "\n\n"
+    header += "=" * 80 + "\n"
+    header += "STUDENT RESULTS\n"
+    header += "=" * 80 + "\n\n"
+    print(f"Created All_Exams.txt with exam content")
+    return header
+
+
 def save_exam_results(exam_id, exam_session, student_session_id, student, score, answers, response_html, questions_list, device_info=None):
     """Save exam results to files (like old Exam.py system)"""
     try:
@@ -2124,25 +2469,28 @@ def save_exam_results(exam_id, exam_session, student_session_id, student, score,
         # FIX v3: Date format with year, month name, day
         # REMARK: Previously "%Y-%m-%d" (2026-02-03), now "%Y %B %d" (2026 February 03)
         current_date = dt.now().strftime("%Y %B %d")
-        first_name = student['first_name']
-        last_name = student['last_name']
+        first_name = student.first_name
+        last_name = student.last_name
         
+        # NEW v5: Files are written by the background results writer (batched, one fsync per file)
+        # REMARK: Previously every open/append ran inside the submit request
         # 1. Save HTML file (student's exam result)
         html_filename = f"{first_name}_{last_name}_{current_time}.html"
         html_path = os.path.join(results_folder, html_filename)
-        with open(html_path, 'w', encoding='utf-8') as f:
-            f.write(response_html)
+        folder_name = os.path.basename(results_folder)
+        results_writer.write_file(html_path, response_html, on_created=lambda: results_index.html_created(
+            exam_session.teacher_id, folder_name))
         
         # 2. Append to GRADES.txt
         # FIX v3: Improved format to handle names with numbers
         # REMARK: Previously format was "HH-MM-SS: Name-Score%" which confused names with numbers
         # NEW FORMAT: "YYYY-MM-DD HH-MM-SS | FullName | Score: XX% | Cheat: X | Duration: X | IP: xxx | UA: xxx | Device: xxx | Screen: xxx"
         grades_file = os.path.join(results_folder, 'GRADES.txt')
-        cheating_attempts = student.get('cheating_attempts', 0)
+        cheating_attempts = student.cheating_attempts
         
         # FIX v4: Use time_spent instead of exam_duration, format as "5m 23s"
         # REMARK: Previously used 'exam_duration' key which didn't exist (showed N/A)
-        time_spent_seconds = student.get('time_spent', 0)
+        time_spent_seconds = student.time_spent
         if time_spent_seconds and time_spent_seconds > 0:
             minutes = int(time_spent_seconds // 60)
             seconds = int(time_spent_seconds % 60)
@@ -2167,50 +2515,23 @@ def save_exam_results(exam_id, exam_session, student_session_id, student, score,
             platform = 'unknown'
             screen = 'unknown'
         
-        grade_text = f"{score}%" if score >= 0 else "Unknown yet"
+        grade_text = grades_score_text(score)
         grades_entry = (
             f"{current_date} {current_time} | {first_name} {last_name} | "
             f"Score: {grade_text} | Cheat: {cheating_attempts} | Duration: {exam_duration} | "
             f"IP: {ip_address} | UA: {ua_short} | Device: {device_id} | Screen: {screen}\n"
         )
         
-        with open(grades_file, 'a', encoding='utf-8') as f:
-            f.write(grades_entry)
+        # NEW v5: Index counts the student once the GRADES.txt line is on disk (writer thread)
+        # REMARK: Previously the index was updated before any file was written
+        results_writer.append(grades_file, grades_entry, on_written=lambda: results_index.submission_saved(
+            exam_session.teacher_id, folder_name))
         
         # 3. Append to All_Exams.txt (for ChatGPT evaluation)
         all_exams_file = os.path.join(results_folder, 'All_Exams.txt')
         
-        # If All_Exams.txt doesn't exist, create it and add exam content first
-        if not os.path.exists(all_exams_file):
-            try:
-                # Get exam file content
-                teacher_id = exam_session.teacher_id
-                exam_filename = exam_session.exam_filename
-                exam_file_path = os.path.join(
-                    app_config.TEACHERS_DIR,
-                    teacher_id,
-                    'exams',
-                    exam_filename
-                )
-                
-                if os.path.exists(exam_file_path):
-                    with open(exam_file_path, 'r', encoding='utf-8') as f:
-                        exam_content = f.read()
-                    
-                    # Write exam content to All_Exams.txt first
-                    with open(all_exams_file, 'w', encoding='utf-8') as f:
-                        f.write("=" * 80 + "\n")
-                        f.write("EXAM CONTENT\n")
-                        f.write("=" * 80 + "\n\n")
-                        f.write(exam_content)
-                        f.write("\n\n")
-                        f.write("=" * 80 + "\n")
-                        f.write("STUDENT RESULTS\n")
-                        f.write("=" * 80 + "\n\n")
-                    
-                    print(f"Created All_Exams.txt with exam content")
-            except Exception as e:
-                print(f"Error adding exam content to All_Exams.txt: {e}")
+        # If All_Exams.txt doesn't exist, the writer creates it with exam content first
+        exam_file_path = get_exam_path(exam_session.teacher_id, exam_session.exam_filename)
         
         # Build text format like old system + add device info
         exam_txt = "############################################################################\n\n"
@@ -2228,8 +2549,23 @@ def save_exam_results(exam_id, exam_session, student_session_id, student, score,
             exam_txt += f"{question_text}\n{submitted_answer}\n"
             exam_txt += "\n----------------------------------------------------------------------------\n"
         
-        with open(all_exams_file, 'a', encoding='utf-8') as f:
-            f.write(exam_txt)
+        results_writer.append(all_exams_file, exam_txt, header=lambda: build_all_exams_header(exam_file_path))
+        
+        # 4. Append to submissions.jsonl (schema-versioned, for analytics/exports/regrade)
+        # NEW v5: Numeric twin of the GRADES.txt line with per-question correctness
+        # REMARK: Previously consumers had to parse the human-formatted GRADES.txt lines
+        record = build_submission_record(
+            exam_id, student_session_id, student, score, answers, questions_list,
+            get_session_exam(exam_session).get('answer_key'),
+            submitted_at=time.time(), submit_time=current_time, device_info=device_info
+        )
+        results_writer.append(submissions_path(results_folder), dumps_record(record))
+        
+        # NEW v5: Live item statistics (updated on the writer thread, in submit order)
+        results_writer.call(lambda: item_stats.record_submission(exam_session.teacher_id, folder_name, record))
+        
+        # NEW v5: Journaled (fsync) before the student sees "submitted" - replayed after a crash
+        results_writer.commit()
         
         print(f"Exam submitted {grades_entry}")
         
@@ -2267,6 +2603,12 @@ def internal_error(error):
 def before_request():
     """Before each request"""
     ensure_directories()
+    
+    # NEW v5: Result files may still be queued in the background writer - make them visible first
+    # Waits for a marker queued now, not for the queue to drain (it may never be empty under load)
+    if request.path.startswith('/api/results'):
+        if not results_writer.sync(timeout=app_config.RESULTS_WRITER_SYNC_TIMEOUT):
+            print("Error syncing results writer: timed out, newest results may be missing")
 
 
 @app.context_processor
@@ -2310,6 +2652,10 @@ if __name__ == '__main__':
     # REMARK: Changed from hardcoded 5000 to support multiple deployments on same VM
     port = int(os.environ.get('FLASK_PORT', 5001))
     
+    # Development server runs every request in its own thread - long requests hold no worker
+    if 'EXAM_LONG_REQUESTS' not in os.environ:
+        app_config.LONG_REQUESTS_ENABLED = True
+    
     # Start Flask development server
     app.run(
         host='0.0.0.0',
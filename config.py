@@ -30,9 +30,21 @@ class Config:
     
     # Database
     DATABASE_PATH = os.path.join(DATA_DIR, 'users.db')
+    SESSIONS_DB_PATH = os.path.join(DATA_DIR, 'exam_sessions.db')
+    RESULTS_INDEX_DB_PATH = os.path.join(DATA_DIR, 'results_index.db')
+    ITEM_STATS_DB_PATH = os.path.join(DATA_DIR, 'item_stats.db')  # Live per-question counters
+    EXAM_ID_SEQUENCE_DB_PATH = os.path.join(DATA_DIR, 'exam_ids.db')  # Exam IDs when sessions are not persisted
+    PROCTORING_INDEX_DB_PATH = os.path.join(DATA_DIR, 'proctoring_index.db')  # Queryable copy of the proctoring logs
+    ZIP_CACHE_DIR = os.path.join(DATA_DIR, 'zip_cache')  # Cached result-folder archives
+    
+    # Persist running exams in SQLite so several worker processes can share them
+    # and exams survive a restart (False = in-memory, single process only)
+    PERSIST_EXAM_SESSIONS = True
+    ENDED_SESSION_RETENTION_SECONDS = 6 * 3600  # Ended exams stay in memory this long (persisted ones reload on demand)
     
     # Upload settings
     MAX_CONTENT_LENGTH = 50 * 1024 * 1024  # 50MB max file size
+    ZIP_STORE_MAX_BYTES = 2048  # Smaller files are stored in ZIP downloads, not deflated
     
     # Languages supported
     SUPPORTED_LANGUAGES = ['en', 'ru', 'he']
@@ -41,12 +53,40 @@ class Config:
     # Exam settings
     DEFAULT_TIMER_MINUTES = 60
     DEFAULT_MAX_QUESTIONS = 1000
-    
+    EXAM_CACHE_MAX_ENTRIES = 64  # Parsed exam versions kept in memory (LRU)
+    # Long-polling and event streams keep a request open, holding a sync worker per open tab.
+    # Enable only with threaded/async workers (gunicorn gthread or gevent, or the threaded dev server)
+    LONG_REQUESTS_ENABLED = os.environ.get('EXAM_LONG_REQUESTS', '').lower() in ('1', 'true', 'yes')
+    MONITOR_LONG_POLL_SECONDS = 25  # Max time a monitor request waits for student changes
+    MONITOR_POLL_SECONDS = 3  # Monitor refresh interval when long requests are off
+    EXAM_EVENTS_STREAM_SECONDS = 300  # Student event stream length before the browser reconnects
+    EXAM_EVENTS_POLL_SECONDS = 5  # Student event reconnect interval when long requests are off
+    EXAM_EVENTS_KEEPALIVE_SECONDS = 15  # Comment sent on idle event streams (keeps proxies from closing them)
+    PROCTORING_BATCH_MAX_EVENTS = 500  # Events accepted in one /log-batch request
+    CHEATING_LOG_MAX_EVENTS = 200  # Newest cheating events kept in memory per student (all stay in the store and logs)
+    PROCTORING_LOG_FLUSH_SECONDS = 1  # Buffered proctoring log lines reach the file this often
+    PROCTORING_LOG_MAX_BYTES = 10 * 1024 * 1024  # Rotate a log past this size (0 = no size limit)
+    PROCTORING_LOG_ROTATE_DAILY = True  # Start a new log segment every day
+    PROCTORING_LOG_BACKUPS = 30  # Rotated segments kept per log
+    PROCTORING_LOG_COMPRESS = True  # Gzip rotated segments
+    AUTOSAVE_FLUSH_SECONDS = 5  # Autosaved answers of a student are written at most this often
+    AUTOSAVE_MAX_ANSWER_CHARS = 100000  # Longest answer accepted by autosave
+    RESULTS_WRITER_QUEUE_SIZE = 1000  # Pending result-file writes before submits wait (backpressure)
+    RESULTS_WRITER_SYNC_TIMEOUT = 10  # Seconds a results page waits for earlier writes to land
+    RESULTS_JOURNAL_DIR = os.path.join(DATA_DIR, 'results_journal')  # Queued writes replayed after a crash
+    REGRADE_MAX_WORKERS = 4  # Worker processes for re-grading a results folder
+    REGRADE_CHUNK_SIZE = 500  # Students graded per worker task
+    REGRADE_JOBS_DIR = os.path.join(DATA_DIR, 'regrade_jobs')  # Status of background regrades (polled)
+
     # Proctoring settings
     TRACK_IP = True
     TRACK_USER_AGENT = True
     MAX_PAGE_REFRESHES = 5  # Allow max 5 refreshes before alert
     
+    # User record cache (get_current_user)
+    USER_CACHE_TTL_SECONDS = 60
+    USER_CACHE_MAX_ENTRIES = 256
+    
 
 class DevelopmentConfig(Config):
     """Development configuration"""
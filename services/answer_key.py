@@ -0,0 +1,86 @@
+"""
+Answer Key
+Grading index compiled once per exam version (kept in the exam cache entry)
+Questions get integer ids; correct answers are pre-stripped and open questions pre-flagged
+"""
+
+import re
+
+from services.exam_tokenizer import is_open_question_marker
+
+# Question number prefix (with optional bidi marks): "1. What is..." -> "What is..."
+NUMBER_PREFIX_RE = re.compile(r'^[\u200E\u200F\u202A-\u202E]*\d+\.\s*')
+
+
+def strip_number(question):
+    """Remove question number prefix (same rule as ExamBuilder.remove_number)"""
+    return NUMBER_PREFIX_RE.sub('', question, count=1)
+
+
+class AnswerKey:
+    """Question text -> id index with per-id correct answer and open flag"""
+
+    __slots__ = ('ids', 'texts', 'correct', 'is_open', '_plain')
+
+    def __init__(self, question_answer_dict):
+        self.ids = {}        # {question_text: id}
+        self.texts = []      # id -> question text
+        self.correct = []    # id -> correct answer, stripped
+        self.is_open = []    # id -> open question (cannot be auto-graded)
+        self._plain = []     # id -> text has no number prefix (lookup needs no regex)
+        for question_id, (text, answer) in enumerate(question_answer_dict.items()):
+            self.ids[text] = question_id
+            self.texts.append(text)
+            self.correct.append(answer.strip())
+            self.is_open.append(is_open_question_marker(answer))
+            self._plain.append(NUMBER_PREFIX_RE.match(text) is None)
+
+    def __len__(self):
+        return len(self.texts)
+
+    @property
+    def has_open_questions(self):
+        return any(self.is_open)
+
+    def resolve(self, question_text):
+        """Id of a submitted question text, or None if it is not in the key"""
+        question_id = self.ids.get(question_text)
+        if question_id is not None and self._plain[question_id]:
+            return question_id
+        # Numbered text (or unknown) - resolve like the original remove_number lookup
+        return self.ids.get(strip_number(question_text))
+
+    def score(self, submitted_answers):
+        """
+        Percentage (0-100) for {question_text: answer}, or -1 if an open question was answered
+        Unknown questions count towards the total but can never be correct
+        """
+        resolve = self.resolve
+        return self.score_ids([(resolve(text), answer) for text, answer in submitted_answers.items()])
+
+    def score_ids(self, id_answers):
+        """Same as score() for a list of (question_id or None, answer) pairs"""
+        correct_count = 0
+        is_open = self.is_open
+        correct = self.correct
+        for question_id, answer in id_answers:
+            if question_id is None:
+                continue
+            if is_open[question_id]:
+                return -1
+            if correct[question_id] == answer.strip():
+                correct_count += 1
+
+        if not id_answers:
+            return 0
+        return round((correct_count / len(id_answers)) * 100)
+
+    def check(self, question_text, answer):
+        """
+        (question_id, correct) for one answer
+        correct is None when the question is unknown, open or unanswered
+        """
+        question_id = self.resolve(question_text)
+        if question_id is None or answer is None or self.is_open[question_id]:
+            return question_id, None
+        return question_id, self.correct[question_id] == answer.strip()
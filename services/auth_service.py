@@ -8,7 +8,11 @@ import sqlite3
 import hashlib
 import os
 import logging
+import threading
+import time
+from collections import OrderedDict
 from config import app_config
+from services.db_pool import ConnectionPool
 
 logger = logging.getLogger(__name__)
 
@@ -20,16 +24,20 @@ class AuthService:
         if db_path is None:
             db_path = app_config.DATABASE_PATH
         self.db_path = db_path
+        # NEW v5: One reused connection per thread (WAL, synchronous=NORMAL)
+        # REMARK: Previously every method opened and closed its own connection
+        self.pool = ConnectionPool(db_path)
+        # NEW v5: Small TTL/LRU cache of user records {user_id: (expires_at, user)}
+        self._user_cache = OrderedDict()
+        self._user_cache_lock = threading.Lock()
         self.init_db()
     
     def init_db(self):
         """Initialize SQLite database with users table"""
         os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
         
-        conn = None
-        try:
-            conn = sqlite3.connect(self.db_path, timeout=10.0)
-            conn.execute('PRAGMA journal_mode=WAL')  # Enable WAL mode for better concurrency
+        conn = self.pool.connection()
+        with conn:
             cursor = conn.cursor()
             
             cursor.execute('''
@@ -45,11 +53,6 @@ class AuthService:
                     terms_accepted_at TIMESTAMP
                 )
             ''')
-            
-            conn.commit()
-        finally:
-            if conn:
-                conn.close()
     
     @staticmethod
     def _hash_password(password):
@@ -61,26 +64,22 @@ class AuthService:
         Add new user to database
         Returns: dict with success status
         """
-        conn = None
         try:
             password_hash = self._hash_password(password)
 
             logger.info("Add user attempt - username=%s", username)
             
-            conn = sqlite3.connect(self.db_path, timeout=10.0)
-            conn.execute('PRAGMA journal_mode=WAL')  # Enable WAL mode for better concurrency
-            cursor = conn.cursor()
-            
             # Set terms_accepted_at to current timestamp if terms were accepted
             terms_timestamp = 'CURRENT_TIMESTAMP' if terms_accepted else 'NULL'
             
-            cursor.execute(f'''
-                INSERT INTO users (username, password_hash, first_name, last_name, email, terms_accepted_at)
-                VALUES (?, ?, ?, ?, ?, {terms_timestamp})
-            ''', (username, password_hash, first_name, last_name, email))
+            # Commits on success, rolls back on error (connection stays reusable)
+            with self.pool.connection() as conn:
+                cursor = conn.execute(f'''
+                    INSERT INTO users (username, password_hash, first_name, last_name, email, terms_accepted_at)
+                    VALUES (?, ?, ?, ?, ?, {terms_timestamp})
+                ''', (username, password_hash, first_name, last_name, email))
             
             user_id = cursor.lastrowid
-            conn.commit()
 
             logger.info("Add user success - username=%s user_id=%s", username, user_id)
             
@@ -101,43 +100,33 @@ class AuthService:
                 'success': False,
                 'message': f'Error creating user: {str(e)}'
             }
-        finally:
-            if conn:
-                conn.close()
-                logger.debug("Connection closed - add_user - username=%s", username)
     
     def authenticate(self, username, password):
         """
         Authenticate user with username and password
         Returns: dict with success status and user data
         """
-        conn = None
         try:
             password_hash = self._hash_password(password)
 
             logger.info("Authenticate attempt - username=%s", username)
             
-            conn = sqlite3.connect(self.db_path, timeout=10.0)
-            conn.execute('PRAGMA journal_mode=WAL')  # Enable WAL mode for better concurrency
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                SELECT id, username, first_name, last_name, email 
-                FROM users 
-                WHERE username = ? AND password_hash = ?
-            ''', (username, password_hash))
-            
-            user = cursor.fetchone()
+            with self.pool.connection() as conn:
+                user = conn.execute('''
+                    SELECT id, username, first_name, last_name, email 
+                    FROM users 
+                    WHERE username = ? AND password_hash = ?
+                ''', (username, password_hash)).fetchone()
+                
+                if user:
+                    # Update last login
+                    conn.execute('''
+                        UPDATE users 
+                        SET last_login = CURRENT_TIMESTAMP 
+                        WHERE username = ?
+                    ''', (username,))
             
             if user:
-                # Update last login
-                cursor.execute('''
-                    UPDATE users 
-                    SET last_login = CURRENT_TIMESTAMP 
-                    WHERE username = ?
-                ''', (username,))
-                conn.commit()
-
                 logger.info("Authenticate success - username=%s user_id=%s", username, user[0])
                 
                 return {
@@ -162,45 +151,44 @@ class AuthService:
                 'success': False,
                 'message': f'Authentication error: {str(e)}'
             }
-        finally:
-            if conn:
-                conn.close()
-                logger.debug("Connection closed - authenticate - username=%s", username)
     
     def get_user(self, user_id):
-        """Get user by ID"""
-        conn = None
+        """Get user by ID (served from the user cache for USER_CACHE_TTL_SECONDS)"""
+        now = time.monotonic()
+        with self._user_cache_lock:
+            entry = self._user_cache.get(user_id)
+            if entry is not None and entry[0] > now:
+                self._user_cache.move_to_end(user_id)
+                return dict(entry[1])  # Copy - callers may modify the dict
+        
         try:
-            conn = sqlite3.connect(self.db_path, timeout=10.0)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
+            user = self.pool.connection().execute('''
                 SELECT id, username, first_name, last_name, email 
                 FROM users 
                 WHERE id = ?
-            ''', (user_id,))
-            
-            user = cursor.fetchone()
+            ''', (user_id,)).fetchone()
             
             if user:
-                return {
+                user = {
                     'id': user[0],
                     'username': user[1],
                     'first_name': user[2],
                     'last_name': user[3],
                     'email': user[4]
                 }
+                with self._user_cache_lock:
+                    self._user_cache[user_id] = (now + app_config.USER_CACHE_TTL_SECONDS, user)
+                    self._user_cache.move_to_end(user_id)
+                    while len(self._user_cache) > app_config.USER_CACHE_MAX_ENTRIES:
+                        self._user_cache.popitem(last=False)
+                return dict(user)
             return None
         except Exception as e:
             logger.exception("Get user error - user_id=%s error=%s", user_id, e)
             return None
-        finally:
-            if conn:
-                conn.close()
     
     def change_password(self, username, old_password, new_password):
         """Change user password"""
-        conn = None
         try:
             # First verify old password
             auth_result = self.authenticate(username, old_password)
@@ -212,17 +200,14 @@ class AuthService:
             
             new_password_hash = self._hash_password(new_password)
             
-            conn = sqlite3.connect(self.db_path, timeout=10.0)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                UPDATE users 
-                SET password_hash = ? 
-                WHERE username = ?
-            ''', (new_password_hash, username))
-            
-            conn.commit()
+            with self.pool.connection() as conn:
+                conn.execute('''
+                    UPDATE users 
+                    SET password_hash = ? 
+                    WHERE username = ?
+                ''', (new_password_hash, username))
             
+            self.invalidate_user(auth_result['user']['id'])
             logger.info("Password changed - username=%s", username)
             
             return {
@@ -235,6 +220,11 @@ class AuthService:
                 'success': False,
                 'message': f'Error changing password: {str(e)}'
             }
-        finally:
-            if conn:
-                conn.close()
+    
+    def invalidate_user(self, user_id=None):
+        """Drop a cached user record after it changed (None = drop all)"""
+        with self._user_cache_lock:
+            if user_id is None:
+                self._user_cache.clear()
+            else:
+                self._user_cache.pop(user_id, None)
@@ -0,0 +1,137 @@
+"""
+Autosave Service
+Coalescing writer for in-progress answers - deltas of a student are merged in memory
+and written to the session store at most once per flush interval per student
+"""
+
+import os
+import threading
+import time
+
+
+class AutosaveWriter:
+    """Buffers autosaved answers per student and flushes them from one background thread"""
+
+    def __init__(self, store=None, flush_interval=5.0):
+        self.store = store  # ExamSessionStore - without it the in-memory session is the only copy
+        self.flush_interval = flush_interval
+        self._pending = {}     # {student_session_id: {question: (seq, answer)}}
+        self._due = {}         # {student_session_id: monotonic time of its next flush}
+        self._last_flush = {}  # {student_session_id: monotonic time of its last flush}
+        self._condition = threading.Condition()
+        self._thread = None
+        self._pid = None
+        self._stopping = False
+        self.flushes = 0
+        self.errors = 0
+
+    def _ensure_started(self):
+        # Started lazily (and again after fork - threads are not inherited by worker processes)
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name='autosave-writer', daemon=True)
+        self._thread.start()
+
+    def save(self, student_session_id, entries):
+        """
+        Queue accepted answers {question: (seq, answer)} of a student
+        Newer deltas of the same student overwrite queued ones instead of adding writes
+        """
+        if not self.store or not entries:
+            return
+        with self._condition:
+            self._ensure_started()
+            pending = self._pending.setdefault(student_session_id, {})
+            for question, (seq, answer) in entries.items():
+                if seq > pending.get(question, (0, None))[0]:
+                    pending[question] = (seq, answer)
+            if student_session_id not in self._due:
+                last = self._last_flush.get(student_session_id)
+                now = time.monotonic()
+                self._due[student_session_id] = now if last is None else max(now, last + self.flush_interval)
+                self._condition.notify()
+
+    def saved_answers(self, student_session_id, student):
+        """
+        Latest autosaved answers of a student: stored ones overlaid with queued ones
+        Returns: ({question: answer}, highest seq)
+        """
+        entries = None
+        if self.store:
+            # Flushes do not reload sessions - the store has the newest flushed answers
+            entries = self.store.get_autosave(student_session_id)
+        if entries is None:
+            seqs = student.answer_seqs
+            entries = {question: (seqs.get(question, 0), answer)
+                       for question, answer in list(student.answers.items())}
+        with self._condition:
+            for question, (seq, answer) in self._pending.get(student_session_id, {}).items():
+                if seq > entries.get(question, (0, None))[0]:
+                    entries[question] = (seq, answer)
+        answers = {question: answer for question, (seq, answer) in entries.items()}
+        return answers, max((seq for seq, answer in entries.values()), default=0)
+
+    def discard(self, student_session_id):
+        """Drop queued answers of a student (the submission supersedes them)"""
+        with self._condition:
+            self._pending.pop(student_session_id, None)
+            self._due.pop(student_session_id, None)
+            self._last_flush.pop(student_session_id, None)
+
+    def pending(self):
+        """Number of students with answers not yet written"""
+        with self._condition:
+            return len(self._pending)
+
+    def flush(self):
+        """Write every queued answer now"""
+        with self._condition:
+            batch = list(self._pending.items())
+            self._pending.clear()
+            self._due.clear()
+        self._write(batch)
+
+    def close(self):
+        """Flush and stop the writer thread (registered with atexit)"""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            self._thread.join()
+        self.flush()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._stopping:
+                    now = time.monotonic()
+                    ready = [sid for sid, due in self._due.items() if due <= now]
+                    if ready:
+                        break
+                    timeout = min(self._due.values()) - now if self._due else None
+                    self._condition.wait(timeout)
+                if self._stopping:
+                    return
+                batch = [(sid, self._pending.pop(sid, {})) for sid in ready]
+                for sid in ready:
+                    del self._due[sid]
+                    self._last_flush[sid] = now
+                # Students idle for a whole interval may flush immediately next time
+                for sid, last in list(self._last_flush.items()):
+                    if now - last > self.flush_interval and sid not in self._due:
+                        del self._last_flush[sid]
+            self._write(batch)
+
+    def _write(self, batch):
+        for student_session_id, entries in batch:
+            if not entries:
+                continue
+            try:
+                self.store.save_autosave(student_session_id, entries)
+                self.flushes += 1
+            except Exception as e:
+                self.errors += 1
+                print(f"Error autosaving answers of {student_session_id}: {e}")
+
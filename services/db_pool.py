@@ -0,0 +1,75 @@
+"""
+SQLite Connection Pool
+One long-lived connection per thread (and process) per database file
+Connections keep their prepared-statement cache between requests
+"""
+
+import os
+import sqlite3
+import threading
+
+
+class ConnectionPool:
+    """Thread-local SQLite connections in WAL mode with synchronous=NORMAL"""
+
+    def __init__(self, db_path, timeout=10.0, row_factory=None, cached_statements=256):
+        self.db_path = db_path
+        self.timeout = timeout
+        self.row_factory = row_factory
+        self.cached_statements = cached_statements
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = []  # [(owner thread, pid, connection)] - all open connections
+        self.opened = 0
+
+    def connection(self):
+        """This thread's connection, opened on first use"""
+        conn = getattr(self._local, 'conn', None)
+        # A forked worker must not reuse the parent's connection
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+
+        # check_same_thread=False only so close_all() may close it - used by one thread only
+        conn = sqlite3.connect(self.db_path, timeout=self.timeout,
+                               cached_statements=self.cached_statements, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')  # Readers never block the writer
+        conn.execute('PRAGMA synchronous=NORMAL')  # Safe with WAL, no fsync per commit
+        if self.row_factory is not None:
+            conn.row_factory = self.row_factory
+
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        with self._lock:
+            # Thread-per-request servers start a thread per request - close connections of
+            # threads that have ended, so open connections stay bounded by live threads
+            finished = [entry for entry in self._connections
+                        if entry[1] == self._local.pid and not entry[0].is_alive()]
+            self._connections = [entry for entry in self._connections if entry not in finished]
+            self._connections.append((threading.current_thread(), self._local.pid, conn))
+            self.opened += 1
+        for _, _, finished_conn in finished:
+            finished_conn.close()
+        return conn
+
+    def open_connections(self):
+        """Number of connections currently held by the pool"""
+        with self._lock:
+            return len(self._connections)
+
+    def close(self):
+        """Close this thread's connection"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            return
+        self._local.conn = None
+        with self._lock:
+            self._connections = [entry for entry in self._connections if entry[2] is not conn]
+        conn.close()
+
+    def close_all(self):
+        """Close every connection opened by this pool (tests, shutdown)"""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for _, _, conn in connections:
+            conn.close()
+        self._local = threading.local()
@@ -5,6 +5,12 @@ Exam Builder Service - based on original Exam.py
 import re
 import random
 import os
+from services.exam_cache_service import exam_cache
+from services.language_service import detect_language, count_script_chars, language_from_counts
+from services.answer_key import AnswerKey, NUMBER_PREFIX_RE
+from services.exam_tokenizer import (
+    QUESTION_RE, OPEN_EXAM_MARKERS, scan_exam, is_open_question_marker
+)
 
 
 class ExamBuilder:
@@ -18,11 +24,12 @@ class ExamBuilder:
     START_OF_QUESTION_MARK = "."
     
     # Open question markers
-    OPEN_EXAM_MARKERS = [
-        "Programming task:",
-        "Open Question/Multiple lines question/task:",
-        "Type your answer here"
-    ]
+    OPEN_EXAM_MARKERS = OPEN_EXAM_MARKERS
+    
+    # NEW v5: Precompiled patterns (see services/exam_tokenizer.py)
+    # REMARK: Previously re.match(QUESTION_PATTERN, ...) looked the pattern up on every line
+    QUESTION_RE = QUESTION_RE
+    NUMBER_PREFIX_RE = NUMBER_PREFIX_RE
     
     def __init__(self):
         pass
@@ -30,7 +37,12 @@ class ExamBuilder:
     @staticmethod
     def is_open_question_marker(text):
         """Check if text is an open question marker"""
-        return any(marker in text for marker in ExamBuilder.OPEN_EXAM_MARKERS)
+        return is_open_question_marker(text)
+    
+    @staticmethod
+    def is_question_line(line):
+        """Check if (stripped) line starts a question: '1. What is...'"""
+        return ExamBuilder.QUESTION_RE.match(line) is not None
     
     @staticmethod
     def is_hebrew_text(text):
@@ -56,42 +68,17 @@ class ExamBuilder:
         NOW: Uses percentage-based detection (dominant language wins)
         Priority: Hebrew > Russian > English
         Threshold: Language must have >5% of characters to be detected
+        NEW v5: Delegates to the shared byte-counting engine in language_service
+        REMARK: Previously a Python loop compared every character (duplicated in app.py)
         """
-        if not text or len(text) == 0:
-            return 'en'
-        
-        # Count characters for each language
-        hebrew_count = 0
-        russian_count = 0
-        total_chars = len(text)
-        
-        for char in text:
-            if "\u0590" <= char <= "\u05FF":  # Hebrew
-                hebrew_count += 1
-            elif "\u0400" <= char <= "\u04FF":  # Cyrillic (Russian)
-                russian_count += 1
-        
-        # Calculate percentages
-        hebrew_percent = (hebrew_count / total_chars) * 100
-        russian_percent = (russian_count / total_chars) * 100
-        
-        # Threshold: at least 5% of text must be in that language
-        # This prevents single words/examples from changing the whole file's language
-        THRESHOLD = 5.0
-        
-        if hebrew_percent >= THRESHOLD:
-            return 'he'
-        elif russian_percent >= THRESHOLD:
-            return 'ru'
-        else:
-            return 'en'
+        return detect_language(text)
     
     @staticmethod
     def remove_number(question):
         """Remove question number: '1. What is...' -> 'What is...'"""
         # Remove optional leading bidi marks and the leading number + dot + spaces
         try:
-            return re.sub(r'^[\u200E\u200F\u202A-\u202E]*\d+\.\s*', '', question)
+            return ExamBuilder.NUMBER_PREFIX_RE.sub('', question, count=1)
         except Exception:
             return question
     
@@ -128,23 +115,7 @@ class ExamBuilder:
         Build a dictionary of questions and their first answers
         Returns: {question_text: first_answer}
         """
-        question_answer_dict = {}
-        current_question = None
-        
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-            
-            # Check if line is a question
-            if re.match(ExamBuilder.QUESTION_PATTERN, line):
-                # Remove the number and set as current question
-                current_question = ExamBuilder.remove_number(line)
-            # If we have a current question and it's not in dict yet, add first answer
-            elif current_question and current_question not in question_answer_dict:
-                question_answer_dict[current_question] = line
-        
-        return question_answer_dict
+        return scan_exam(lines)[1]
     
     @staticmethod
     def parse_exam_file(filepath, max_questions=1000):
@@ -153,33 +124,67 @@ class ExamBuilder:
         Returns: {
             'questions': [...],
             'text_direction': 'rtl' or 'ltr',
+            'language': 'en', 'ru' or 'he',
             'question_answer_dict': {...}
         }
+        NEW v5: Served from the process-wide exam cache (parsed once per file version)
+        REMARK: Previously the file was re-read and re-parsed on every call
+        """
+        compiled = exam_cache.get(filepath, ExamBuilder.compile_exam_file)
+        
+        # Hand out copies of question objects - callers shuffle/renumber them in place
+        questions = [
+            dict(question, answers=list(question['answers']))
+            for question in compiled['questions'][:max_questions]
+        ]
+        
+        return {
+            'questions': questions,
+            'text_direction': compiled['text_direction'],
+            'language': compiled['language'],
+            'question_answer_dict': compiled['question_answer_dict'],
+            'answer_key': compiled['answer_key'],
+            'total_questions': len(questions)
+        }
+    
+    @staticmethod
+    def compile_exam_file(filepath):
+        """
+        Read and parse the whole exam file (no question limit)
+        Result is cached by ExamCache and shared - must not be mutated
         """
         with open(filepath, 'r', encoding='utf-8') as f:
             lines = f.readlines()
         
-        # Format and clean lines
-        lines = ExamBuilder.format_exam(lines)
-        
-        # Build answer dictionary
-        question_answer_dict = ExamBuilder.build_question_answer_dict(lines)
+        # NEW v5: One tokenizer pass builds both question blocks and answer dictionary
+        # REMARK: Previously lines were scanned separately for qa dict and questions
+        blocks, question_answer_dict = scan_exam(lines)
         
         # Determine text direction based on detected language with percentage threshold
         # FIXED v3: Use detect_language() with 5% threshold instead of is_hebrew_text()
         # Previously: is_hebrew_text() returned True if ANY Hebrew char found (1 char = RTL entire file)
         # Now: detect_language() requires 5% Hebrew to set RTL direction
-        full_text = ''.join(lines)
-        detected_language = ExamBuilder.detect_language(full_text)
-        text_direction = 'rtl' if detected_language == 'he' else 'ltr'
-        
-        # Build structured questions
-        questions = ExamBuilder.build_questions_list(lines, question_answer_dict, max_questions)
+        # NEW v5: Script characters counted once for the file version and cached with it
+        # 'language' is measured over the raw file (as the app routes did), text direction
+        # over the cleaned lines - formatting only drops whitespace, so the counts are shared
+        # REMARK: Previously routes re-read the file and re-detected language per request
+        content = ''.join(lines)
+        hebrew_count, cyrillic_count = count_script_chars(content)
+        detected_language = language_from_counts(hebrew_count, cyrillic_count, len(content))
+        formatted_length = sum(len(line) for line in ExamBuilder.format_exam(lines))
+        text_direction = 'rtl' if language_from_counts(
+            hebrew_count, cyrillic_count, formatted_length) == 'he' else 'ltr'
+        
+        # Build structured questions (no limit - callers slice)
+        questions = ExamBuilder._build_questions_from_blocks(blocks, question_answer_dict, len(blocks))
         
         return {
             'questions': questions,
             'text_direction': text_direction,
+            'language': detected_language,
             'question_answer_dict': question_answer_dict,
+            # NEW v5: Grading index built once per exam version (see services/answer_key.py)
+            'answer_key': AnswerKey(question_answer_dict),
             'total_questions': len(questions)
         }
     
@@ -188,58 +193,25 @@ class ExamBuilder:
         """
         Build a list of structured questions with answers
         """
+        blocks, _ = scan_exam(lines)
+        return ExamBuilder._build_questions_from_blocks(blocks, question_answer_dict, max_questions)
+    
+    @staticmethod
+    def _build_questions_from_blocks(blocks, question_answer_dict, max_questions=1000):
+        """Build structured question dicts from tokenized question blocks"""
         questions = []
-        current_question = None
-        current_answers = []
-        question_counter = 0
         
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-            
-            # Check if line is a question
-            if re.match(ExamBuilder.QUESTION_PATTERN, line):
-                # Save previous question if exists
-                if current_question:
-                    # Remove number from question text for display
-                    clean_question = ExamBuilder.remove_number(current_question)
-                    
-                    # FIXED: Add question even if it has no answers (treat as open question)
-                    questions.append({
-                        'id': len(questions) + 1,
-                        'number': question_counter,
-                        'text': clean_question,  # Use cleaned version without number
-                        'original_text': current_question,  # Keep original for matching
-                        'answers': current_answers.copy(),
-                        'type': ExamBuilder.get_question_type(clean_question, question_answer_dict) if current_answers else 'open',
-                        'correct_answer': ExamBuilder.get_correct_answer(clean_question, question_answer_dict)
-                    })
-                    
-                    # Check limit
-                    if len(questions) >= max_questions:
-                        break
-                
-                current_question = line
-                current_answers = []
-                question_counter += 1
-            else:
-                # It's an answer line
-                current_answers.append(line)
-        
-        # Add last question
-        # FIXED: Add last question even if it has no answers (treat as open question)
-        if current_question and len(questions) < max_questions:
-            clean_question = ExamBuilder.remove_number(current_question)
-            
+        for block in blocks[:max_questions]:
+            # FIXED: Add question even if it has no answers (treat as open question)
+            number = len(questions) + 1
             questions.append({
-                'id': len(questions) + 1,
-                'number': question_counter,
-                'text': clean_question,  # Use cleaned version
-                'original_text': current_question,  # Keep original for matching
-                'answers': current_answers.copy(),
-                'type': ExamBuilder.get_question_type(current_question, question_answer_dict) if current_answers else 'open',
-                'correct_answer': ExamBuilder.get_correct_answer(current_question, question_answer_dict)
+                'id': number,
+                'number': number,
+                'text': block.text,  # Use cleaned version without number
+                'original_text': block.line,  # Keep original for matching
+                'answers': block.answers.copy(),
+                'type': ExamBuilder.get_question_type(block.text, question_answer_dict) if block.answers else 'open',
+                'correct_answer': ExamBuilder.get_correct_answer(block.text, question_answer_dict)
             })
         
         return questions
@@ -265,23 +237,28 @@ class ExamBuilder:
         return None
     
     @staticmethod
-    def shuffle_exam(questions, shuffle_enabled=True):
+    def shuffle_exam(questions, shuffle_enabled=True, seed=None):
         """
         Shuffle questions and answers (except for open questions)
+        seed: same seed always gives the same order (per-student stable order)
         """
         if not shuffle_enabled:
             return questions
         
+        # NEW v5: Seeded generator so a reload shows the same order
+        # REMARK: Previously always used the global unseeded random
+        rng = random.Random(seed) if seed is not None else random
+        
         # Shuffle the questions order
         shuffled = questions.copy()
-        random.shuffle(shuffled)
+        rng.shuffle(shuffled)
         
         # Shuffle answers for each multiple choice question
         for question in shuffled:
             if question['type'] == 'multiple_choice':
                 # Don't shuffle the first answer if it's a marker
                 if not ExamBuilder.is_open_question_marker(question['answers'][0]):
-                    random.shuffle(question['answers'])
+                    rng.shuffle(question['answers'])
         
         # Re-number questions
         for idx, question in enumerate(shuffled, 1):
@@ -290,32 +267,16 @@ class ExamBuilder:
         return shuffled
     
     @staticmethod
-    def calculate_score(submitted_answers, question_answer_dict):
+    def calculate_score(submitted_answers, question_answer_dict, answer_key=None):
         """
         Calculate exam score based on submitted answers
         Returns: percentage (0-100) or -1 if contains open questions
+        NEW v5: Grades through a precompiled AnswerKey (pass the cached one from the compiled exam)
+        REMARK: Previously every answer went through remove_number (re.sub) and marker checks
         """
-        correct_count = 0
-        total_questions = len(submitted_answers)
-        
-        for question_text, submitted_answer in submitted_answers.items():
-            question_key = ExamBuilder.remove_number(question_text)
-            
-            if question_key in question_answer_dict:
-                correct_answer = question_answer_dict[question_key]
-                
-                # If it's an open question, we can't auto-grade
-                if ExamBuilder.is_open_question_marker(correct_answer):
-                    return -1
-                
-                # Check if answer is correct
-                if correct_answer.strip() == submitted_answer.strip():
-                    correct_count += 1
-        
-        if total_questions == 0:
-            return 0
-        
-        return round((correct_count / total_questions) * 100)
+        if answer_key is None:
+            answer_key = AnswerKey(question_answer_dict)
+        return answer_key.score(submitted_answers)
     
     @staticmethod
     def parse_exam_file_for_preview(filepath, shuffle=True):
@@ -337,59 +298,12 @@ class ExamBuilder:
         Uses the SAME logic as original Exam.py
         """
         try:
-            lines = content.split('\n')
-            
-            # Build question-answer dict first (original logic)
-            qa_dict = {}
-            current_question = None
-            
-            for line in lines:
-                line = line.strip()
-                if not line:
-                    continue
-                
-                # Check if line is a question
-                if re.match(ExamBuilder.QUESTION_PATTERN, line):
-                    # Extract question text after number
-                    try:
-                        idx = line.index(ExamBuilder.START_OF_QUESTION_MARK)
-                        current_question = line[idx + 1:].strip()
-                    except ValueError:
-                        current_question = line
-                # If we have current question and it's not in dict yet, this is first answer
-                elif current_question and current_question not in qa_dict:
-                    qa_dict[current_question] = line
+            # NEW v5: Single tokenizer pass (qa dict + question blocks together)
+            # REMARK: Previously lines were walked twice with uncompiled re.match
+            blocks, qa_dict = scan_exam(content.split('\n'))
             
-            # Now parse all questions with their answers
-            questions = []
-            current_question_line = ""
-            current_answers = []
-            
-            for line in lines:
-                line = line.strip()
-                if not line:
-                    continue
-                
-                # Check if this is a question line
-                if re.match(ExamBuilder.QUESTION_PATTERN, line):
-                    # Save previous question if exists (include questions with no answers)
-                    if current_question_line:
-                        questions.append(ExamBuilder._build_question_obj(
-                            current_question_line, current_answers, qa_dict
-                        ))
-
-                    # Start new question
-                    current_question_line = line
-                    current_answers = []
-                else:
-                    # This is an answer line
-                    current_answers.append(line)
-            
-            # Add last question (include if it has no answers)
-            if current_question_line:
-                questions.append(ExamBuilder._build_question_obj(
-                    current_question_line, current_answers, qa_dict
-                ))
+            # Include questions with no answers (treated as open questions)
+            questions = [ExamBuilder._build_question_obj(block, qa_dict) for block in blocks]
             
             # Shuffle if needed
             if shuffle:
@@ -406,13 +320,13 @@ class ExamBuilder:
             raise Exception(f"Failed to parse exam content: {str(e)}")
     
     @staticmethod
-    def _build_question_obj(question_line, answers, qa_dict):
+    def _build_question_obj(block, qa_dict):
         """
-        Build question object from question line and answers
+        Build question object from a tokenized question block
         Same logic as original Exam._build_question_html
         """
-        # Get question text without number
-        question_text = ExamBuilder.remove_number(question_line)
+        question_text = block.text
+        answers = block.answers
         
         # Determine question type: if no answers -> open; else consult qa_dict for open markers
         if not answers:
@@ -428,7 +342,7 @@ class ExamBuilder:
         question_obj = {
             'number': 0,  # Will be set later
             'text': question_text,
-            'full_text': question_line,  # Keep full text with number
+            'full_text': block.line,  # Keep full text with number
             'type': q_type,
             'options': [],
             'correct_answer': qa_dict.get(question_text, None)
@@ -436,35 +350,27 @@ class ExamBuilder:
         
         # Add options (all answer lines except open question markers)
         if q_type == 'multiple_choice':
-            for answer in answers:
+            markers = block.marker_indexes
+            for idx, answer in enumerate(answers):
                 # Skip answer: lines
                 if answer.lower().startswith('answer:'):
                     continue
                 # Skip open question markers
-                if not ExamBuilder.is_open_question_marker(answer):
+                if idx not in markers:
                     question_obj['options'].append(answer)
         else:
             # For open questions, keep any additional info (like "Programming task:")
             question_obj['task_content'] = ''
             if answers:
-                # Find the first open-question marker index
-                marker_idx = None
-                for i, a in enumerate(answers):
-                    if ExamBuilder.is_open_question_marker(a):
-                        marker_idx = i
-                        break
-
-                if marker_idx is not None:
-                    # Keep the lines after the marker as options/task content
-                    remaining = answers[marker_idx + 1:]
+                if block.marker_indexes:
+                    # Keep the lines after the first marker as options/task content
+                    remaining = answers[block.marker_indexes[0] + 1:]
                     question_obj['options'] = remaining.copy()
                     question_obj['task_content'] = '\n'.join(remaining).strip()
                 else:
                     # No explicit marker; treat all answers as task content
                     question_obj['options'] = answers.copy()
                     question_obj['task_content'] = '\n'.join(answers).strip()
-            else:
-                question_obj['task_content'] = ''
         
         return question_obj
     
@@ -480,7 +386,7 @@ class ExamBuilder:
                 line = all_lines[i]
                 
                 # Stop if we hit next question or answer line
-                if re.match(ExamBuilder.QUESTION_PATTERN, line):
+                if ExamBuilder.is_question_line(line):
                     break
                 if line.lower().startswith('answer:'):
                     break
@@ -505,12 +411,12 @@ class ExamBuilder:
             formatted.append(current)
             
             # Check if current is a question
-            if re.match(ExamBuilder.QUESTION_PATTERN, current):
+            if ExamBuilder.is_question_line(current):
                 # Check next line
                 if i + 1 < len(lines):
                     next_line = lines[i + 1]
                     # If next line is also a question, insert open marker
-                    if re.match(ExamBuilder.QUESTION_PATTERN, next_line):
+                    if ExamBuilder.is_question_line(next_line):
                         formatted.append(ExamBuilder.OPEN_EXAM_MARKERS[0])
                 else:
                     # Last question with no answer
@@ -560,62 +466,18 @@ class ExamBuilder:
             # Detect language
             metadata['language'] = ExamBuilder.detect_language(content)
             
-            lines = content.split('\n')
-            
-            # Build QA dict
-            qa_dict = {}
-            current_question = None
+            # NEW v5: Single tokenizer pass - blocks keep their raw text for error reporting
+            # REMARK: Previously 3 passes (qa dict, questions, extract_question_blocks)
+            blocks, qa_dict = scan_exam(content.split('\n'))
             
-            for line in lines:
-                line = line.strip()
-                if not line:
-                    continue
-                
-                if re.match(ExamBuilder.QUESTION_PATTERN, line):
-                    try:
-                        idx = line.index(ExamBuilder.START_OF_QUESTION_MARK)
-                        current_question = line[idx + 1:].strip()
-                    except ValueError:
-                        current_question = line
-                elif current_question and current_question not in qa_dict:
-                    qa_dict[current_question] = line
-            
-            # Extract raw question blocks for error reporting
-            question_blocks = ExamBuilder.extract_question_blocks(content)
-            
-            # Parse all questions
-            current_question_line = ""
-            current_answers = []
+            # Validate questions that have answers
             question_num = 0
-            
-            for line in lines:
-                line = line.strip()
-                if not line:
+            for block in blocks:
+                if not block.answers:
                     continue
-                
-                if re.match(ExamBuilder.QUESTION_PATTERN, line):
-                    # Validate previous question if exists
-                    if current_question_line and current_answers:
-                        question_num += 1
-                        metadata['total_questions'] += 1
-                        ExamBuilder._validate_question(
-                            question_num, current_question_line, current_answers,
-                            qa_dict, question_blocks, metadata
-                        )
-                    
-                    current_question_line = line
-                    current_answers = []
-                else:
-                    current_answers.append(line)
-            
-            # Validate last question
-            if current_question_line and current_answers:
                 question_num += 1
                 metadata['total_questions'] += 1
-                ExamBuilder._validate_question(
-                    question_num, current_question_line, current_answers,
-                    qa_dict, question_blocks, metadata
-                )
+                ExamBuilder._validate_question(question_num, block, qa_dict, metadata)
             
             # Determine exam type
             if metadata['multiple_choice_count'] > 0 and metadata['open_questions_count'] > 0:
@@ -640,11 +502,11 @@ class ExamBuilder:
         return metadata
     
     @staticmethod
-    def _validate_question(question_num, question_line, answers, qa_dict, question_blocks, metadata):
+    def _validate_question(question_num, block, qa_dict, metadata):
         """
         Validate a single question and update metadata
         """
-        question_text = ExamBuilder.remove_number(question_line)
+        question_text = block.text
         
         # Determine type
         q_type = 'multiple_choice'
@@ -661,10 +523,10 @@ class ExamBuilder:
         # Validate multiple choice
         if q_type == 'multiple_choice':
             # Count actual options (not answer: lines)
-            options = [a for a in answers if not a.lower().startswith('answer:')]
+            options = [a for a in block.answers if not a.lower().startswith('answer:')]
             
             # Get raw text for error reporting
-            raw_text = question_blocks.get(question_num, question_line + '\n' + '\n'.join(answers))
+            raw_text = block.raw_text
             
             # Check for correct answer
             if question_text not in qa_dict:
@@ -690,36 +552,5 @@ class ExamBuilder:
         Extract raw text blocks for each question (for error reporting)
         Returns dict: {question_number: raw_text_block}
         """
-        blocks = {}
-        lines = content.split('\n')
-        current_block = []
-        current_q_num = 0
-        
-        for line in lines:
-            line_stripped = line.strip()
-            
-            # Check if this is a new question
-            match = re.match(r'^(\d+)\.\s', line_stripped)
-            if match:
-                # Save previous block
-                if current_q_num > 0 and current_block:
-                    blocks[current_q_num] = '\n'.join(current_block)
-                
-                # Start new block
-                current_q_num = int(match.group(1))
-                current_block = [line]
-            elif current_q_num > 0:
-                # Add to current block
-                current_block.append(line)
-                
-                # Stop at next question or if we have answer line
-                if line_stripped.lower().startswith('answer:'):
-                    # Check if next line is a new question
-                    continue
-        
-        # Save last block
-        if current_q_num > 0 and current_block:
-            blocks[current_q_num] = '\n'.join(current_block)
-        
-        return blocks
-
+        blocks, _ = scan_exam(content.split('\n'))
+        return {block.number: block.raw_text for block in blocks}
@@ -0,0 +1,80 @@
+"""
+Exam Cache Service
+Process-wide cache of parsed exam files
+Each exam version (path + mtime + size) is parsed only once
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from config import app_config
+
+
+class ExamCache:
+    """LRU cache of compiled exams keyed by absolute path and file version"""
+
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # {abs_path: (version, compiled_exam)}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def file_version(filepath):
+        """Version stamp of a file: (mtime in ns, size in bytes)"""
+        stat = os.stat(filepath)
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def get(self, filepath, loader):
+        """
+        Get compiled exam for filepath, calling loader(path) on a miss
+        The returned object is shared - callers must not mutate it
+        """
+        path = os.path.abspath(filepath)
+        # Stat BEFORE reading: if the file changes while loading,
+        # the stored version is older than the file and the next call re-parses
+        version = self.file_version(path)
+
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return entry[1]
+
+        compiled = loader(path)
+
+        with self._lock:
+            self.misses += 1
+            self._entries[path] = (version, compiled)
+            self._entries.move_to_end(path)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+        return compiled
+
+    def invalidate(self, filepath):
+        """Drop cached entry for filepath (after upload/overwrite/edit/delete)"""
+        path = os.path.abspath(filepath)
+        with self._lock:
+            return self._entries.pop(path, None) is not None
+
+    def clear(self):
+        """Drop all cached entries"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Cache statistics for diagnostics"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+
+# Shared process-wide instance
+exam_cache = ExamCache(max_entries=app_config.EXAM_CACHE_MAX_ENTRIES)
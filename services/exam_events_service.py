@@ -0,0 +1,127 @@
+"""
+Exam Events Service
+Fan-out of exam control events (end, pause, resume, extend_time, announcement) to students
+All clients of an exam in a process wait on one shared condition; with a store, the
+events table is polled once per interval per process - not once per connected student
+"""
+
+import itertools
+import threading
+import time
+from collections import deque
+
+EVENT_TYPES = ('end', 'pause', 'resume', 'extend_time', 'announcement')
+
+
+class _Channel:
+    """Recent events of one exam and the condition its subscribers wait on"""
+
+    __slots__ = ('condition', 'events', 'last_id', 'next_poll', 'polling')
+
+    def __init__(self, history):
+        self.condition = threading.Condition()
+        self.events = deque(maxlen=history)
+        self.last_id = 0
+        self.next_poll = 0.0  # monotonic time of the next store poll
+        self.polling = False
+
+
+class ExamEventBroadcaster:
+    """Publishes exam events and wakes every waiting client at once"""
+
+    def __init__(self, store=None, poll_interval=1.0, history=200):
+        self.store = store  # ExamSessionStore - shares events between worker processes
+        self.poll_interval = poll_interval
+        self.history = history
+        self._channels = {}  # {exam_id: _Channel}
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)  # Event ids when there is no store
+
+    def _channel(self, exam_id):
+        channel = self._channels.get(exam_id)
+        if channel is None:
+            with self._lock:
+                channel = self._channels.setdefault(exam_id, _Channel(self.history))
+        return channel
+
+    def publish(self, exam_id, event_type, data=None):
+        """Record an event and wake all subscribers of the exam. Returns the event"""
+        if event_type not in EVENT_TYPES:
+            raise ValueError(f"Unknown exam event: {event_type}")
+        data = data or {}
+        channel = self._channel(exam_id)
+
+        if self.store:
+            event_id = self.store.add_event(exam_id, event_type, data, time.time())
+            # Pull it (and anything other workers wrote before it) in id order
+            self._refresh(exam_id, channel, force=True)
+            with channel.condition:
+                for event in channel.events:
+                    if event['id'] == event_id:
+                        return event
+            return {'id': event_id, 'type': event_type, 'data': data}
+
+        event = {'id': next(self._ids), 'type': event_type, 'data': data, 'created_at': time.time()}
+        with channel.condition:
+            channel.events.append(event)
+            channel.last_id = event['id']
+            channel.condition.notify_all()
+        return event
+
+    def last_event_id(self, exam_id):
+        """Id of the newest event of the exam (0 if none)"""
+        channel = self._channel(exam_id)
+        self._refresh(exam_id, channel)
+        return channel.last_id
+
+    def events_since(self, exam_id, after_id):
+        """Events with id > after_id, oldest first"""
+        channel = self._channel(exam_id)
+        self._refresh(exam_id, channel)
+        with channel.condition:
+            events = list(channel.events)
+        if self.store and events and after_id < events[0]['id'] - 1:
+            # Older than the in-memory history
+            return self.store.list_events(exam_id, after_id, limit=self.history)
+        return [event for event in events if event['id'] > after_id]
+
+    def wait(self, exam_id, after_id, timeout):
+        """
+        Block until the exam has events newer than after_id or timeout expires
+        Returns the new events (empty list on timeout)
+        """
+        channel = self._channel(exam_id)
+        deadline = time.monotonic() + timeout
+        while True:
+            events = self.events_since(exam_id, after_id)
+            remaining = deadline - time.monotonic()
+            if events or remaining <= 0:
+                return events
+            with channel.condition:
+                if channel.last_id <= after_id:
+                    channel.condition.wait(min(remaining, self.poll_interval) if self.store else remaining)
+
+    def _refresh(self, exam_id, channel, force=False):
+        """Fetch events written by other workers - one thread per channel and interval"""
+        if not self.store:
+            return
+        with channel.condition:
+            now = time.monotonic()
+            if channel.polling or (not force and now < channel.next_poll):
+                return
+            channel.polling = True
+            after_id = channel.last_id
+        try:
+            events = self.store.list_events(exam_id, after_id, limit=self.history)
+        finally:
+            with channel.condition:
+                channel.polling = False
+                channel.next_poll = time.monotonic() + self.poll_interval
+        if not events:
+            return
+        with channel.condition:
+            for event in events:
+                if event['id'] > channel.last_id:
+                    channel.events.append(event)
+                    channel.last_id = event['id']
+            channel.condition.notify_all()
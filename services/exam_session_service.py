@@ -1,15 +1,35 @@
 """
 Exam Session Service
 Manages exam sessions, student tracking, and proctoring
+Sessions live in memory and, when a store is configured, are written through
+to SQLite so several worker processes can share them
+Safe for threaded servers: mutations of a session run under its lock, see ExamSession
 """
 
+import json
+import secrets
+import sys
+import threading
+import time
 import uuid
 from datetime import datetime
 from typing import Dict, Optional
+from services.exam_builder_service import ExamBuilder
+from services.student_record import StudentRecord
+
+ACTIVE_STATUSES = ("running", "paused")
 
 
 class ExamSession:
-    """Represents a single running exam session"""
+    """
+    Represents a single running exam session
+    Consistency contract (threaded servers):
+    - Every mutation holds self.lock (re-entrant) - it is applied, bumps version exactly
+      once and is written to the store before another mutation of this session starts
+    - Readers do not lock: a field is seen before or after a mutation, never half-set;
+      iterate over students through a snapshot (students_snapshot) as students may be added
+    - Different sessions never share a lock (no contention between exams)
+    """
     
     def __init__(self, exam_id: int, teacher_id: str, exam_filename: str, exam_title: str, settings: dict = None):
         self.exam_id = exam_id
@@ -18,88 +38,441 @@ class ExamSession:
         self.exam_title = exam_title
         self.start_time = datetime.now()
         self.status = "running"  # running, paused, ended
-        self.students = {}  # {student_session_id: student_data}
+        self.students = {}  # {student_session_id: StudentRecord}
         self.settings = settings or {}  # exam settings: shuffle, max_questions, port, duration
         self.results_folder = None  # Path to results folder (created at exam start)
+        self.version = 0  # Bumped on every change (matches store version when persisted)
+        self.synced_version = 0  # Store version up to which changes of other workers are loaded
+        self.store = None  # ExamSessionStore when sessions are persisted
+        self.exam_data = None  # Compiled exam, shared read-only by all students
+        self.exam_version = None  # File version (mtime_ns, size) exam_data was compiled from
+        self._payloads = {}  # {student_session_id: question payload} built once per student
+        self.listener = None  # Called after every change (wakes long-polling monitors)
+        self.status_listener = None  # Called with the session after a status change (manager indexes)
+        self.lock = threading.RLock()  # Held by every mutation (kept across store reloads)
+    
+    def _changed(self, student_session_id: str = None):
+        """Record a local change - stamps the student with the new session version"""
+        self.version += 1
+        if student_session_id in self.students:
+            self.students[student_session_id].version = self.version
+        if self.listener:
+            self.listener()
+    
+    def _stored(self, store_version: int):
+        """
+        After a store write (under self.lock): each write bumps both versions once, so they
+        only match if no other worker wrote since the last sync - nothing to load for it
+        """
+        if store_version == self.version:
+            self.synced_version = store_version
+    
+    def students_snapshot(self) -> list:
+        """[(student_session_id, StudentRecord)] - safe to iterate while students join"""
+        with self.lock:
+            return list(self.students.items())
+    
+    def set_results_folder(self, results_folder: str):
+        """Set results folder for this exam"""
+        with self.lock:
+            self.results_folder = results_folder
+            self._changed()
+            if self.store:
+                self._stored(self.store.update_session(self.exam_id, results_folder=results_folder))
+    
+    def end(self):
+        """Mark exam as ended"""
+        self._set_status("ended")
+    
+    def pause(self):
+        """Pause a running exam (students are blocked until resume)"""
+        self._set_status("paused")
+    
+    def resume(self):
+        """Resume a paused exam"""
+        self._set_status("running")
+    
+    def _set_status(self, status: str):
+        with self.lock:
+            self.status = status
+            self._changed()
+            if self.store:
+                self._stored(self.store.update_session(self.exam_id, status=status))
+            if self.status_listener:
+                self.status_listener(self)
+    
+    def extend_time(self, minutes: int) -> int:
+        """Add minutes to the exam duration. Returns the new duration"""
+        with self.lock:
+            self.settings['exam_duration'] = int(self.settings.get('exam_duration') or 0) + minutes
+            self._changed()
+            if self.store:
+                self._stored(self.store.update_session(self.exam_id, settings=self.settings))
+            return self.settings['exam_duration']
+    
+    def apply_store_changes(self, row: dict, students: Dict):
+        """
+        Take over changes made by other workers: the session row and the changed students
+        Known students are updated in place (threads holding the record see the new state)
+        """
+        with self.lock:
+            self.settings = json.loads(row['settings_json']) if row['settings_json'] else {}
+            self.results_folder = row['results_folder']
+            for student_session_id, loaded in students.items():
+                student = self.students.get(student_session_id)
+                if student is None:
+                    self.students[student_session_id] = loaded
+                    continue
+                if loaded.status == 'in_progress':
+                    # Autosaves are not versioned - keep answers newer here than the stored ones
+                    for question, seq in student.answer_seqs.items():
+                        if seq > loaded.answer_seqs.get(question, 0):
+                            loaded.answers[question] = student.answers.get(question)
+                            loaded.answer_seqs[question] = seq
+                    loaded.autosave_seq = max(loaded.autosave_seq, student.autosave_seq)
+                for name in StudentRecord.__slots__:
+                    setattr(student, name, getattr(loaded, name))
+            self.version = self.synced_version = row['version']
+            if self.status != row['status']:
+                self.status = row['status']
+                if self.status_listener:
+                    self.status_listener(self)
+    
+    def set_exam_data(self, exam_data: dict, exam_version=None):
+        """Attach the compiled exam of file version exam_version (payloads are rebuilt)"""
+        with self.lock:
+            self.exam_data = exam_data
+            self.exam_version = exam_version
+            self._payloads = {}
+    
+    def get_student_payload(self, student_session_id: Optional[str]) -> Optional[Dict]:
+        """
+        Questions as this student sees them (shuffled with the student's seed, limited)
+        Built once and served from memory afterwards
+        Unknown/None student gets a shared payload seeded by exam_id
+        """
+        exam_data, payloads = self.exam_data, self._payloads
+        if exam_data is None:
+            return None
+        
+        student = self.students.get(student_session_id) if student_session_id else None
+        key = student_session_id if student else None
+        payload = payloads.get(key)
+        if payload is not None:
+            return payload
+        
+        # Built without the lock - two threads may build the same payload, the first one is kept
+        questions = [
+            dict(question, answers=list(question['answers']))
+            for question in exam_data['questions']
+        ]
+        if self.settings.get('shuffle_exam', False):
+            seed = student.shuffle_seed if student else self.exam_id
+            questions = ExamBuilder.shuffle_exam(questions, True, seed=seed)
+        
+        # Limit after shuffle (takes first N from shuffled list)
+        max_questions = self.settings.get('max_questions', 1000)
+        questions = questions[:max_questions]
+        
+        payload = {
+            'questions': questions,
+            'text_direction': exam_data['text_direction'],
+            'total_questions': len(questions)
+        }
+        with self.lock:
+            return payloads.setdefault(key, payload)
     
     def add_student(self, first_name: str, last_name: str):
         """Add a student to this exam session"""
         student_session_id = str(uuid.uuid4())
         
-        self.students[student_session_id] = {
-            'first_name': first_name,
-            'last_name': last_name,
-            'start_time': datetime.now(),
-            'status': 'in_progress',  # in_progress, completed, abandoned
-            'score': None,
-            'answers': {},
-            'refresh_attempts': 0,
-            'cheating_attempts': 0,
-            'cheating_log': [],
-            'end_time': None,
-            'time_spent': 0
-        }
+        # NEW v5: Slotted record with float timestamps instead of a 15-key dict per student
+        # REMARK: Previously every student was a dict holding datetimes and a list of event dicts
+        student = StudentRecord(
+            first_name, last_name, time.time(),
+            shuffle_seed=secrets.randbits(32)  # Fixed question/answer order for this student
+        )
+        with self.lock:
+            self.students[student_session_id] = student
+            self._changed(student_session_id)
+            if self.store:
+                self._stored(self.store.insert_student(self.exam_id, student_session_id, student))
         
         return student_session_id
     
-    def get_student(self, student_session_id: str) -> Optional[Dict]:
+    def get_student(self, student_session_id: str) -> Optional[StudentRecord]:
         """Get student data"""
         return self.students.get(student_session_id)
     
+    def find_resumable_student(self, student_session_id: str, first_name: str,
+                               last_name: str) -> Optional[StudentRecord]:
+        """In-progress student with the same name - lets a reloaded/crashed browser continue"""
+        student = self.students.get(student_session_id) if student_session_id else None
+        if not student or student.status != 'in_progress':
+            return None
+        if (student.first_name.casefold(), student.last_name.casefold()) != \
+                (first_name.casefold(), last_name.casefold()):
+            return None
+        return student
+    
+    def autosave_answers(self, student_session_id: str, seq: int, answers: Dict) -> Optional[Dict]:
+        """
+        Merge an autosaved answer delta into an in-progress student
+        An answer is taken only if seq is newer than the one that set it (out-of-order requests)
+        Returns the accepted {question: (seq, answer)} or None if the student cannot autosave
+        """
+        student = self.students.get(student_session_id)
+        if not student:
+            return None
+        
+        with self.lock:
+            if student.status != 'in_progress':
+                return None
+            seqs = student.answer_seqs
+            accepted = {}
+            for question, answer in answers.items():
+                if seq > seqs.get(question, 0):
+                    student.answers[question] = answer
+                    seqs[question] = seq
+                    accepted[question] = (seq, answer)
+            if accepted:
+                student.autosave_seq = max(student.autosave_seq, seq)
+        # No _changed(): monitors do not show answers, and keystrokes must not wake them
+        return accepted
+    
     def log_cheating_attempt(self, student_session_id: str, attempt_type: str, details=None):
         """Log a cheating attempt for a student"""
-        if student_session_id in self.students:
-            student = self.students[student_session_id]
-            student['cheating_attempts'] += 1
-            
-            attempt_log = {
-                'timestamp': datetime.now().isoformat(),
-                'type': attempt_type,
-                'details': details
-            }
-            student['cheating_log'].append(attempt_log)
+        self.log_cheating_attempts(student_session_id, [(attempt_type, details, None)])
+    
+    def log_cheating_attempts(self, student_session_id: str, attempts) -> int:
+        """
+        Log a batch of cheating attempts - one version bump and one store write
+        attempts: [(attempt_type, details, timestamp)], timestamp a datetime or None (now)
+        Returns the number logged
+        """
+        student = self.students.get(student_session_id)
+        if not student or not attempts:
+            return 0
+        
+        now = time.time()
+        # Types are interned by the cheating log (str() - clients may leave the type out)
+        events = [(timestamp.timestamp() if timestamp else now, attempt_type, details)
+                  for attempt_type, details, timestamp in attempts]
+        with self.lock:
+            for timestamp, attempt_type, details in events:
+                student.cheating_log.append(timestamp, attempt_type, details)
+            self._changed(student_session_id)
+            if self.store:
+                self._stored(self.store.add_cheating_events(self.exam_id, student_session_id, [{
+                    'timestamp': datetime.fromtimestamp(timestamp).isoformat(),
+                    'type': attempt_type,
+                    'details': details
+                } for timestamp, attempt_type, details in events]))
+        return len(events)
     
     def submit_student_exam(self, student_session_id: str, answers: Dict, score: float):
         """Mark student exam as completed"""
-        if student_session_id in self.students:
-            student = self.students[student_session_id]
-            student['status'] = 'completed'
-            student['score'] = score
-            student['answers'] = answers
-            student['end_time'] = datetime.now()
-            student['time_spent'] = (
-                student['end_time'] - student['start_time']
-            ).total_seconds()
-            
-            return True
+        student = self.students.get(student_session_id)
+        if student is None:
+            return False
         
-        return False
+        with self.lock:
+            student.status = 'completed'
+            student.score = score
+            student.answers = answers
+            student.end_time = time.time()
+            student.time_spent = student.end_time - student.start_time
+            self._changed(student_session_id)
+            if self.store:
+                self._stored(self.store.update_student_submission(self.exam_id, student_session_id, student))
+        
+        return True
+    
+    def memory_report(self) -> Dict:
+        """Approximate memory held by this session's students, cheating logs and payload cache"""
+        student_bytes = cheating_log_bytes = events_kept = events_total = 0
+        for student_session_id, student in self.students_snapshot():
+            cheating_log = student.cheating_log
+            log_bytes = cheating_log.memory_bytes()
+            student_bytes += student.memory_bytes() - log_bytes + sys.getsizeof(student_session_id)
+            cheating_log_bytes += log_bytes
+            events_kept += len(cheating_log)
+            events_total += cheating_log.total
+        student_bytes += sys.getsizeof(self.students)
+        # Payload question copies only - texts are shared with the compiled exam
+        payloads = self._payloads
+        payload_bytes = sys.getsizeof(payloads) + sum(
+            sys.getsizeof(payload) + sys.getsizeof(payload['questions']) + sum(
+                sys.getsizeof(question) + sys.getsizeof(question['answers'])
+                for question in payload['questions']
+            )
+            for payload in list(payloads.values())
+        )
+        return {
+            'exam_id': self.exam_id,
+            'students': len(self.students),
+            'cheating_events_kept': events_kept,
+            'cheating_events_total': events_total,
+            'student_bytes': student_bytes,
+            'cheating_log_bytes': cheating_log_bytes,
+            'payload_cache_bytes': payload_bytes,
+            'total_bytes': student_bytes + cheating_log_bytes + payload_bytes
+        }
 
 
 class ExamSessionManager:
     """Manages all active exam sessions"""
     
-    def __init__(self):
+    def __init__(self, store=None, id_sequence=None, retention_seconds=None):
+        """
+        store: ExamSessionStore - sessions shared by workers (the store allocates exam IDs)
+        id_sequence: ExamIdSequence - durable exam IDs for a manager without a store
+        retention_seconds: ended sessions are dropped from memory after this long (None = kept)
+        """
         self.sessions = {}  # {exam_id: ExamSession}
-        self.next_exam_id = 1
+        self.next_exam_id = 1  # Used only without store and id_sequence (tests)
+        # NEW v5: Optional SQLite store shared by all worker processes
+        # REMARK: Previously sessions lived only in this process and were lost on restart
+        self.store = store
+        # NEW v5: Exam IDs never restart at 1 - an old student URL cannot reach another teacher's exam
+        # REMARK: Previously the in-process counter was reset by every restart
+        self.id_sequence = id_sequence
+        self.retention_seconds = retention_seconds
+        # NEW v5: Secondary indexes - active exams per teacher, ended exams in end order
+        # REMARK: Previously every active-exams call filtered all sessions ever created
+        self._active_by_teacher = {}  # {teacher_id: {exam_id}}
+        self._ended = {}  # {exam_id: monotonic time it was seen ended} - insertion ordered
+        self._index_lock = threading.Lock()
+        # NEW v5: Guards sessions, next_exam_id and store reloads (threaded servers)
+        # REMARK: Previously concurrent starts could hand out the same exam ID
+        self._lock = threading.RLock()
+        # NEW v5: Monitors long-poll on this condition instead of re-fetching every 2 seconds
+        self._changes = threading.Condition()
+        self._change_count = 0
+    
+    def _notify_change(self):
+        """Wake up monitors waiting for a session change"""
+        with self._changes:
+            self._change_count += 1
+            self._changes.notify_all()
     
     def start_exam(self, teacher_id: str, exam_filename: str, exam_title: str, settings: dict = None) -> int:
         """Create a new exam session"""
-        exam_id = self.next_exam_id
-        self.next_exam_id += 1
+        if self.store:
+            # Store allocates exam IDs - unique across workers and restarts
+            session = ExamSession(None, teacher_id, exam_filename, exam_title, settings)
+            session.exam_id = self.store.create_session(session)
+            session.store = self.store
+        elif self.id_sequence:
+            session = ExamSession(self.id_sequence.next_id(), teacher_id, exam_filename, exam_title, settings)
+        else:
+            with self._lock:
+                exam_id = self.next_exam_id
+                self.next_exam_id += 1
+            session = ExamSession(exam_id, teacher_id, exam_filename, exam_title, settings)
         
-        session = ExamSession(exam_id, teacher_id, exam_filename, exam_title, settings)
-        self.sessions[exam_id] = session
+        self._register(session)
+        self.evict_ended()
         
-        return exam_id
+        return session.exam_id
+    
+    def _register(self, session: ExamSession):
+        """Keep a (new or reloaded) session in memory and in the indexes"""
+        session.listener = self._notify_change
+        session.status_listener = self._index_status
+        with self._lock:
+            self.sessions[session.exam_id] = session
+            self._index_status(session)
+    
+    def _index_status(self, session: ExamSession):
+        """Move a session between the active-per-teacher and ended indexes"""
+        with self._index_lock:
+            exam_id = session.exam_id
+            if session.status in ACTIVE_STATUSES:
+                self._active_by_teacher.setdefault(session.teacher_id, set()).add(exam_id)
+                self._ended.pop(exam_id, None)
+                return
+            active = self._active_by_teacher.get(session.teacher_id)
+            if active is not None:
+                active.discard(exam_id)
+                if not active:
+                    del self._active_by_teacher[session.teacher_id]
+            self._ended.setdefault(exam_id, time.monotonic())
+    
+    def evict_ended(self) -> int:
+        """Drop sessions ended more than retention_seconds ago from memory. Returns the count"""
+        if self.retention_seconds is None:
+            return 0
+        cutoff = time.monotonic() - self.retention_seconds
+        evicted = []
+        with self._lock, self._index_lock:
+            # Oldest first - stop at the first one still retained
+            for exam_id, ended_at in self._ended.items():
+                if ended_at > cutoff:
+                    break
+                evicted.append(exam_id)
+            for exam_id in evicted:
+                del self._ended[exam_id]
+                self.sessions.pop(exam_id, None)
+        return len(evicted)
     
     def get_session(self, exam_id: int) -> Optional[ExamSession]:
         """Get exam session by ID"""
-        return self.sessions.get(exam_id)
+        session = self.sessions.get(exam_id)
+        if self.store:
+            session = self._sync_from_store(exam_id, session)
+        return session
+    
+    def _sync_from_store(self, exam_id: int, session: Optional[ExamSession]) -> Optional[ExamSession]:
+        """Load session from store if not loaded yet, else take over what other processes changed"""
+        stored_version = self.store.get_version(exam_id)
+        if stored_version is None:
+            return session
+        if session is None:
+            return self._load(exam_id)
+        if session.version == stored_version:
+            return session
+        
+        # NEW v5: Only the session row and students changed since the last sync are read,
+        # under this session's lock only (other exams of the worker are not blocked)
+        # REMARK: Previously the whole session was reloaded under the manager lock
+        # Under the session lock no local mutation is half done (memory bumped, store not yet)
+        with session.lock:
+            if session.version == self.store.get_version(exam_id):  # Synced by another thread meanwhile
+                session.synced_version = session.version
+            else:
+                changes = self.store.load_changes(exam_id, session.synced_version)
+                if changes is not None:
+                    session.apply_store_changes(*changes)
+        return session
+    
+    def _load(self, exam_id: int) -> Optional[ExamSession]:
+        """Load a session this process does not have in memory yet"""
+        loaded = self.store.load_session(exam_id)
+        if loaded is None:
+            return None
+        
+        row, students = loaded
+        fresh = ExamSession(row['exam_id'], row['teacher_id'], row['exam_filename'], row['exam_title'],
+                            json.loads(row['settings_json']) if row['settings_json'] else {})
+        fresh.start_time = datetime.fromisoformat(row['start_time'])
+        fresh.status = row['status']
+        fresh.results_folder = row['results_folder']
+        fresh.students = students
+        fresh.version = fresh.synced_version = row['version']
+        fresh.store = self.store
+        
+        with self._lock:
+            # Another thread may have loaded it meanwhile
+            current = self.sessions.get(exam_id)
+            if current is not None:
+                return current
+            self._register(fresh)
+        return fresh
     
     def add_student_to_exam(self, exam_id: int, first_name: str, last_name: str) -> Optional[str]:
         """Add student to exam session"""
-        session = self.sessions.get(exam_id)
+        session = self.get_session(exam_id)
         if not session:
             return None
         
@@ -119,48 +492,92 @@ class ExamSessionManager:
     
     def get_all_active_sessions(self) -> Dict[int, ExamSession]:
         """Get all active exam sessions"""
-        return {
-            exam_id: session 
-            for exam_id, session in self.sessions.items() 
-            if session.status == "running"
-        }
+        return self.get_active_sessions()
     
-    def get_session_students_summary(self, exam_id: int) -> list:
-        """Get summary of all students in a session"""
-        session = self.sessions.get(exam_id)
+    def get_active_sessions(self, teacher_id: str = None) -> Dict[int, ExamSession]:
+        """Active (running or paused) sessions, of one teacher or of all - O(active sessions)"""
+        self.evict_ended()
+        if self.store:
+            # Include sessions started by other worker processes (teacher/status index)
+            exam_ids = self.store.list_session_ids(status=ACTIVE_STATUSES, teacher_id=teacher_id)
+        else:
+            with self._index_lock:
+                if teacher_id is not None:
+                    exam_ids = sorted(self._active_by_teacher.get(teacher_id, ()))
+                else:
+                    exam_ids = sorted(exam_id for ids in self._active_by_teacher.values() for exam_id in ids)
+        
+        active = {}
+        for exam_id in exam_ids:
+            session = self.get_session(exam_id)
+            if session and session.status in ACTIVE_STATUSES:
+                active[exam_id] = session
+        return active
+    
+    def wait_for_change(self, exam_id: int, since: int, timeout: float,
+                        poll_interval: float = 1.0) -> Optional[ExamSession]:
+        """
+        Long-poll: return the session as soon as its version differs from since
+        (or when timeout expires). Changes made by other worker processes are
+        noticed by re-checking the store every poll_interval seconds
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._changes:
+                seen = self._change_count
+            
+            session = self.get_session(exam_id)
+            remaining = deadline - time.monotonic()
+            if session is None or session.version != since or remaining <= 0:
+                return session
+            
+            with self._changes:
+                if self._change_count == seen:
+                    self._changes.wait(min(remaining, poll_interval) if self.store else remaining)
+    
+    def get_session_students_summary(self, exam_id: int, since: int = None) -> list:
+        """
+        Get summary of students in a session
+        since: only students changed after this session version (delta feed)
+        """
+        session = self.get_session(exam_id)
         if not session:
             return []
         
         students_list = []
-        for student_id, student_data in session.students.items():
+        for student_id, student_data in session.students_snapshot():
+            if since is not None and student_data.version <= since:
+                continue
+            
             time_spent = 0
-            if student_data['status'] == 'in_progress':
-                time_spent = (
-                    datetime.now() - student_data['start_time']
-                ).total_seconds()
+            if student_data.status == 'in_progress':
+                time_spent = time.time() - student_data.start_time
             else:
-                time_spent = student_data['time_spent']
+                time_spent = student_data.time_spent
             
+            end_time = student_data.end_datetime
             students_list.append({
                 'student_session_id': student_id,
-                'name': f"{student_data['first_name']} {student_data['last_name']}",
-                'first_name': student_data['first_name'],
-                'last_name': student_data['last_name'],
-                'start_time': student_data['start_time'].isoformat(),
-                'end_time': student_data['end_time'].isoformat() if student_data['end_time'] else None,
-                'status': student_data['status'],
-                'score': student_data['score'],
-                'refresh_attempts': student_data['refresh_attempts'],
-                'cheating_attempts': student_data['cheating_attempts'],
-                'time_spent': int(time_spent)
+                'name': f"{student_data.first_name} {student_data.last_name}",
+                'first_name': student_data.first_name,
+                'last_name': student_data.last_name,
+                'start_time': student_data.start_datetime.isoformat(),
+                'start_ts': student_data.start_time,  # For client-side timers
+                'end_time': end_time.isoformat() if end_time else None,
+                'status': student_data.status,
+                'score': student_data.score,
+                'refresh_attempts': student_data.refresh_attempts,
+                'cheating_attempts': student_data.cheating_attempts,
+                'time_spent': int(time_spent),
+                'version': student_data.version
             })
         
         return students_list
     
     def end_session(self, exam_id: int) -> bool:
         """End an exam session"""
-        session = self.sessions.get(exam_id)
+        session = self.get_session(exam_id)
         if session:
-            session.status = "ended"
+            session.end()
             return True
         return False
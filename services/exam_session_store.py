@@ -0,0 +1,437 @@
+"""
+Exam Session Store
+SQLite persistence for exam sessions, students and cheating events
+Lets several worker processes share running exams and survive restarts
+"""
+
+import json
+import os
+import sqlite3
+import logging
+from datetime import datetime
+from config import app_config
+from services.db_pool import ConnectionPool
+from services.student_record import StudentRecord
+
+logger = logging.getLogger(__name__)
+
+
+class ExamSessionStore:
+    """SQLite (WAL) backend for ExamSessionManager"""
+
+    def __init__(self, db_path=None):
+        """Initialize session store"""
+        if db_path is None:
+            db_path = app_config.SESSIONS_DB_PATH
+        self.db_path = db_path
+        self.pool = ConnectionPool(db_path, row_factory=sqlite3.Row)  # WAL, one connection per thread
+        self.init_db()
+
+    def init_db(self):
+        """Create tables and indexes"""
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+
+        conn = self.pool.connection()
+        conn.executescript('''
+            CREATE TABLE IF NOT EXISTS exam_sessions (
+                exam_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                teacher_id TEXT NOT NULL,
+                exam_filename TEXT NOT NULL,
+                exam_title TEXT NOT NULL,
+                start_time TEXT NOT NULL,
+                status TEXT NOT NULL,
+                settings_json TEXT,
+                results_folder TEXT,
+                version INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS idx_sessions_teacher_status
+                ON exam_sessions (teacher_id, status);
+            CREATE INDEX IF NOT EXISTS idx_sessions_status
+                ON exam_sessions (status);
+
+            CREATE TABLE IF NOT EXISTS exam_students (
+                student_session_id TEXT PRIMARY KEY,
+                exam_id INTEGER NOT NULL,
+                first_name TEXT NOT NULL,
+                last_name TEXT NOT NULL,
+                start_time TEXT NOT NULL,
+                status TEXT NOT NULL,
+                score NUMERIC,
+                answers_json TEXT,
+                refresh_attempts INTEGER NOT NULL DEFAULT 0,
+                cheating_attempts INTEGER NOT NULL DEFAULT 0,
+                end_time TEXT,
+                time_spent REAL NOT NULL DEFAULT 0,
+                shuffle_seed INTEGER,
+                version INTEGER NOT NULL DEFAULT 0,
+                autosave_seq INTEGER NOT NULL DEFAULT 0,
+                answer_seqs_json TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_students_exam
+                ON exam_students (exam_id);
+
+            CREATE TABLE IF NOT EXISTS cheating_events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                exam_id INTEGER NOT NULL,
+                student_session_id TEXT NOT NULL,
+                timestamp TEXT NOT NULL,
+                attempt_type TEXT,
+                details_json TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_cheating_exam_student
+                ON cheating_events (exam_id, student_session_id);
+
+            CREATE TABLE IF NOT EXISTS exam_events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                exam_id INTEGER NOT NULL,
+                event_type TEXT NOT NULL,
+                data_json TEXT,
+                created_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_events_exam
+                ON exam_events (exam_id, id);
+        ''')
+        # Databases created before versioning and per-student shuffle
+        session_columns = {row['name'] for row in conn.execute('PRAGMA table_info(exam_sessions)')}
+        if 'version' not in session_columns:
+            conn.execute('ALTER TABLE exam_sessions ADD COLUMN version INTEGER NOT NULL DEFAULT 0')
+        columns = {row['name'] for row in conn.execute('PRAGMA table_info(exam_students)')}
+        if 'version' not in columns:
+            conn.execute('ALTER TABLE exam_students ADD COLUMN version INTEGER NOT NULL DEFAULT 0')
+        if 'shuffle_seed' not in columns:
+            conn.execute('ALTER TABLE exam_students ADD COLUMN shuffle_seed INTEGER')
+            # Students already in the table keep one fixed order from now on
+            conn.execute('UPDATE exam_students SET shuffle_seed = abs(random() % 4294967296)')
+        # Databases created before autosave
+        if 'autosave_seq' not in columns:
+            conn.execute('ALTER TABLE exam_students ADD COLUMN autosave_seq INTEGER NOT NULL DEFAULT 0')
+        if 'answer_seqs_json' not in columns:
+            conn.execute('ALTER TABLE exam_students ADD COLUMN answer_seqs_json TEXT')
+        # Students changed after a version (incremental reload) - needs the migrated column
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_students_exam_version ON exam_students (exam_id, version)')
+        conn.commit()
+
+    # ------------------------------------------------------------------
+    # Writes - every write bumps the session version in the same transaction
+    # and returns the new version
+    # ------------------------------------------------------------------
+
+    def _write(self, exam_id, statements, student_session_id=None):
+        conn = self.pool.connection()
+        with conn:
+            for sql, params in statements:
+                conn.execute(sql, params)
+            conn.execute(
+                'UPDATE exam_sessions SET version = version + 1 WHERE exam_id = ?',
+                (exam_id,)
+            )
+            if student_session_id is not None:
+                # Stamp the student so monitors can fetch only changed students
+                conn.execute('''
+                    UPDATE exam_students
+                    SET version = (SELECT version FROM exam_sessions WHERE exam_id = ?)
+                    WHERE student_session_id = ?
+                ''', (exam_id, student_session_id))
+            return conn.execute(
+                'SELECT version FROM exam_sessions WHERE exam_id = ?', (exam_id,)
+            ).fetchone()['version']
+
+    def create_session(self, session):
+        """Insert a new session row. Returns the allocated exam_id"""
+        conn = self.pool.connection()
+        with conn:
+            cursor = conn.execute('''
+                INSERT INTO exam_sessions
+                    (teacher_id, exam_filename, exam_title, start_time, status,
+                     settings_json, results_folder, version)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                session.teacher_id, session.exam_filename, session.exam_title,
+                session.start_time.isoformat(), session.status,
+                json.dumps(session.settings, ensure_ascii=False),
+                session.results_folder, session.version
+            ))
+        exam_id = cursor.lastrowid
+        logger.info("Exam session stored - exam_id=%s teacher_id=%s", exam_id, session.teacher_id)
+        return exam_id
+
+    def update_session(self, exam_id, status=None, results_folder=None, settings=None):
+        """Update session status, results folder and/or settings"""
+        statements = []
+        if settings is not None:
+            statements.append(('UPDATE exam_sessions SET settings_json = ? WHERE exam_id = ?',
+                               (json.dumps(settings, ensure_ascii=False), exam_id)))
+        if status is not None:
+            statements.append(('UPDATE exam_sessions SET status = ? WHERE exam_id = ?', (status, exam_id)))
+        if results_folder is not None:
+            statements.append(('UPDATE exam_sessions SET results_folder = ? WHERE exam_id = ?', (results_folder, exam_id)))
+        return self._write(exam_id, statements)
+
+    def insert_student(self, exam_id, student_session_id, student):
+        """Insert a newly joined student"""
+        return self._write(exam_id, [('''
+            INSERT INTO exam_students
+                (student_session_id, exam_id, first_name, last_name, start_time, status, shuffle_seed)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            student_session_id, exam_id, student.first_name, student.last_name,
+            student.start_datetime.isoformat(), student.status, student.shuffle_seed
+        ))], student_session_id)
+
+    def add_cheating_event(self, exam_id, student_session_id, attempt_log):
+        """Append a cheating event and bump the student's counter"""
+        return self.add_cheating_events(exam_id, student_session_id, [attempt_log])
+
+    def add_cheating_events(self, exam_id, student_session_id, attempt_logs):
+        """Append a batch of cheating events in one transaction (one version bump)"""
+        statements = [('''
+            INSERT INTO cheating_events
+                (exam_id, student_session_id, timestamp, attempt_type, details_json)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (
+            exam_id, student_session_id, attempt_log['timestamp'], attempt_log['type'],
+            json.dumps(attempt_log['details'], ensure_ascii=False)
+        )) for attempt_log in attempt_logs]
+        statements.append(('''
+            UPDATE exam_students SET cheating_attempts = cheating_attempts + ?
+            WHERE student_session_id = ?
+        ''', (len(attempt_logs), student_session_id)))
+        return self._write(exam_id, statements, student_session_id)
+
+    def update_student_submission(self, exam_id, student_session_id, student):
+        """Store final status, score and answers of a student"""
+        return self._write(exam_id, [('''
+            UPDATE exam_students
+            SET status = ?, score = ?, answers_json = ?, end_time = ?, time_spent = ?
+            WHERE student_session_id = ?
+        ''', (
+            student.status, student.score,
+            json.dumps(student.answers, ensure_ascii=False),
+            student.end_datetime.isoformat() if student.end_time is not None else None,
+            student.time_spent, student_session_id
+        ))], student_session_id)
+
+    def save_autosave(self, student_session_id, entries):
+        """
+        Merge autosaved answers of an in-progress student
+        entries: {question: (seq, answer)} - replaces the stored answer only if seq is newer
+        Does not bump the session version - typing must not make every worker reload the session
+        Returns False if the student is unknown or already submitted
+        """
+        conn = self.pool.connection()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')  # No other flush between read and write
+            row = conn.execute('''
+                SELECT answers_json, answer_seqs_json, autosave_seq FROM exam_students
+                WHERE student_session_id = ? AND status = 'in_progress'
+            ''', (student_session_id,)).fetchone()
+            if row is None:
+                return False
+            answers = json.loads(row['answers_json']) if row['answers_json'] else {}
+            seqs = json.loads(row['answer_seqs_json']) if row['answer_seqs_json'] else {}
+            autosave_seq = row['autosave_seq']
+            for question, (seq, answer) in entries.items():
+                if seq > seqs.get(question, 0):
+                    answers[question] = answer
+                    seqs[question] = seq
+                    autosave_seq = max(autosave_seq, seq)
+            conn.execute('''
+                UPDATE exam_students SET answers_json = ?, answer_seqs_json = ?, autosave_seq = ?
+                WHERE student_session_id = ?
+            ''', (json.dumps(answers, ensure_ascii=False), json.dumps(seqs, ensure_ascii=False),
+                  autosave_seq, student_session_id))
+        return True
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    def get_autosave(self, student_session_id):
+        """Autosaved answers of a student as {question: (seq, answer)}, None if unknown"""
+        conn = self.pool.connection()
+        row = conn.execute('''
+            SELECT answers_json, answer_seqs_json FROM exam_students WHERE student_session_id = ?
+        ''', (student_session_id,)).fetchone()
+        if row is None:
+            return None
+        answers = json.loads(row['answers_json']) if row['answers_json'] else {}
+        seqs = json.loads(row['answer_seqs_json']) if row['answer_seqs_json'] else {}
+        return {question: (seqs.get(question, 0), answer) for question, answer in answers.items()}
+
+    def get_version(self, exam_id):
+        """Current version of a session, None if it does not exist"""
+        conn = self.pool.connection()
+        row = conn.execute(
+            'SELECT version FROM exam_sessions WHERE exam_id = ?', (exam_id,)
+        ).fetchone()
+        return row['version'] if row else None
+
+    def list_session_ids(self, status=None, teacher_id=None):
+        """
+        List exam IDs, optionally filtered by status (one status or a list of them) and teacher
+        Served by idx_sessions_teacher_status / idx_sessions_status
+        """
+        clauses, params = [], []
+        if teacher_id is not None:
+            clauses.append('teacher_id = ?')
+            params.append(teacher_id)
+        if status is not None:
+            statuses = [status] if isinstance(status, str) else list(status)
+            clauses.append(f"status IN ({','.join('?' * len(statuses))})")
+            params.extend(statuses)
+        where = f"WHERE {' AND '.join(clauses)} " if clauses else ''
+        conn = self.pool.connection()
+        rows = conn.execute(f'SELECT exam_id FROM exam_sessions {where}ORDER BY exam_id', params).fetchall()
+        return [row['exam_id'] for row in rows]
+
+    # ------------------------------------------------------------------
+    # Exam control events (end, pause, resume, extend_time, announcement)
+    # ------------------------------------------------------------------
+
+    def add_event(self, exam_id, event_type, data, created_at):
+        """Append a control event. Returns its id (increasing across all workers)"""
+        conn = self.pool.connection()
+        with conn:
+            cursor = conn.execute('''
+                INSERT INTO exam_events (exam_id, event_type, data_json, created_at)
+                VALUES (?, ?, ?, ?)
+            ''', (exam_id, event_type, json.dumps(data, ensure_ascii=False), created_at))
+        return cursor.lastrowid
+
+    def list_events(self, exam_id, after_id=0, limit=200):
+        """Events of an exam with id > after_id, oldest first"""
+        conn = self.pool.connection()
+        rows = conn.execute('''
+            SELECT * FROM exam_events WHERE exam_id = ? AND id > ? ORDER BY id LIMIT ?
+        ''', (exam_id, after_id, limit)).fetchall()
+        return [{
+            'id': row['id'],
+            'type': row['event_type'],
+            'data': json.loads(row['data_json']) if row['data_json'] else {},
+            'created_at': row['created_at']
+        } for row in rows]
+
+    def load_session(self, exam_id):
+        """
+        Load a session with its students and cheating logs
+        Returns: (session_row, students) or None
+        students: {student_session_id: StudentRecord}
+        """
+        conn = self.pool.connection()
+        try:
+            # One read transaction = consistent snapshot of all three tables
+            conn.execute('BEGIN')
+            session_row = conn.execute(
+                'SELECT * FROM exam_sessions WHERE exam_id = ?', (exam_id,)
+            ).fetchone()
+            if session_row is None:
+                return None
+
+            students, cheating_counts = {}, {}
+            for row in conn.execute(
+                'SELECT * FROM exam_students WHERE exam_id = ? ORDER BY rowid', (exam_id,)
+            ):
+                students[row['student_session_id']] = self._student_from_row(row)
+                cheating_counts[row['student_session_id']] = row['cheating_attempts']
+
+            # The ring buffer keeps the newest events of each student
+            for row in conn.execute(
+                'SELECT * FROM cheating_events WHERE exam_id = ? ORDER BY id', (exam_id,)
+            ):
+                student = students.get(row['student_session_id'])
+                if student is not None:
+                    self._append_event(student, row)
+            for student_session_id, student in students.items():
+                student.cheating_log.total = cheating_counts[student_session_id]
+
+            return dict(session_row), students
+        finally:
+            conn.rollback()  # End the read transaction (connection is reused)
+
+    def load_changes(self, exam_id, since_version):
+        """
+        Load the session row and only the students changed after since_version
+        (each with its newest cheating events - as many as its ring buffer keeps)
+        Returns: (session_row, students) or None
+        """
+        conn = self.pool.connection()
+        try:
+            conn.execute('BEGIN')
+            session_row = conn.execute(
+                'SELECT * FROM exam_sessions WHERE exam_id = ?', (exam_id,)
+            ).fetchone()
+            if session_row is None:
+                return None
+
+            students = {}
+            for row in conn.execute(
+                'SELECT * FROM exam_students WHERE exam_id = ? AND version > ? ORDER BY rowid',
+                (exam_id, since_version)
+            ).fetchall():
+                student = self._student_from_row(row)
+                events = conn.execute('''
+                    SELECT * FROM cheating_events WHERE exam_id = ? AND student_session_id = ?
+                    ORDER BY id DESC LIMIT ?
+                ''', (exam_id, row['student_session_id'], student.cheating_log.capacity)).fetchall()
+                for event in reversed(events):
+                    self._append_event(student, event)
+                student.cheating_log.total = row['cheating_attempts']
+                students[row['student_session_id']] = student
+
+            return dict(session_row), students
+        finally:
+            conn.rollback()
+
+    @staticmethod
+    def _student_from_row(row):
+        student = StudentRecord(
+            row['first_name'], row['last_name'],
+            datetime.fromisoformat(row['start_time']).timestamp(),
+            row['shuffle_seed'], status=row['status']
+        )
+        student.score = row['score']
+        student.answers = json.loads(row['answers_json']) if row['answers_json'] else {}
+        student.refresh_attempts = row['refresh_attempts']
+        student.end_time = datetime.fromisoformat(row['end_time']).timestamp() if row['end_time'] else None
+        student.time_spent = row['time_spent']
+        student.version = row['version']
+        student.autosave_seq = row['autosave_seq']
+        student.answer_seqs = json.loads(row['answer_seqs_json']) if row['answer_seqs_json'] else {}
+        return student
+
+    @staticmethod
+    def _append_event(student, row):
+        student.cheating_log.append(
+            datetime.fromisoformat(row['timestamp']).timestamp(),
+            row['attempt_type'],
+            json.loads(row['details_json']) if row['details_json'] else None
+        )
+
+
+class ExamIdSequence:
+    """Durable exam ID allocator for managers without a session store"""
+
+    def __init__(self, db_path=None):
+        """Initialize ID sequence"""
+        if db_path is None:
+            db_path = app_config.EXAM_ID_SEQUENCE_DB_PATH
+        self.db_path = db_path
+        self.pool = ConnectionPool(db_path)
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        conn = self.pool.connection()
+        # AUTOINCREMENT never reuses an ID - not after deletes, not after a restart
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS exam_ids (
+                exam_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                allocated_at TEXT NOT NULL
+            )
+        ''')
+        conn.commit()
+
+    def next_id(self):
+        """Allocate the next exam ID (unique across processes and restarts)"""
+        conn = self.pool.connection()
+        with conn:
+            cursor = conn.execute('INSERT INTO exam_ids (allocated_at) VALUES (?)',
+                                  (datetime.now().isoformat(),))
+        return cursor.lastrowid
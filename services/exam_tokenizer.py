@@ -0,0 +1,109 @@
+"""
+Exam Tokenizer
+Single-pass streaming tokenizer for exam text files
+One precompiled regex evaluation per line, linear in file size
+"""
+
+import re
+from collections import namedtuple
+
+# Token types
+TOKEN_QUESTION = 'question'
+TOKEN_ANSWER = 'answer'
+TOKEN_OPEN_MARKER = 'open_marker'
+TOKEN_BLANK = 'blank'
+
+# Question line: optional bidi marks, number, dot, whitespace - "1. What is..."
+QUESTION_RE = re.compile(r"^[\u200E\u200F\u202A-\u202E]*(\d+)\.\s+")
+
+# Open question markers
+OPEN_EXAM_MARKERS = [
+    "Programming task:",
+    "Open Question/Multiple lines question/task:",
+    "Type your answer here"
+]
+
+# kind: token type
+# line: stripped line
+# text: question text without number (questions), otherwise same as line
+# number: question number as written in the file (questions only)
+# raw: line exactly as read (for error reporting)
+ExamToken = namedtuple('ExamToken', ['kind', 'line', 'text', 'number', 'raw'])
+
+
+class QuestionBlock:
+    """One question with its answer lines, collected in file order"""
+
+    __slots__ = ('number', 'line', 'text', 'answers', 'marker_indexes', 'raw_lines')
+
+    def __init__(self, token):
+        self.number = token.number
+        self.line = token.line            # Full question line (with number)
+        self.text = token.text            # Question text without number
+        self.answers = []                 # Stripped non-empty lines after the question
+        self.marker_indexes = []          # Indexes in answers of open question markers
+        self.raw_lines = [token.raw]      # Raw lines including blanks
+
+    @property
+    def raw_text(self):
+        """Raw block text exactly as written in the file"""
+        return '\n'.join(self.raw_lines)
+
+
+def is_open_question_marker(text):
+    """Check if text is an open question marker"""
+    return any(marker in text for marker in OPEN_EXAM_MARKERS)
+
+
+def tokenize(lines):
+    """
+    Yield one ExamToken per line
+    lines: any iterable of strings (list, file object, generator)
+    """
+    for raw in lines:
+        line = raw.strip()
+        if not line:
+            yield ExamToken(TOKEN_BLANK, '', '', None, raw)
+            continue
+
+        match = QUESTION_RE.match(line)
+        if match:
+            yield ExamToken(TOKEN_QUESTION, line, line[match.end():], int(match.group(1)), raw)
+        elif is_open_question_marker(line):
+            yield ExamToken(TOKEN_OPEN_MARKER, line, line, None, raw)
+        else:
+            yield ExamToken(TOKEN_ANSWER, line, line, None, raw)
+
+
+def scan_exam(lines):
+    """
+    Collect question blocks and the question -> first answer dictionary in one pass
+    Lines before the first question are ignored
+    Returns: (blocks, question_answer_dict)
+    """
+    blocks = []
+    question_answer_dict = {}
+    current = None
+
+    for token in tokenize(lines):
+        if token.kind == TOKEN_QUESTION:
+            current = QuestionBlock(token)
+            blocks.append(current)
+            continue
+
+        if current is None:
+            continue
+
+        current.raw_lines.append(token.raw)
+        if token.kind == TOKEN_BLANK:
+            continue
+
+        # First answer line of the first block with this question text is the correct answer
+        if not current.answers and current.text not in question_answer_dict:
+            question_answer_dict[current.text] = token.line
+
+        if token.kind == TOKEN_OPEN_MARKER:
+            current.marker_indexes.append(len(current.answers))
+        current.answers.append(token.line)
+
+    return blocks, question_answer_dict
@@ -0,0 +1,291 @@
+"""
+Item Stats Service
+Per-question counters of a results folder, updated incrementally on every submission
+Difficulty, point-biserial discrimination and distractor counts without rescanning files
+"""
+
+import json
+import math
+import os
+import sqlite3
+import warnings
+from config import app_config
+from services.db_pool import ConnectionPool
+
+try:
+    import numpy as np
+except ImportError:  # Optional - pure Python fallback for the full analysis
+    np = None
+
+# Share of students in the upper/lower groups of the classic discrimination index
+GROUP_FRACTION = 0.27
+
+
+class ItemStatsStore:
+    """SQLite sufficient statistics per (teacher, folder, question)"""
+
+    def __init__(self, db_path=None):
+        """Initialize item stats store"""
+        if db_path is None:
+            db_path = app_config.ITEM_STATS_DB_PATH
+        self.db_path = db_path
+        self.pool = ConnectionPool(db_path, row_factory=sqlite3.Row)
+        self.init_db()
+
+    def init_db(self):
+        """Create item_stats and folder_stats tables"""
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+
+        conn = self.pool.connection()
+        # Per item: answered/correct counts for difficulty, and over graded submissions
+        # n (graded), sum(x), sum(t), sum(t^2), sum(x*t) with x = 1 if correct, t = score / 100
+        # - running sums that are enough for the point-biserial discrimination
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS item_stats (
+                teacher_id TEXT NOT NULL,
+                folder_name TEXT NOT NULL,
+                question TEXT NOT NULL,
+                question_id INTEGER,
+                answered INTEGER NOT NULL DEFAULT 0,
+                correct INTEGER NOT NULL DEFAULT 0,
+                graded INTEGER NOT NULL DEFAULT 0,
+                sum_x INTEGER NOT NULL DEFAULT 0,
+                sum_t REAL NOT NULL DEFAULT 0,
+                sum_t2 REAL NOT NULL DEFAULT 0,
+                sum_xt REAL NOT NULL DEFAULT 0,
+                options TEXT NOT NULL DEFAULT '{}',
+                PRIMARY KEY (teacher_id, folder_name, question)
+            )
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS folder_stats (
+                teacher_id TEXT NOT NULL,
+                folder_name TEXT NOT NULL,
+                submissions INTEGER NOT NULL DEFAULT 0,
+                graded INTEGER NOT NULL DEFAULT 0,
+                sum_score REAL NOT NULL DEFAULT 0,
+                sum_score2 REAL NOT NULL DEFAULT 0,
+                sum_time REAL NOT NULL DEFAULT 0,
+                sum_cheating INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (teacher_id, folder_name)
+            )
+        ''')
+        conn.commit()
+
+    # ------------------------------------------------------------------
+    # Incremental updates
+    # ------------------------------------------------------------------
+
+    def record_submission(self, teacher_id, folder_name, record):
+        """Add one submissions.jsonl record to the counters"""
+        conn = self.pool.connection()
+        with conn:
+            self._add(conn, teacher_id, folder_name, record)
+
+    def rebuild(self, teacher_id, folder_name, records):
+        """Replace the counters of a folder (after regrade) from an iterable of records"""
+        conn = self.pool.connection()
+        with conn:
+            self._delete(conn, teacher_id, folder_name)
+            for record in records:
+                self._add(conn, teacher_id, folder_name, record)
+
+    def folder_deleted(self, teacher_id, folder_name):
+        """Forget the counters of a deleted folder"""
+        conn = self.pool.connection()
+        with conn:
+            self._delete(conn, teacher_id, folder_name)
+
+    def teacher_cleared(self, teacher_id):
+        """Forget all counters of a teacher"""
+        conn = self.pool.connection()
+        with conn:
+            conn.execute('DELETE FROM item_stats WHERE teacher_id = ?', (teacher_id,))
+            conn.execute('DELETE FROM folder_stats WHERE teacher_id = ?', (teacher_id,))
+
+    @staticmethod
+    def _delete(conn, teacher_id, folder_name):
+        params = (teacher_id, folder_name)
+        conn.execute('DELETE FROM item_stats WHERE teacher_id = ? AND folder_name = ?', params)
+        conn.execute('DELETE FROM folder_stats WHERE teacher_id = ? AND folder_name = ?', params)
+
+    @staticmethod
+    def _add(conn, teacher_id, folder_name, record):
+        score = record.get('score')
+        graded = score is not None
+        t = score / 100.0 if graded else 0.0
+
+        conn.execute('''
+            INSERT INTO folder_stats (teacher_id, folder_name) VALUES (?, ?)
+            ON CONFLICT (teacher_id, folder_name) DO NOTHING
+        ''', (teacher_id, folder_name))
+        conn.execute('''
+            UPDATE folder_stats
+            SET submissions = submissions + 1, graded = graded + ?,
+                sum_score = sum_score + ?, sum_score2 = sum_score2 + ?,
+                sum_time = sum_time + ?, sum_cheating = sum_cheating + ?
+            WHERE teacher_id = ? AND folder_name = ?
+        ''', (int(graded), score or 0, (score or 0) ** 2,
+              record.get('time_spent_seconds') or 0, record.get('cheating_attempts') or 0,
+              teacher_id, folder_name))
+
+        questions = [question for question in record.get('questions', []) if question.get('answer') is not None]
+        if not questions:
+            return
+
+        # One read of the folder's distractor counts, then one batched insert and update
+        options = {
+            row['question']: json.loads(row['options'])
+            for row in conn.execute(
+                'SELECT question, options FROM item_stats WHERE teacher_id = ? AND folder_name = ?',
+                (teacher_id, folder_name)
+            )
+        }
+        counters = []
+        for question in questions:
+            correct = question.get('correct')
+            x = 1 if correct else 0
+            # Point-biserial terms only for auto-graded items of graded submissions
+            use = graded and correct is not None
+            counts = options.setdefault(question['text'], {})
+            if correct is not None:
+                # Distractor frequencies - free-text answers of open questions are not counted
+                key = question['answer'].strip()
+                counts[key] = counts.get(key, 0) + 1
+            counters.append((x, int(use), x if use else 0, t if use else 0, t * t if use else 0,
+                             x * t if use else 0, question['text']))
+
+        conn.executemany('''
+            INSERT INTO item_stats (teacher_id, folder_name, question, question_id)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT (teacher_id, folder_name, question) DO NOTHING
+        ''', [(teacher_id, folder_name, question['text'], question.get('id')) for question in questions])
+        conn.executemany('''
+            UPDATE item_stats
+            SET answered = answered + 1, correct = correct + ?, graded = graded + ?,
+                sum_x = sum_x + ?, sum_t = sum_t + ?, sum_t2 = sum_t2 + ?, sum_xt = sum_xt + ?,
+                options = ?
+            WHERE teacher_id = ? AND folder_name = ? AND question = ?
+        ''', [counter[:6] + (json.dumps(options[counter[6]], ensure_ascii=False),
+                              teacher_id, folder_name, counter[6]) for counter in counters])
+
+    # ------------------------------------------------------------------
+    # Report
+    # ------------------------------------------------------------------
+
+    def get_stats(self, teacher_id, folder_name):
+        """Summary and per-item statistics from the counters (no file access)"""
+        conn = self.pool.connection()
+        folder = conn.execute(
+            'SELECT * FROM folder_stats WHERE teacher_id = ? AND folder_name = ?',
+            (teacher_id, folder_name)
+        ).fetchone()
+        rows = conn.execute('''
+            SELECT * FROM item_stats WHERE teacher_id = ? AND folder_name = ?
+            ORDER BY question_id IS NULL, question_id, question
+        ''', (teacher_id, folder_name)).fetchall()
+
+        submissions = folder['submissions'] if folder else 0
+        graded = folder['graded'] if folder else 0
+        summary = {
+            'submissions': submissions,
+            'graded': graded,
+            'mean_score': None,
+            'score_sd': None,
+            'mean_time_seconds': folder['sum_time'] / submissions if submissions else None,
+            'mean_cheating_attempts': folder['sum_cheating'] / submissions if submissions else None
+        }
+        if graded:
+            mean = folder['sum_score'] / graded
+            summary['mean_score'] = mean
+            summary['score_sd'] = math.sqrt(max(folder['sum_score2'] / graded - mean * mean, 0.0))
+
+        return {'summary': summary, 'items': [self._item(row) for row in rows]}
+
+    @staticmethod
+    def _item(row):
+        answered = row['answered']
+        options = json.loads(row['options'])
+        return {
+            'question_id': row['question_id'],
+            'question': row['question'],
+            'answered': answered,
+            'correct': row['correct'],
+            'difficulty': row['correct'] / answered if answered and options else None,
+            'discrimination': point_biserial(
+                row['graded'], row['sum_x'], row['sum_t'], row['sum_t2'], row['sum_xt']
+            ),
+            'options': sorted(
+                ({'answer': answer, 'count': count} for answer, count in options.items()),
+                key=lambda option: -option['count']
+            )
+        }
+
+
+def point_biserial(n, sum_x, sum_t, sum_t2, sum_xt):
+    """Correlation of item correctness (0/1) with total score from running sums, None if undefined"""
+    if n < 2:
+        return None
+    var_x = n * sum_x - sum_x * sum_x      # sum(x^2) == sum(x) for 0/1 values
+    var_t = n * sum_t2 - sum_t * sum_t
+    if var_x <= 0 or var_t <= 1e-12:
+        return None
+    return (n * sum_xt - sum_x * sum_t) / math.sqrt(var_x * var_t)
+
+
+def discrimination_index(records, group_fraction=GROUP_FRACTION):
+    """
+    Classic upper-lower discrimination index per question (p_upper - p_lower)
+    records: submissions.jsonl records; one pass builds a students x items matrix,
+    the groups and proportions are computed column-wise (vectorized with NumPy when installed)
+    Returns: {question text: index or None}
+    """
+    columns = {}   # question text -> column
+    scores = []
+    rows = []      # [(column, correct)] per graded student
+    for record in records:
+        if record.get('score') is None:
+            continue
+        cells = []
+        for question in record.get('questions', []):
+            if question.get('correct') is None:
+                continue
+            column = columns.setdefault(question['text'], len(columns))
+            cells.append((column, 1.0 if question['correct'] else 0.0))
+        scores.append(record['score'])
+        rows.append(cells)
+
+    group_size = int(len(rows) * group_fraction)
+    if group_size < 1 or not columns:
+        return {text: None for text in columns}
+
+    if np is not None:
+        # NaN = item not shown to the student
+        matrix = np.full((len(rows), len(columns)), np.nan)
+        for index, cells in enumerate(rows):
+            for column, value in cells:
+                matrix[index, column] = value
+        order = np.argsort(np.asarray(scores), kind='stable')
+        lower, upper = matrix[order[:group_size]], matrix[order[-group_size:]]
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)  # Item never shown in a group
+            values = np.nanmean(upper, axis=0) - np.nanmean(lower, axis=0)
+        return {text: (None if np.isnan(values[column]) else float(values[column]))
+                for text, column in columns.items()}
+
+    order = sorted(range(len(rows)), key=lambda index: scores[index])
+
+    def proportions(indexes):
+        totals = [[0.0, 0] for _ in columns]
+        for index in indexes:
+            for column, value in rows[index]:
+                totals[column][0] += value
+                totals[column][1] += 1
+        return [total / count if count else None for total, count in totals]
+
+    lower, upper = proportions(order[:group_size]), proportions(order[-group_size:])
+    return {
+        text: (upper[column] - lower[column]
+               if upper[column] is not None and lower[column] is not None else None)
+        for text, column in columns.items()
+    }
@@ -0,0 +1,46 @@
+"""
+Language Service
+Single language detection engine for exam text (Hebrew / Russian / English)
+Counts script characters on the UTF-8 bytes with C-level bytes.count - no Python loop per character
+"""
+
+import re
+
+# Language must have at least this share (percent) of all characters to be detected
+THRESHOLD = 5.0
+
+# Hebrew block U+0590..U+05FF encodes as D6 90..D6 BF and D7 80..D7 BF
+# (U+0580..U+058F under D6 is Armenian and must not be counted)
+_HEBREW_D6_RE = re.compile(rb'\xd6[\x90-\xbf]')
+# Cyrillic block U+0400..U+04FF encodes with lead bytes D0..D3
+_CYRILLIC_LEAD_BYTES = (b'\xd0', b'\xd1', b'\xd2', b'\xd3')
+
+
+def count_script_chars(text):
+    """(hebrew_count, cyrillic_count) of text - lead bytes are never continuation bytes"""
+    data = text.encode('utf-8', 'surrogatepass')
+    hebrew = data.count(b'\xd7') + len(_HEBREW_D6_RE.findall(data))
+    cyrillic = sum(data.count(lead) for lead in _CYRILLIC_LEAD_BYTES)
+    return hebrew, cyrillic
+
+
+def language_from_counts(hebrew_count, cyrillic_count, total_chars):
+    """
+    Pick language from character counts
+    Priority: Hebrew > Russian > English, each needs THRESHOLD percent of total_chars
+    """
+    if total_chars <= 0:
+        return 'en'
+    if hebrew_count * 100.0 / total_chars >= THRESHOLD:
+        return 'he'
+    if cyrillic_count * 100.0 / total_chars >= THRESHOLD:
+        return 'ru'
+    return 'en'
+
+
+def detect_language(text):
+    """'he', 'ru' or 'en' for text (percentage-based, see THRESHOLD)"""
+    if not text:
+        return 'en'
+    hebrew_count, cyrillic_count = count_script_chars(text)
+    return language_from_counts(hebrew_count, cyrillic_count, len(text))
@@ -0,0 +1,235 @@
+"""
+Log Writer Service
+Long-lived buffered appender for JSON-lines logs
+Lines are flushed by a background thread, files rotate by size and/or day,
+rotated segments are gzipped off the write path and old ones pruned
+"""
+
+import glob
+import gzip
+import os
+import shutil
+import threading
+from datetime import datetime
+
+try:
+    import fcntl  # Cross-process lock around flush/rotation (POSIX)
+except ImportError:  # Windows - standalone mode runs one process
+    fcntl = None
+
+SEGMENT_TIME_FORMAT = '%Y%m%d-%H%M%S-%f'  # Fixed width - names sort in rotation order
+
+
+class BufferedLogWriter:
+    """
+    Appends lines to one log file without an open/close per line
+    Safe when several worker processes share the file: each flush writes whole lines under
+    an flock of <path>.lock, and a file rotated by another process is noticed (inode) and reopened
+    """
+
+    def __init__(self, path, flush_interval=1.0, max_bytes=10 * 1024 * 1024, rotate_daily=True,
+                 backup_count=30, compress=True, buffer_size=64 * 1024):
+        """
+        max_bytes: rotate when the file would grow past this size (0 = never by size)
+        rotate_daily: rotate on the first line of a new day
+        backup_count: rotated segments kept (oldest deleted first, 0 = keep all)
+        buffer_size: buffered bytes that trigger a flush before flush_interval
+        """
+        self.path = path
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.rotate_daily = rotate_daily
+        self.backup_count = backup_count
+        self.compress = compress
+        self.buffer_size = buffer_size
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._handle = None
+        self._day = None  # Day of the newest line in the file
+        self._pending = []  # [(encoded line, day written)] not yet in the file
+        self._pending_bytes = 0
+        self._rotated = []  # Segments waiting for gzip and pruning
+        self._thread = None
+        self._pid = None
+        self._closed = False
+        self.rotations = 0
+        self.errors = 0
+        if hasattr(os, 'register_at_fork'):
+            # A forked worker must not inherit (and write again) lines still in the buffer
+            os.register_at_fork(before=self.flush)
+
+    def write(self, line):
+        """Append one line (newline included) - reaches the file within flush_interval"""
+        data = line.encode('utf-8')
+        day = datetime.now().date() if self.rotate_daily else None
+        with self._lock:
+            self._ensure_started()
+            self._pending.append((data, day))
+            self._pending_bytes += len(data)
+            if self._pending_bytes >= self.buffer_size:
+                self._flush_locked()
+
+    def flush(self):
+        """Write buffered lines to the file now"""
+        with self._lock:
+            self._flush_locked()
+
+    def close(self):
+        """Flush, close the file and stop the flush thread"""
+        with self._lock:
+            self._closed = True
+            self._flush_locked()
+            if self._handle is not None:
+                self._handle.close()
+                self._handle = None
+            self._wakeup.notify()
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            self._thread.join()
+        self._process_rotated()
+
+    def segments(self):
+        """Rotated segments of this log, oldest first (a segment being gzipped is listed once)"""
+        paths = set(glob.glob(glob.escape(self.path) + '.*'))
+        return sorted(path for path in paths
+                      if not path.endswith(('.tmp', '.lock')) and path + '.gz' not in paths)
+
+    def _ensure_started(self):
+        # Started lazily (and again after fork - threads are not inherited by worker processes)
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name=f'log-writer-{os.path.basename(self.path)}',
+                                        daemon=True)
+        self._thread.start()
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self._handle = open(self.path, 'ab', buffering=0)
+        # Existing file keeps the day it was last written
+        self._day = (datetime.fromtimestamp(os.path.getmtime(self.path)).date()
+                     if self._file_size() else datetime.now().date())
+
+    def _file_size(self):
+        return os.fstat(self._handle.fileno()).st_size
+
+    def _reopen_if_rotated(self):
+        """Another process may have renamed the file to a segment - write to the new file"""
+        try:
+            current = os.stat(self.path)
+            opened = os.fstat(self._handle.fileno())
+            if (current.st_dev, current.st_ino) == (opened.st_dev, opened.st_ino):
+                return
+        except FileNotFoundError:
+            pass
+        self._handle.close()
+        self._open()
+
+    def _needs_rotation(self, size, data_size, day):
+        if not size:
+            return False
+        if self.max_bytes and size + data_size > self.max_bytes:
+            return True
+        return self.rotate_daily and day != self._day
+
+    def _rotate(self):
+        """Rename the current file to a timestamped segment and start a new one"""
+        self._handle.close()
+        self._handle = None
+        base = f"{self.path}.{datetime.now().strftime(SEGMENT_TIME_FORMAT)}"
+        segment, counter = base, 1
+        while os.path.exists(segment) or os.path.exists(segment + '.gz'):
+            segment = f"{base}-{counter}"
+            counter += 1
+        try:
+            os.replace(self.path, segment)
+            self.rotations += 1
+            self._rotated.append(segment)
+            self._wakeup.notify()
+        except OSError as e:
+            self.errors += 1
+            print(f"Error rotating log {self.path}: {e}")
+        self._open()
+
+    def _flush_locked(self):
+        if not self._pending:
+            return
+        pending, self._pending, self._pending_bytes = self._pending, [], 0
+        lock_file = None
+        try:
+            if fcntl is not None:
+                os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+                lock_file = open(self.path + '.lock', 'a')
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            if self._handle is None:
+                self._open()
+            else:
+                self._reopen_if_rotated()
+            size, chunk = self._file_size(), []
+            for data, day in pending:
+                if self._needs_rotation(size, len(data), day):
+                    self._write_all(b''.join(chunk))
+                    chunk = []
+                    self._rotate()
+                    size = self._file_size()
+                chunk.append(data)
+                size += len(data)
+                if day is not None:
+                    self._day = day
+            self._write_all(b''.join(chunk))
+        except OSError as e:
+            self.errors += 1
+            print(f"Error flushing log {self.path}: {e}")
+        finally:
+            if lock_file is not None:
+                lock_file.close()  # Releases the flock
+
+    def _write_all(self, data):
+        # One chunk of whole lines; unbuffered writes may be partial
+        view = memoryview(data)
+        while view:
+            view = view[self._handle.write(view):]
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._closed and not self._rotated:
+                    self._wakeup.wait(self.flush_interval)
+                self._flush_locked()
+                if self._closed:
+                    return
+            self._process_rotated()
+
+    def _process_rotated(self):
+        """Gzip rotated segments and prune old ones (outside the write lock)"""
+        with self._lock:
+            segments, self._rotated = self._rotated, []
+        if not segments:
+            return
+        for segment in segments if self.compress else []:
+            try:
+                with open(segment, 'rb') as source, gzip.open(segment + '.gz.tmp', 'wb') as target:
+                    shutil.copyfileobj(source, target)
+                os.replace(segment + '.gz.tmp', segment + '.gz')
+                os.remove(segment)
+            except OSError as e:
+                self.errors += 1
+                print(f"Error compressing log {segment}: {e}")
+        self._prune()
+
+    def _prune(self):
+        if not self.backup_count:
+            return
+        for segment in self.segments()[:-self.backup_count]:
+            try:
+                os.remove(segment)
+            except OSError as e:
+                self.errors += 1
+                print(f"Error removing old log {segment}: {e}")
+
+
+def open_log_segment(path):
+    """Open a log file or rotated segment for reading text (gzipped or not)"""
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8')
+    return open(path, 'r', encoding='utf-8')
@@ -0,0 +1,235 @@
+"""
+Proctoring Index Service
+SQLite index of proctoring log entries (by exam, student, event and time)
+Queries touch only matching rows - paginated by id or streamed in batches
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from services.db_pool import ConnectionPool
+from services.log_writer_service import open_log_segment
+
+INSERT_SQL = '''
+    INSERT INTO log_events (log_type, timestamp, event, exam_id, student_name, entry_json)
+    VALUES (?, ?, ?, ?, ?, ?)
+'''
+
+
+class ProctoringLogIndex:
+    """Indexed copy of the JSON-lines proctoring logs"""
+
+    def __init__(self, db_path, flush_interval=1.0, batch_size=500):
+        """Initialize index - entries are inserted in batches (at most flush_interval late)"""
+        self.db_path = db_path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.pool = ConnectionPool(db_path, row_factory=sqlite3.Row)
+        self._pending = []  # Rows not inserted yet
+        self._due = None  # Monotonic time the pending rows must be inserted by
+        self._condition = threading.Condition()
+        # One long-lived flusher thread (one pooled connection) instead of a thread per flush
+        self._thread = None
+        self._pid = None
+        self._stopping = False
+        self.init_db()
+
+    def init_db(self):
+        """Create the events table and its indexes"""
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+
+        conn = self.pool.connection()
+        conn.executescript('''
+            CREATE TABLE IF NOT EXISTS log_events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                log_type TEXT NOT NULL,
+                timestamp TEXT NOT NULL,
+                event TEXT,
+                exam_id INTEGER,
+                student_name TEXT,
+                entry_json TEXT NOT NULL
+            );
+            -- Entries are appended in time order, so id order is time order; an index on one
+            -- column also orders by id (rowid) - "col = ? AND id > ? ORDER BY id" is a range scan
+            CREATE INDEX IF NOT EXISTS idx_log_events_exam ON log_events (exam_id);
+            CREATE INDEX IF NOT EXISTS idx_log_events_student ON log_events (student_name);
+            CREATE INDEX IF NOT EXISTS idx_log_events_type ON log_events (log_type);
+            CREATE INDEX IF NOT EXISTS idx_log_events_event ON log_events (event);
+            CREATE INDEX IF NOT EXISTS idx_log_events_time ON log_events (timestamp);
+
+            CREATE TABLE IF NOT EXISTS index_meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            );
+        ''')
+        conn.commit()
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _row(log_type, entry):
+        exam_id = entry.get('exam_id')
+        return (
+            log_type,
+            str(entry.get('timestamp', '')),
+            entry.get('event'),
+            exam_id if isinstance(exam_id, int) else None,
+            entry.get('student_name') or entry.get('username'),
+            json.dumps(entry, ensure_ascii=False)
+        )
+
+    def _ensure_started(self):
+        # Started lazily (and again after fork - threads are not inherited by worker processes)
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name='proctoring-index', daemon=True)
+        self._thread.start()
+
+    def add(self, log_type, entry):
+        """Queue one log entry (inserted with the next batch)"""
+        row = self._row(log_type, entry)
+        with self._condition:
+            self._ensure_started()
+            self._pending.append(row)
+            if len(self._pending) >= self.batch_size:
+                self._due = time.monotonic()
+                self._condition.notify()
+            elif self._due is None:
+                self._due = time.monotonic() + self.flush_interval
+                self._condition.notify()
+
+    def flush(self):
+        """Insert every queued entry now"""
+        with self._condition:
+            rows, self._pending = self._pending, []
+            self._due = None
+        if rows:
+            self._insert(rows)
+
+    def close(self):
+        """Stop the flusher thread and insert what is queued"""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            self._thread.join()
+        self.flush()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._stopping and (self._due is None or self._due > time.monotonic()):
+                    self._condition.wait(None if self._due is None else self._due - time.monotonic())
+                if self._stopping:
+                    return
+                rows, self._pending = self._pending, []
+                self._due = None
+            if rows:
+                self._insert(rows)
+
+    def _insert(self, rows):
+        try:
+            conn = self.pool.connection()
+            with conn:
+                conn.executemany(INSERT_SQL, rows)
+        except Exception as e:
+            print(f"Error indexing proctoring log entries: {e}")
+
+    def backfill(self, log_paths):
+        """
+        Index entries written before the index existed - runs once per database
+        log_paths: {log_type: [file paths, oldest first]}
+        """
+        conn = self.pool.connection()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')  # One worker backfills, the others wait and skip
+            if conn.execute("SELECT 1 FROM index_meta WHERE key = 'backfilled'").fetchone():
+                return 0
+            count = 0
+            for log_type, paths in log_paths.items():
+                for path in paths:
+                    rows = []
+                    with open_log_segment(path) as f:
+                        for line in f:
+                            if not line.strip():
+                                continue
+                            try:
+                                entry = json.loads(line)
+                            except ValueError:
+                                continue  # Torn line
+                            if isinstance(entry, dict):
+                                rows.append(self._row(log_type, entry))
+                            if len(rows) >= self.batch_size:
+                                conn.executemany(INSERT_SQL, rows)
+                                count += len(rows)
+                                rows = []
+                    conn.executemany(INSERT_SQL, rows)
+                    count += len(rows)
+            conn.execute("INSERT INTO index_meta (key, value) VALUES ('backfilled', ?)",
+                         (datetime.now().isoformat(),))
+        return count
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _where(log_type=None, exam_id=None, student_name=None, event=None, since=None, until=None,
+               after_id=0):
+        clauses, params = ['id > ?'], [after_id]
+        for column, value in (('log_type', log_type), ('exam_id', exam_id),
+                              ('student_name', student_name), ('event', event)):
+            if value is not None:
+                clauses.append(f'{column} = ?')
+                params.append(value)
+        if since is not None:
+            clauses.append('timestamp >= ?')
+            params.append(since.isoformat() if isinstance(since, datetime) else since)
+        if until is not None:
+            clauses.append('timestamp < ?')
+            params.append(until.isoformat() if isinstance(until, datetime) else until)
+        return ' AND '.join(clauses), params
+
+    def query(self, limit=100, after_id=0, **filters):
+        """
+        One page of matching entries, oldest first
+        filters: log_type, exam_id, student_name, event, since, until (ISO string or datetime)
+        Returns: {'events': [entry], 'next_after_id': id for the next page or None}
+        """
+        self.flush()
+        where, params = self._where(after_id=after_id, **filters)
+        conn = self.pool.connection()
+        rows = conn.execute(
+            f'SELECT id, entry_json FROM log_events WHERE {where} ORDER BY id LIMIT ?',
+            params + [limit + 1]
+        ).fetchall()
+        more = len(rows) > limit
+        rows = rows[:limit]
+        return {
+            'events': [json.loads(row['entry_json']) for row in rows],
+            'next_after_id': rows[-1]['id'] if more else None
+        }
+
+    def iter_events(self, batch_size=1000, **filters):
+        """Stream matching entries in batches - memory does not grow with the result"""
+        after_id = 0
+        while True:
+            page = self.query(limit=batch_size, after_id=after_id, **filters)
+            yield from page['events']
+            if page['next_after_id'] is None:
+                return
+            after_id = page['next_after_id']
+
+    def count(self, **filters):
+        """Number of matching entries"""
+        self.flush()
+        where, params = self._where(**filters)
+        conn = self.pool.connection()
+        return conn.execute(f'SELECT COUNT(*) FROM log_events WHERE {where}', params).fetchone()[0]
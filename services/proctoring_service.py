@@ -5,16 +5,41 @@ Handles logging of student activity for cheating detection
 
 import os
 import json
+import atexit
+import threading
 from datetime import datetime
 from config import app_config
+from services.log_writer_service import BufferedLogWriter
+from services.proctoring_index_service import ProctoringLogIndex
 
 
 class ProctoringService:
     """Service for exam proctoring and logging"""
     
-    def __init__(self):
-        self.logs_dir = app_config.LOGS_DIR
+    # Log type -> file
+    LOG_FILES = {
+        'sessions': 'exam_sessions.log',
+        'cheating': 'cheating_alerts.log',
+        'submissions': 'exam_submissions.log',
+        'login': 'login_history.log'
+    }
+    
+    def __init__(self, logs_dir=None, index_db_path=None):
+        self.logs_dir = logs_dir or app_config.LOGS_DIR
         self.ensure_logs_dir()
+        # NEW v5: One long-lived buffered writer per log file (rotated and gzipped)
+        # REMARK: Previously every entry opened, appended to and closed the file
+        self._writers = {}  # {log_file: BufferedLogWriter}
+        self._writers_lock = threading.Lock()
+        # NEW v5: Entries are also indexed by exam, student, event and time for queries
+        # REMARK: Previously every analysis read and parsed all log files
+        self.index = ProctoringLogIndex(index_db_path or app_config.PROCTORING_INDEX_DB_PATH,
+                                        flush_interval=app_config.PROCTORING_LOG_FLUSH_SECONDS)
+        self._log_types = {log_file: log_type for log_type, log_file in self.LOG_FILES.items()}
+        self.index.backfill({
+            log_type: self._log_paths(log_file) for log_type, log_file in self.LOG_FILES.items()
+        })
+        atexit.register(self.close)
     
     def ensure_logs_dir(self):
         """Ensure logs directory exists"""
@@ -75,39 +100,65 @@ class ProctoringService:
     def _write_log(self, entry, log_file):
         """Write log entry to file"""
         try:
-            log_path = os.path.join(self.logs_dir, log_file)
-            
-            with open(log_path, 'a', encoding='utf-8') as f:
-                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            self._writer(log_file).write(json.dumps(entry, ensure_ascii=False) + '\n')
+            self.index.add(self._log_types.get(log_file, log_file), entry)
         except Exception as e:
             print(f"Error writing log: {e}")
     
-    def get_exam_logs(self, log_type='all'):
-        """Get logs for analysis"""
-        logs = []
-        
-        log_files = {
-            'sessions': 'exam_sessions.log',
-            'cheating': 'cheating_alerts.log',
-            'submissions': 'exam_submissions.log',
-            'login': 'login_history.log'
-        }
-        
-        if log_type == 'all':
-            files_to_read = log_files.values()
-        else:
-            files_to_read = [log_files.get(log_type, 'exam_sessions.log')]
-        
-        for log_file in files_to_read:
-            log_path = os.path.join(self.logs_dir, log_file)
-            
-            if os.path.exists(log_path):
-                try:
-                    with open(log_path, 'r', encoding='utf-8') as f:
-                        for line in f:
-                            if line.strip():
-                                logs.append(json.loads(line))
-                except Exception as e:
-                    print(f"Error reading log {log_file}: {e}")
-        
-        return logs
+    def _writer(self, log_file):
+        writer = self._writers.get(log_file)
+        if writer is None:
+            with self._writers_lock:
+                writer = self._writers.get(log_file)
+                if writer is None:
+                    writer = BufferedLogWriter(
+                        os.path.join(self.logs_dir, log_file),
+                        flush_interval=app_config.PROCTORING_LOG_FLUSH_SECONDS,
+                        max_bytes=app_config.PROCTORING_LOG_MAX_BYTES,
+                        rotate_daily=app_config.PROCTORING_LOG_ROTATE_DAILY,
+                        backup_count=app_config.PROCTORING_LOG_BACKUPS,
+                        compress=app_config.PROCTORING_LOG_COMPRESS
+                    )
+                    self._writers[log_file] = writer
+        return writer
+    
+    def _log_paths(self, log_file):
+        """Existing files of a log: rotated segments (oldest first), then the current file"""
+        paths = self._writer(log_file).segments() + [os.path.join(self.logs_dir, log_file)]
+        return [path for path in paths if os.path.exists(path)]
+    
+    def flush(self):
+        """Write buffered entries of all logs to disk and to the index"""
+        for writer in list(self._writers.values()):
+            writer.flush()
+        self.index.flush()
+    
+    def close(self):
+        """Flush and close all logs (registered with atexit)"""
+        for writer in list(self._writers.values()):
+            writer.close()
+        self.index.close()
+    
+    def query_logs(self, log_type='all', limit=100, after_id=0, **filters):
+        """
+        One page of log entries from the index, oldest first
+        filters: exam_id, student_name, event, since, until
+        Returns: {'events': [...], 'next_after_id': pass as after_id for the next page, or None}
+        """
+        return self.index.query(limit=limit, after_id=after_id,
+                                log_type=None if log_type == 'all' else log_type, **filters)
+    
+    def iter_logs(self, log_type='all', **filters):
+        """Stream matching log entries in batches (same filters as query_logs)"""
+        return self.index.iter_events(log_type=None if log_type == 'all' else log_type, **filters)
+    
+    def get_exam_logs(self, log_type='all', **filters):
+        """
+        Get logs for analysis
+        NEW v5: Served from the index - filters (exam_id, student_name, event, since, until)
+        touch only matching entries
+        REMARK: Previously every line of every log file was read and parsed
+        """
+        if log_type != 'all' and log_type not in self.LOG_FILES:
+            log_type = 'sessions'
+        return list(self.iter_logs(log_type, **filters))
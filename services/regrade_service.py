@@ -0,0 +1,408 @@
+"""
+Regrade Service
+Re-scores a results folder against the current answer key (after the exam file was fixed)
+Streams submissions.jsonl (or All_Exams.txt for older folders) record by record,
+grades chunks in a process pool and rewrites GRADES.txt atomically
+"""
+
+import json
+import multiprocessing
+import os
+import re
+import tempfile
+import threading
+import time
+import uuid
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from itertools import chain, islice
+from services.answer_key import AnswerKey
+from services.submission_log import iter_submissions, submissions_path, dumps_record, read_lines
+
+# Markers written by save_exam_results / build_all_exams_header
+STUDENT_RESULTS_MARKER = 'STUDENT RESULTS'
+RECORD_SEPARATOR = '#' * 76
+ANSWER_SEPARATOR = '-' * 76
+NO_ANSWER = 'No answer'  # Written for questions missing from the submission
+
+STUDENT_DETAILS_RE = re.compile(r'^Student details: Name-(.*?)  Last name-(.*?)  Submitting time-(\S+)')
+
+# ref: (submitting time, "First Last", occurrence) - same key in All_Exams.txt and GRADES.txt
+GradedSubmission = namedtuple('GradedSubmission', ['ref', 'first_name', 'last_name', 'answers'])
+
+
+def grades_score_text(score):
+    """Score field of a GRADES.txt line"""
+    return f"{score}%" if score >= 0 else "Unknown yet"
+
+
+class _RefCounter:
+    """Builds refs in file order - the n-th (time, name) pair gets occurrence n"""
+
+    def __init__(self):
+        self._occurrences = {}
+
+    def __call__(self, submit_time, name):
+        count = self._occurrences.get((submit_time, name), 0)
+        self._occurrences[(submit_time, name)] = count + 1
+        return (submit_time, name, count)
+
+
+def iter_student_records(lines):
+    """
+    Yield one GradedSubmission per submission in All_Exams.txt
+    lines: any iterable of lines (an open file is read lazily)
+    """
+    lines = (line.rstrip('\r\n') for line in lines)
+    make_ref = _RefCounter()
+    record = None      # [first_name, last_name, submit_time, answers]
+    question = None    # Question being read
+    answer_lines = []
+
+    def finish(record):
+        first_name, last_name, submit_time, answers = record
+        ref = make_ref(submit_time, f"{first_name} {last_name}")
+        return GradedSubmission(ref, first_name, last_name, answers)
+
+    for line in lines:
+        if line == RECORD_SEPARATOR:
+            if record is not None:
+                yield finish(record)
+            record, question, answer_lines = None, None, []
+            continue
+        if line == STUDENT_RESULTS_MARKER:
+            # Everything above is the exam content header
+            record, question, answer_lines = None, None, []
+            continue
+        if record is None:
+            match = STUDENT_DETAILS_RE.match(line)
+            if match:
+                record = [match.group(1), match.group(2), match.group(3), {}]
+            continue
+
+        if question is None:
+            # Device info and blank lines precede the first question
+            if line and not line.startswith('Device Info:'):
+                question = line
+            continue
+        if line == ANSWER_SEPARATOR:
+            if answer_lines and answer_lines[-1] == '':
+                answer_lines.pop()  # Blank line written before every separator
+            answer = '\n'.join(answer_lines)
+            if answer != NO_ANSWER:
+                record[3][question] = answer
+            question, answer_lines = None, []
+            continue
+        answer_lines.append(line)
+
+    if record is not None:
+        yield finish(record)
+
+
+def iter_logged_records(folder_path, max_bytes=None):
+    """Yield one GradedSubmission per line of submissions.jsonl (the first max_bytes only)"""
+    make_ref = _RefCounter()
+    for record in iter_submissions(folder_path, max_bytes):
+        first_name, last_name = record['first_name'], record['last_name']
+        answers = {q['text']: q['answer'] for q in record['questions'] if q['answer'] is not None}
+        yield GradedSubmission(make_ref(record['submit_time'], f"{first_name} {last_name}"),
+                               first_name, last_name, answers)
+
+
+# Answer key of a pool worker, built once per process by the initializer
+_worker_key = None
+
+
+def _init_worker(question_answer_dict):
+    global _worker_key
+    _worker_key = AnswerKey(question_answer_dict)
+
+
+def _grade_chunk(chunk):
+    return [(ref, _worker_key.score(answers)) for ref, answers in chunk]
+
+
+def _chunks(records, chunk_size):
+    pairs = ((record.ref, record.answers) for record in records)
+    while True:
+        chunk = list(islice(pairs, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class RegradeJob:
+    """Regrade one results folder"""
+
+    def __init__(self, folder_path, question_answer_dict, results_page_strings,
+                 max_workers=4, chunk_size=500):
+        """
+        results_page_strings: resolved RESULTS_PAGE_STRINGS of the exam language (HTML grade line)
+        """
+        self.folder_path = folder_path
+        self.question_answer_dict = question_answer_dict
+        self.strings = results_page_strings
+        self.max_workers = max(1, max_workers or 1)
+        self.chunk_size = chunk_size
+
+    def source_path(self):
+        """File the submissions are read from - structured log when present"""
+        log_path = submissions_path(self.folder_path)
+        if os.path.exists(log_path):
+            return log_path
+        return os.path.join(self.folder_path, 'All_Exams.txt')
+
+    def grade(self, snapshot=None):
+        """
+        {ref: (score, first_name, last_name)} for every submission in the folder
+        snapshot: (source path, bytes to read) taken by run - default: the whole current file
+        At most 2 chunks per worker are in flight - memory does not grow with the folder
+        """
+        names = {}
+        scores = {}
+
+        def records():
+            for record in self._iter_records(*(snapshot or (self.source_path(), None))):
+                names[record.ref] = (record.first_name, record.last_name)
+                yield record
+
+        chunks = _chunks(records(), self.chunk_size)
+        head = list(islice(chunks, 2))
+
+        if len(head) < 2 or self.max_workers == 1:
+            # Small folder - not worth starting worker processes
+            answer_key = AnswerKey(self.question_answer_dict)
+            for chunk in chain(head, chunks):
+                scores.update((ref, answer_key.score(answers)) for ref, answers in chunk)
+        else:
+            # Spawned, not forked - forking a threaded server copies its locks mid-use
+            with ProcessPoolExecutor(self.max_workers, mp_context=multiprocessing.get_context('spawn'),
+                                     initializer=_init_worker,
+                                     initargs=(self.question_answer_dict,)) as pool:
+                pending = set()
+                for chunk in chain(head, chunks):
+                    if len(pending) >= self.max_workers * 2:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            scores.update(future.result())
+                    pending.add(pool.submit(_grade_chunk, chunk))
+                for future in pending:
+                    scores.update(future.result())
+
+        return {ref: (score,) + names[ref] for ref, score in scores.items()}
+
+    def _iter_records(self, source, max_bytes):
+        # Structured log when present - exact answers, no text parsing
+        if source == submissions_path(self.folder_path):
+            yield from iter_logged_records(self.folder_path, max_bytes)
+            return
+        yield from iter_student_records(read_lines(source, max_bytes))
+
+    def apply(self, graded):
+        """
+        Rewrite GRADES.txt (temp file + os.replace) and the grade line of changed HTML results
+        Must run where no append to the folder can interleave (ResultsWriter.call)
+        Returns the diff report
+        """
+        grades_file = os.path.join(self.folder_path, 'GRADES.txt')
+        changed = []
+        matched = set()
+        occurrences = {}
+
+        fd, temp_path = tempfile.mkstemp(dir=self.folder_path, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as out, \
+                    open(grades_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    out.write(self._regrade_line(line, graded, occurrences, matched, changed))
+                out.flush()
+                os.fsync(out.fileno())
+            os.replace(temp_path, grades_file)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+        if changed and os.path.exists(submissions_path(self.folder_path)):
+            self._update_submission_log({(c['time'], c['student'], c['occurrence']) for c in changed})
+
+        html_updated = 0
+        for entry in changed:
+            if self._update_html(entry):
+                html_updated += 1
+
+        return {
+            'students': len(graded),
+            'changed': changed,
+            'unchanged': len(matched) - len(changed),
+            'unmatched': sorted(f"{ref[1]} {ref[0]}" for ref in graded.keys() - matched),
+            'html_updated': html_updated
+        }
+
+    def run(self, writer):
+        """
+        Grade (in this thread) then apply on the results writer thread
+        The source file size is taken on the writer thread, after every queued append -
+        records appended later are not read (no half-written last record)
+        """
+        snapshot = writer.call(
+            lambda: (self.source_path(), os.path.getsize(self.source_path()))
+        ).result()
+        graded = self.grade(snapshot)
+        return writer.call(lambda: self.apply(graded)).result()
+
+    @staticmethod
+    def _regrade_line(line, graded, occurrences, matched, changed):
+        # "YYYY Month DD HH-MM-SS | First Last | Score: XX% | Cheat: ..."
+        parts = line.split(' | ')
+        if len(parts) < 3 or not parts[2].startswith('Score: '):
+            return line  # Old format or foreign line - keep as is
+        submit_time = parts[0].rsplit(' ', 1)[-1]
+        name = parts[1]
+        count = occurrences.get((submit_time, name), 0)
+        occurrences[(submit_time, name)] = count + 1
+
+        ref = (submit_time, name, count)
+        if ref not in graded:
+            return line
+        matched.add(ref)
+
+        score, first_name, last_name = graded[ref]
+        old_text = parts[2][len('Score: '):]
+        new_text = grades_score_text(score)
+        if old_text == new_text:
+            return line
+        changed.append({
+            'student': name,
+            'time': submit_time,
+            'occurrence': count,
+            'first_name': first_name,
+            'last_name': last_name,
+            'old_score': old_text,
+            'new_score': new_text,
+            'score': score
+        })
+        parts[2] = f"Score: {new_text}"
+        return ' | '.join(parts)
+
+    def _update_submission_log(self, refs):
+        """Re-score the changed records of submissions.jsonl (temp file + os.replace)"""
+        answer_key = AnswerKey(self.question_answer_dict)
+        log_path = submissions_path(self.folder_path)
+        make_ref = _RefCounter()
+
+        fd, temp_path = tempfile.mkstemp(dir=self.folder_path, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as out, open(log_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                        ref = make_ref(record['submit_time'], f"{record['first_name']} {record['last_name']}")
+                    except (ValueError, KeyError, TypeError):
+                        out.write(line)
+                        continue
+                    if ref not in refs:
+                        out.write(line)
+                        continue
+                    answers = {}
+                    for question in record['questions']:
+                        question['id'], question['correct'] = answer_key.check(question['text'], question['answer'])
+                        if question['answer'] is not None:
+                            answers[question['text']] = question['answer']
+                    score = answer_key.score(answers)
+                    record['score'] = score if score >= 0 else None
+                    record['pending_review'] = score < 0
+                    out.write(dumps_record(record))
+                out.flush()
+                os.fsync(out.fileno())
+            os.replace(temp_path, log_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def _update_html(self, entry):
+        """Replace the "Your grade is" heading of a student's HTML result"""
+        html_path = os.path.join(
+            self.folder_path, f"{entry['first_name']}_{entry['last_name']}_{entry['time']}.html"
+        )
+        try:
+            with open(html_path, 'r', encoding='utf-8') as f:
+                html = f.read()
+        except FileNotFoundError:
+            return False
+
+        start = html.rfind('<h1>')
+        end = html.find('</h1>', start)
+        if start < 0 or end < 0:
+            return False
+
+        score = entry['score']
+        grade_text = self.strings['open_exam_grade_pending'] if score < 0 else f"{score} %"
+        html = html[:start] + f"<h1>{self.strings['your_grade_is']} {grade_text}" + html[end:]
+
+        fd, temp_path = tempfile.mkstemp(dir=self.folder_path, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(html)
+        os.replace(temp_path, html_path)
+        return True
+
+
+class RegradeJobs:
+    """
+    Regrades run in background threads; the status is one JSON file per job in jobs_dir,
+    so any worker process can answer a poll (a job whose process died stays 'running')
+    """
+
+    def __init__(self, jobs_dir, max_age_seconds=7 * 24 * 3600):
+        """Initialize job store"""
+        self.jobs_dir = jobs_dir
+        self.max_age_seconds = max_age_seconds
+        os.makedirs(jobs_dir, exist_ok=True)
+
+    def start(self, teacher_id, folder_name, run):
+        """Run run() (returns the report) in a background thread. Returns the job id"""
+        self._prune()
+        job_id = uuid.uuid4().hex
+        status = {'job_id': job_id, 'teacher_id': teacher_id, 'folder_name': folder_name,
+                  'status': 'running', 'started_at': time.time()}
+        self._save(status)
+        threading.Thread(target=self._run, args=(status, run), name=f'regrade-{job_id[:8]}', daemon=True).start()
+        return job_id
+
+    def get(self, teacher_id, job_id):
+        """Status dict of one of the teacher's jobs, None if unknown"""
+        if not re.fullmatch(r'[0-9a-f]{32}', job_id):
+            return None
+        try:
+            with open(os.path.join(self.jobs_dir, f'{job_id}.json'), 'r', encoding='utf-8') as f:
+                status = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        return status if status.get('teacher_id') == teacher_id else None
+
+    def _run(self, status, run):
+        try:
+            status.update(status='done', report=run())
+        except Exception as e:
+            print(f"Error regrading {status['folder_name']}: {e}")
+            status.update(status='failed', message=str(e))
+        status['finished_at'] = time.time()
+        try:
+            self._save(status)
+        except OSError as e:
+            print(f"Error saving regrade job {status['job_id']}: {e}")
+
+    def _save(self, status):
+        fd, temp_path = tempfile.mkstemp(dir=self.jobs_dir, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(status, f, ensure_ascii=False)
+        os.replace(temp_path, os.path.join(self.jobs_dir, f"{status['job_id']}.json"))
+
+    def _prune(self):
+        # Finished jobs are kept max_age_seconds for late polls
+        cutoff = time.time() - self.max_age_seconds
+        for entry in os.scandir(self.jobs_dir):
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+            except OSError:
+                pass
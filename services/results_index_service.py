@@ -0,0 +1,185 @@
+"""
+Results Index Service
+SQLite catalog of teachers' result folders (student and HTML counts)
+Updated incrementally on folder creation and submit, so listings need no file reads
+"""
+
+import os
+import sqlite3
+import logging
+import time
+from config import app_config
+from services.db_pool import ConnectionPool
+from services.submission_log import count_submissions
+
+logger = logging.getLogger(__name__)
+
+
+def split_folder_name(folder_name):
+    """Parse "ExamName YYYY-MM-DD HH-MM" -> (exam_name, date, time), date/time '' if missing"""
+    parts = folder_name.rsplit(' ', 2)  # Split from right, max 2 splits
+    if len(parts) >= 3:
+        return ' '.join(parts[:-2]), parts[-2], parts[-1]
+    return folder_name, '', ''
+
+
+class ResultsIndex:
+    """Per-teacher index of result folders"""
+
+    def __init__(self, db_path=None):
+        """Initialize results index"""
+        if db_path is None:
+            db_path = app_config.RESULTS_INDEX_DB_PATH
+        self.db_path = db_path
+        self.pool = ConnectionPool(db_path, row_factory=sqlite3.Row)  # WAL, one connection per thread
+        self._reconciled = {}  # {(teacher_id, results_dir): directory mtime at the last reconcile}
+        self.init_db()
+
+    def init_db(self):
+        """Create results_folders table"""
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+
+        conn = self.pool.connection()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS results_folders (
+                teacher_id TEXT NOT NULL,
+                folder_name TEXT NOT NULL,
+                student_count INTEGER NOT NULL DEFAULT 0,
+                html_count INTEGER NOT NULL DEFAULT 0,
+                has_grades INTEGER NOT NULL DEFAULT 0,
+                has_all_exams INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (teacher_id, folder_name)
+            )
+        ''')
+        conn.commit()
+
+    def _execute(self, sql, params):
+        conn = self.pool.connection()
+        with conn:
+            return conn.execute(sql, params).rowcount
+
+    # ------------------------------------------------------------------
+    # Incremental updates
+    # ------------------------------------------------------------------
+
+    def folder_created(self, teacher_id, folder_name):
+        """Register a new (empty) results folder"""
+        self._execute('''
+            INSERT OR IGNORE INTO results_folders (teacher_id, folder_name) VALUES (?, ?)
+        ''', (teacher_id, folder_name))
+
+    def submission_saved(self, teacher_id, folder_name):
+        """One more student: +1 GRADES.txt line"""
+        updated = self._execute('''
+            UPDATE results_folders
+            SET student_count = student_count + 1, has_grades = 1, has_all_exams = 1
+            WHERE teacher_id = ? AND folder_name = ?
+        ''', (teacher_id, folder_name))
+        # Not indexed yet (folder from before the index) - next listing scans it once
+        return updated > 0
+
+    def html_created(self, teacher_id, folder_name):
+        """+1 HTML file (a new file - an overwritten one is not counted again)"""
+        updated = self._execute('''
+            UPDATE results_folders SET html_count = html_count + 1
+            WHERE teacher_id = ? AND folder_name = ?
+        ''', (teacher_id, folder_name))
+        return updated > 0
+
+    def folder_deleted(self, teacher_id, folder_name):
+        """Forget a deleted folder"""
+        self._execute(
+            'DELETE FROM results_folders WHERE teacher_id = ? AND folder_name = ?',
+            (teacher_id, folder_name)
+        )
+
+    def teacher_cleared(self, teacher_id):
+        """Forget all folders of a teacher"""
+        self._execute('DELETE FROM results_folders WHERE teacher_id = ?', (teacher_id,))
+
+    # ------------------------------------------------------------------
+    # Listing
+    # ------------------------------------------------------------------
+
+    def list_folders(self, teacher_id, results_dir):
+        """
+        All result folders of a teacher as dicts (folder_name, counts, flags)
+        Folder names are reconciled with one os.listdir on the first listing of the process
+        and whenever the results directory's mtime changes: folders removed on disk are
+        dropped, folders unknown to the index (created before it) are scanned once
+        """
+        conn = self.pool.connection()
+        rows = {
+            row['folder_name']: dict(row)
+            for row in conn.execute(
+                'SELECT * FROM results_folders WHERE teacher_id = ?', (teacher_id,)
+            )
+        }
+
+        key = (teacher_id, results_dir)
+        try:
+            mtime = os.stat(results_dir).st_mtime
+        except FileNotFoundError:
+            mtime = None
+        if mtime is not None and self._reconciled.get(key) == mtime:
+            return self._listing(rows)
+
+        try:
+            names_on_disk = {name for name in os.listdir(results_dir) if not name.startswith('.')}
+        except FileNotFoundError:
+            names_on_disk = set()
+
+        missing = [name for name in names_on_disk - rows.keys()
+                   if os.path.isdir(os.path.join(results_dir, name))]
+        gone = rows.keys() - names_on_disk
+
+        if missing or gone:
+            with conn:
+                for name in gone:
+                    conn.execute(
+                        'DELETE FROM results_folders WHERE teacher_id = ? AND folder_name = ?',
+                        (teacher_id, name)
+                    )
+                    del rows[name]
+                for name in missing:
+                    entry = self.scan_folder(os.path.join(results_dir, name))
+                    conn.execute('''
+                        INSERT OR REPLACE INTO results_folders
+                            (teacher_id, folder_name, student_count, html_count, has_grades, has_all_exams)
+                        VALUES (?, ?, ?, ?, ?, ?)
+                    ''', (teacher_id, name, entry['student_count'], entry['html_count'],
+                          entry['has_grades'], entry['has_all_exams']))
+                    rows[name] = dict(entry, teacher_id=teacher_id, folder_name=name)
+            logger.info("Results index reconciled - teacher_id=%s added=%s removed=%s",
+                        teacher_id, len(missing), len(gone))
+
+        # A change within the mtime resolution (coarse filesystems) could go unnoticed - trust settled mtimes only
+        if mtime is not None and time.time() - mtime > 2:
+            self._reconciled[key] = mtime
+        return self._listing(rows)
+
+    @staticmethod
+    def _listing(rows):
+        for row in rows.values():
+            row['has_grades'] = bool(row['has_grades'])
+            row['has_all_exams'] = bool(row['has_all_exams'])
+        return list(rows.values())
+
+    @staticmethod
+    def scan_folder(folder_path):
+        """Count students/HTML files by reading the folder (index backfill only)"""
+        grades_file = os.path.join(folder_path, 'GRADES.txt')
+        # Structured log when present (one JSON line per submission), GRADES.txt for older folders
+        student_count = count_submissions(folder_path)
+        if student_count is None:
+            student_count = 0
+            if os.path.exists(grades_file):
+                with open(grades_file, 'r', encoding='utf-8') as f:
+                    student_count = len([line for line in f if line.strip()])
+
+        return {
+            'student_count': student_count,
+            'html_count': len([f for f in os.listdir(folder_path) if f.endswith('.html')]),
+            'has_grades': os.path.exists(grades_file),
+            'has_all_exams': os.path.exists(os.path.join(folder_path, 'All_Exams.txt'))
+        }
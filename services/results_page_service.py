@@ -0,0 +1,63 @@
+"""
+Results Page Service
+Student results fragment (answers and grade) rendered from a precompiled Jinja template
+One compiled template per language and direction; answers are HTML-escaped
+"""
+
+import re
+import threading
+from jinja2 import Environment
+
+# An answer with Latin letters is shown left-to-right in an LTR exam (range kept from the old check)
+LATIN_PATTERN = re.compile('[A-z]')
+
+RESULTS_TEMPLATE = '''\
+{% if rtl %}<div dir="rtl" style="text-align: right; direction: rtl;">{% else %}<div style="text-align: left;">{% endif %}
+<h2>{{ first_name }} {{ last_name }}, {{ strings.exam_submitted_successfully }}</h2>
+<h3>{{ strings.your_answers }}</h3><ol>
+{% for question in questions %}
+{% set text = question.get('text', '') %}
+{% set answer = answers.get(text, 'No answer') %}
+<li><b>{{ text }}</b><pre{% if not rtl and answer is latin %} align='left' dir='ltr'{% endif %}>{{ answer }}</pre></li>
+{% endfor %}
+<h1>{{ strings.your_grade_is }} {{ grade_text }}</h1></ol></div>'''
+
+
+def _is_latin(value):
+    return LATIN_PATTERN.search(str(value)) is not None
+
+
+class ResultsPageRenderer:
+    """Renders the results fragment shown to the student and saved as the student's HTML file"""
+
+    def __init__(self):
+        """Initialize renderer - templates are compiled on first use per language and direction"""
+        self.env = Environment(autoescape=True, trim_blocks=True, lstrip_blocks=True)
+        self.env.tests['latin'] = _is_latin
+        self._templates = {}  # {(language, rtl): (strings, Template)}
+        self._lock = threading.Lock()
+
+    def _template(self, language, rtl, strings):
+        key = (language, rtl)
+        cached = self._templates.get(key)
+        # strings is the resolved translation table - a reloaded bundle gives a new one
+        if cached is not None and cached[0] is strings:
+            return cached[1]
+        template = self.env.from_string(RESULTS_TEMPLATE, globals={'rtl': rtl, 'strings': strings})
+        with self._lock:
+            self._templates[key] = (strings, template)
+        return template
+
+    def render(self, language, text_direction, strings, first_name, last_name, questions, answers, grade_text):
+        """
+        Results fragment as one string (the same text goes to the response and the HTML file)
+        strings: resolved 'results_page' translations
+        questions: questions in the order the student saw them [{'text': ...}]
+        """
+        template = self._template(language, text_direction == 'rtl', strings)
+        return template.render(first_name=first_name, last_name=last_name, questions=questions,
+                               answers=answers, grade_text=grade_text)
+
+
+# Shared process-wide instance
+results_page_renderer = ResultsPageRenderer()
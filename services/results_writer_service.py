@@ -0,0 +1,360 @@
+"""
+Results Writer Service
+Write-behind pipeline for exam result files (HTML, GRADES.txt, All_Exams.txt)
+One background thread drains a bounded queue, batches writes and fsyncs once per file per batch
+With a journal (enable_journal) queued writes survive a crash: they are appended to a
+per-process journal before the submit is acknowledged and replayed on the next start
+"""
+
+import atexit
+import glob
+import json
+import os
+import queue
+import threading
+
+try:
+    import fcntl  # One worker replays a dead process's journal (POSIX)
+except ImportError:  # Windows - standalone mode runs one process
+    fcntl = None
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from config import app_config
+
+# Operation types
+OP_WRITE = 'write'    # Create/overwrite file
+OP_APPEND = 'append'  # Append to file (header written first if file is new)
+OP_CALL = 'call'      # Run a callable on the writer thread (all files closed first)
+
+_STOP = object()
+
+
+class ResultsWriter:
+    """Single writer thread - operations are applied in the order they were queued"""
+
+    def __init__(self, max_queue=1000, max_batch=200):
+        self.max_batch = max_batch
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self.batches = 0
+        self.errors = 0
+        self.journal_dir = None  # Set by enable_journal
+        self._journal = None  # This process's journal file (<pid>.jsonl)
+        self._journal_pid = None
+        self._journal_lock = threading.Lock()  # Journal order = queue order
+        self._commit_lock = threading.Lock()
+        self._next_id = 0  # Id of the last journaled operation
+        self._synced_id = 0  # Journaled operations up to this id are fsynced
+
+    def _ensure_started(self):
+        # Started lazily (and again after fork - threads are not inherited by worker processes)
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='results-writer', daemon=True)
+            self._thread.start()
+
+    def write_file(self, path, text, on_created=None):
+        """
+        Queue creation (or overwrite) of a whole file
+        on_created: called on the writer thread once the file is on disk, only if it did not exist before
+        """
+        self._put(OP_WRITE, path, text, None, on_created)
+
+    def append(self, path, text, header=None, on_written=None):
+        """
+        Queue an append
+        header: text or callable returning text, written first if the file does not exist yet
+        on_written: called on the writer thread once the text is on disk (not if the write fails)
+        """
+        self._put(OP_APPEND, path, text, header, on_written)
+
+    def call(self, func):
+        """
+        Run func() on the writer thread after every operation queued before it
+        Used for read-modify-replace of result files (no append can interleave)
+        Returns a Future with func's result
+        """
+        future = Future()
+        self._ensure_started()
+        self._queue.put((OP_CALL, None, func, future, None, None))
+        return future
+
+    def _put(self, op, path, text, header, on_written):
+        self._ensure_started()
+        if self.journal_dir is None:
+            self._queue.put((op, path, text, header, on_written, None))
+            return
+        with self._journal_lock:
+            if callable(header) and not os.path.exists(path):
+                header = header()  # The journal needs the text (existing files get no header)
+            journal = self._journal_file()
+            self._next_id += 1
+            journal.write(json.dumps({
+                'id': self._next_id, 'op': op, 'path': path, 'text': text,
+                'header': header if isinstance(header, str) else None
+            }, ensure_ascii=False) + '\n')
+            journal.flush()
+            self._queue.put((op, path, text, header, on_written, self._next_id))
+
+    def commit(self):
+        """
+        Make every operation queued so far survive a crash (no-op without a journal)
+        Call before acknowledging a submission - one fsync, shared by concurrent callers
+        """
+        if self.journal_dir is None:
+            return
+        with self._journal_lock:
+            target, journal = self._next_id, self._journal
+        with self._commit_lock:
+            if journal is None or self._synced_id >= target:
+                return
+            os.fsync(journal.fileno())
+            self._synced_id = target
+
+    def flush(self):
+        """Block until every queued operation is on disk"""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.join()
+
+    def sync(self, timeout=None):
+        """
+        Block until every operation queued before this call is on disk
+        Writes queued meanwhile are not waited for (unlike flush under steady submits)
+        Only this process's queue - another worker's pending writes may still be missing
+        Returns False if timeout seconds passed first
+        """
+        if self._thread is None or not self._thread.is_alive():
+            return True
+        try:
+            self.call(lambda: None).result(timeout)
+            return True
+        except FutureTimeoutError:
+            return False
+
+    def close(self):
+        """Flush and stop the writer thread (registered with atexit)"""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._drop_journal()
+
+    def pending(self):
+        """Number of queued operations not yet written"""
+        return self._queue.qsize()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            stop = any(op is _STOP for op in batch)
+            try:
+                ops = [op for op in batch if op is not _STOP]
+                self._write_batch(ops)
+                self._journal_done(ops)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if stop:
+                return
+
+    def _write_batch(self, batch):
+        """Apply a batch keeping one open handle per file, fsync each file once"""
+        handles = {}  # {path: file opened for appending}
+        written = {}  # {path: on_written callbacks due once the file is synced}
+        try:
+            for op, path, text, header, on_written, _ in batch:
+                if op == OP_CALL:
+                    self._run_call(handles, written, text, header)
+                    continue
+                try:
+                    handle = handles.get(path)
+                    if op == OP_WRITE:
+                        created = handle is None and not os.path.exists(path)
+                        if handle is not None:
+                            self._sync_close(handle)
+                            self._run_written(written.pop(path, []))
+                        handle = open(path, 'w', encoding='utf-8')
+                        if not created:
+                            on_written = None  # Overwrite - on_created is not due
+                    elif handle is None:
+                        if header is not None and not os.path.exists(path):
+                            handle = open(path, 'w', encoding='utf-8')
+                            handle.write(header() if callable(header) else header)
+                        else:
+                            handle = open(path, 'a', encoding='utf-8')
+                    handles[path] = handle
+                    handle.write(text)
+                    if on_written is not None:
+                        written.setdefault(path, []).append(on_written)
+                except Exception as e:
+                    self.errors += 1
+                    print(f"Error writing results file {path}: {e}")
+        finally:
+            self._sync_all(handles, written)
+            self.batches += 1
+
+    def _sync_all(self, handles, written):
+        for path, handle in handles.items():
+            try:
+                self._sync_close(handle)
+            except Exception as e:
+                self.errors += 1
+                print(f"Error flushing results file {handle.name}: {e}")
+                written.pop(path, None)
+        handles.clear()
+        for callbacks in written.values():
+            self._run_written(callbacks)
+        written.clear()
+
+    def _run_written(self, callbacks):
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                self.errors += 1
+                print(f"Error in results writer callback: {e}")
+
+    def _run_call(self, handles, written, func, future):
+        # Open handles would keep writing to a file func may replace
+        self._sync_all(handles, written)
+        try:
+            future.set_result(func())
+        except Exception as e:
+            self.errors += 1
+            print(f"Error in results writer call: {e}")
+            future.set_exception(e)
+
+    # ------------------------------------------------------------------
+    # Journal - <pid>.jsonl (queued operations) and <pid>.done (last applied id)
+    # ------------------------------------------------------------------
+
+    def enable_journal(self, journal_dir):
+        """Journal queued writes in journal_dir and replay journals left by dead processes"""
+        os.makedirs(journal_dir, exist_ok=True)
+        self.journal_dir = journal_dir
+        self.recover()
+
+    def _journal_file(self):
+        # One journal per process (a forked worker starts its own)
+        if self._journal_pid != os.getpid():
+            self._journal_pid = os.getpid()
+            self._journal = open(os.path.join(self.journal_dir, f'{self._journal_pid}.jsonl'), 'a',
+                                 encoding='utf-8')
+            self._next_id = self._synced_id = 0
+        return self._journal
+
+    def _journal_done(self, ops):
+        """Record the last applied id once the batch is on disk; empty the journal when idle"""
+        ids = [op[5] for op in ops if op[5] is not None]
+        if not ids or self._journal_pid != os.getpid():
+            return
+        done_path = os.path.join(self.journal_dir, f'{self._journal_pid}.done')
+        try:
+            with open(done_path, 'w', encoding='utf-8') as f:
+                f.write(str(max(ids)))
+                f.flush()
+                os.fsync(f.fileno())
+            # Never wait here - a submitter may hold the lock while the queue is full
+            if self._journal_lock.acquire(blocking=False):
+                try:
+                    if self._next_id == max(ids):
+                        self._journal.truncate(0)
+                finally:
+                    self._journal_lock.release()
+        except OSError as e:
+            self.errors += 1
+            print(f"Error updating results journal: {e}")
+
+    def _drop_journal(self):
+        # Everything applied (clean shutdown) - nothing to replay
+        with self._journal_lock:
+            if self._journal is None or self._journal_pid != os.getpid():
+                return
+            self._journal.close()
+            self._journal = self._journal_pid = None
+            for suffix in ('.jsonl', '.done'):
+                try:
+                    os.remove(os.path.join(self.journal_dir, f'{os.getpid()}{suffix}'))
+                except OSError:
+                    pass
+
+    def recover(self):
+        """
+        Apply operations journaled by processes that died before writing them. Returns the count
+        Only file writes are replayed - on_written callbacks and call() work are not journaled
+        """
+        if self.journal_dir is None:
+            return 0
+        recovered = 0
+        lock_file = open(os.path.join(self.journal_dir, '.lock'), 'a')
+        try:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)  # Workers starting together replay once
+            for journal_path in glob.glob(os.path.join(glob.escape(self.journal_dir), '*.jsonl')):
+                pid = int(os.path.basename(journal_path).split('.')[0])
+                if (pid == self._journal_pid and pid == os.getpid()) or _process_alive(pid):
+                    continue
+                recovered += self._replay(journal_path, pid)
+        except (OSError, ValueError) as e:
+            self.errors += 1
+            print(f"Error recovering results journal: {e}")
+        finally:
+            lock_file.close()
+        return recovered
+
+    def _replay(self, journal_path, pid):
+        done_path = os.path.join(self.journal_dir, f'{pid}.done')
+        done = 0
+        if os.path.exists(done_path):
+            with open(done_path, 'r', encoding='utf-8') as f:
+                done = int(f.read().strip() or 0)
+        ops = []
+        with open(journal_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # Cut off by the crash - never acknowledged
+                if entry['id'] > done:
+                    ops.append((entry['op'], entry['path'], entry['text'], entry['header'], None, None))
+        if ops:
+            self._write_batch(ops)
+            print(f"Recovered {len(ops)} results writes of process {pid}")
+        os.remove(journal_path)
+        if os.path.exists(done_path):
+            os.remove(done_path)
+        return len(ops)
+
+    @staticmethod
+    def _sync_close(handle):
+        if handle.closed:
+            return
+        handle.flush()
+        os.fsync(handle.fileno())
+        handle.close()
+
+
+def _process_alive(pid):
+    if os.name == 'nt':
+        return False  # Standalone mode - the only process is this one
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+# Shared process-wide instance - flushed on interpreter shutdown
+results_writer = ResultsWriter(max_queue=app_config.RESULTS_WRITER_QUEUE_SIZE)
+atexit.register(results_writer.close)
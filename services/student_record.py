@@ -0,0 +1,135 @@
+"""
+Student Record
+Compact in-memory state of one student in an exam session (__slots__, float timestamps)
+Cheating events are kept in an array-backed ring buffer - the newest N per student
+"""
+
+import sys
+from array import array
+from datetime import datetime
+from config import app_config
+
+
+def _iso(timestamp):
+    return datetime.fromtimestamp(timestamp).isoformat() if timestamp is not None else None
+
+
+class CheatingLog:
+    """
+    Ring buffer of the newest cheating events of a student
+    Timestamps in an array of doubles, attempt types interned (one string object per type)
+    """
+
+    __slots__ = ('capacity', 'total', '_times', '_types', '_details', '_next')
+
+    def __init__(self, capacity=None):
+        """capacity: events kept (older ones are overwritten, total keeps counting)"""
+        self.capacity = max(1, capacity if capacity is not None else app_config.CHEATING_LOG_MAX_EVENTS)
+        self.total = 0  # Events ever appended
+        self._times = array('d')
+        self._types = []
+        self._details = []
+        self._next = 0  # Slot of the next event once the buffer is full
+
+    def append(self, timestamp, attempt_type, details=None):
+        """Add an event - timestamp in Unix seconds"""
+        attempt_type = sys.intern(str(attempt_type))
+        if len(self._times) < self.capacity:
+            self._times.append(timestamp)
+            self._types.append(attempt_type)
+            self._details.append(details)
+        else:
+            self._times[self._next] = timestamp
+            self._types[self._next] = attempt_type
+            self._details[self._next] = details
+            self._next = (self._next + 1) % self.capacity
+        self.total += 1
+
+    def __len__(self):
+        return len(self._times)
+
+    def _event(self, slot):
+        return {
+            'timestamp': _iso(self._times[slot]),
+            'type': self._types[slot],
+            'details': self._details[slot]
+        }
+
+    def __iter__(self):
+        size = len(self._times)
+        for i in range(self._next, self._next + size):  # Oldest first
+            yield self._event(i % size)
+
+    def __getitem__(self, index):
+        size = len(self._times)
+        if index < 0:
+            index += size
+        if not 0 <= index < size:
+            raise IndexError('cheating log index out of range')
+        return self._event((self._next + index) % size)
+
+    def memory_bytes(self):
+        """Approximate bytes held (containers and details, types are shared)"""
+        return (sys.getsizeof(self) + sys.getsizeof(self._times) + sys.getsizeof(self._types)
+                + sys.getsizeof(self._details)
+                + sum(sys.getsizeof(details) for details in self._details if details is not None))
+
+
+class StudentRecord:
+    """One student of an exam session"""
+
+    __slots__ = (
+        'first_name', 'last_name', 'start_time', 'status', 'score', 'answers',
+        'refresh_attempts', 'cheating_log', 'end_time', 'time_spent', 'shuffle_seed',
+        'version', 'autosave_seq', 'answer_seqs'
+    )
+
+    def __init__(self, first_name, last_name, start_time, shuffle_seed, status='in_progress',
+                 cheating_log_capacity=None):
+        """start_time: Unix seconds"""
+        self.first_name = first_name
+        self.last_name = last_name
+        self.start_time = start_time
+        self.status = sys.intern(status)  # in_progress, completed, abandoned
+        self.score = None
+        self.answers = {}
+        self.refresh_attempts = 0
+        self.cheating_log = CheatingLog(cheating_log_capacity)
+        self.end_time = None  # Unix seconds
+        self.time_spent = 0
+        self.shuffle_seed = shuffle_seed  # Fixed question/answer order for this student
+        self.version = 0  # Session version of the last change to this student
+        self.autosave_seq = 0  # Highest autosave sequence number merged
+        self.answer_seqs = {}  # {question: seq of the autosave that set its answer}
+
+    @property
+    def cheating_attempts(self):
+        """All cheating events of the student (also those dropped from the ring buffer)"""
+        return self.cheating_log.total
+
+    @property
+    def start_datetime(self):
+        return datetime.fromtimestamp(self.start_time)
+
+    @property
+    def end_datetime(self):
+        return datetime.fromtimestamp(self.end_time) if self.end_time is not None else None
+
+    # Read-only mapping access for code written against student dicts (submission log, regrade)
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def memory_bytes(self):
+        """Approximate bytes held by this student (record, names, answers, cheating log)"""
+        size = sys.getsizeof(self) + sys.getsizeof(self.first_name) + sys.getsizeof(self.last_name)
+        for mapping in (self.answers, self.answer_seqs):
+            size += sys.getsizeof(mapping) + sum(
+                sys.getsizeof(key) + sys.getsizeof(value) for key, value in mapping.items()
+            )
+        return size + self.cheating_log.memory_bytes()
@@ -0,0 +1,101 @@
+"""
+Submission Log
+Append-only, schema-versioned JSONL record per submission (submissions.jsonl in the results folder)
+Machine-readable twin of the GRADES.txt line: numeric score, seconds, cheat count, per-question correctness
+"""
+
+import json
+import os
+
+SUBMISSIONS_FILENAME = 'submissions.jsonl'
+SCHEMA_VERSION = 1
+
+
+def build_submission_record(exam_id, student_session_id, student, score, answers, questions_list,
+                            answer_key, submitted_at, submit_time, device_info=None):
+    """
+    One submission as a JSON-ready dict
+    score: percentage, or -1 while open questions wait for manual grading (stored as null)
+    """
+    device_info = device_info or {}
+    questions = []
+    for question in questions_list:
+        text = question.get('text', '')
+        answer = answers.get(text)
+        question_id, correct = answer_key.check(text, answer) if answer_key else (None, None)
+        questions.append({'id': question_id, 'text': text, 'answer': answer, 'correct': correct})
+
+    return {
+        'schema_version': SCHEMA_VERSION,
+        'exam_id': exam_id,
+        'student_session_id': student_session_id,
+        'first_name': student['first_name'],
+        'last_name': student['last_name'],
+        'submitted_at': submitted_at,      # Unix timestamp
+        'submit_time': submit_time,        # "HH-MM-SS" as in GRADES.txt and the HTML file name
+        'score': score if score >= 0 else None,
+        'pending_review': score < 0,
+        'time_spent_seconds': float(student.get('time_spent') or 0),
+        'cheating_attempts': int(student.get('cheating_attempts', 0)),
+        'device': {
+            'ip_address': device_info.get('ip_address'),
+            'device_id': device_info.get('device_id'),
+            'platform': device_info.get('platform'),
+            'screen_resolution': device_info.get('screen_resolution'),
+            'user_agent': device_info.get('user_agent_full')
+        },
+        'questions': questions
+    }
+
+
+def dumps_record(record):
+    """Record as one JSONL line"""
+    return json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+
+def submissions_path(folder_path):
+    return os.path.join(folder_path, SUBMISSIONS_FILENAME)
+
+
+def read_lines(path, max_bytes=None):
+    """
+    Lines of a text file, streamed (the file is opened now - FileNotFoundError is raised here)
+    max_bytes: stop after this many bytes - a size taken while no append was in progress,
+    so a record being appended meanwhile is not read half-written
+    """
+    return _iter_lines(open(path, 'rb'), max_bytes)
+
+
+def _iter_lines(f, max_bytes):
+    with f:
+        consumed = 0
+        for line in f:
+            consumed += len(line)
+            if max_bytes is not None and consumed > max_bytes:
+                return
+            yield line.decode('utf-8')
+
+
+def iter_submissions(folder_path, max_bytes=None):
+    """
+    Yield submission records of a results folder in submit order (streamed)
+    Lines from a newer schema or cut off by a crash are skipped
+    """
+    try:
+        lines = read_lines(submissions_path(folder_path), max_bytes)
+    except FileNotFoundError:
+        return
+    for line in lines:
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if isinstance(record, dict) and record.get('schema_version', 0) <= SCHEMA_VERSION:
+            yield record
+
+
+def count_submissions(folder_path):
+    """Number of records iter_submissions yields (None if the folder has no log)"""
+    if not os.path.exists(submissions_path(folder_path)):
+        return None
+    return sum(1 for _ in iter_submissions(folder_path))
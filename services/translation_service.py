@@ -0,0 +1,90 @@
+"""
+Translation Service
+In-process registry of data/translations/<lang>.json bundles
+Each bundle is loaded once and reloaded only when the file changes (mtime/size)
+"""
+
+import hashlib
+import json
+import os
+import threading
+from config import app_config
+
+# Strings of the submit results page with their English fallbacks
+RESULTS_PAGE_STRINGS = {
+    'exam_submitted_successfully': 'your exam was submitted successfully',
+    'your_answers': 'Your Answers:',
+    'your_grade_is': 'Your grade is',
+    'open_exam_grade_pending': 'Unknown yet, exam will be evaluated later'
+}
+
+
+class TranslationBundle:
+    """One loaded language file: dict, serialized JSON body and its ETag"""
+
+    __slots__ = ('version', 'translations', 'body', 'etag', 'tables')
+
+    def __init__(self, version, translations):
+        self.version = version
+        self.translations = translations
+        self.body = json.dumps(translations, ensure_ascii=False).encode('utf-8')
+        self.etag = hashlib.sha1(self.body).hexdigest()
+        self.tables = {}  # Pre-resolved string tables {name: {key: text}}
+
+
+class TranslationRegistry:
+    """Loads translation bundles once per file version"""
+
+    def __init__(self, translations_dir=None):
+        if translations_dir is None:
+            translations_dir = os.path.join(app_config.DATA_DIR, 'translations')
+        self.translations_dir = translations_dir
+        self._bundles = {}  # {language: TranslationBundle}
+        self._lock = threading.Lock()
+
+    def _path(self, language):
+        return os.path.join(self.translations_dir, f'{language}.json')
+
+    def get_bundle(self, language):
+        """Bundle for language, reloaded if the file changed. Raises if it cannot be read"""
+        path = self._path(language)
+        stat = os.stat(path)
+        version = (stat.st_mtime_ns, stat.st_size)
+
+        bundle = self._bundles.get(language)
+        if bundle is not None and bundle.version == version:
+            return bundle
+
+        with self._lock:
+            bundle = self._bundles.get(language)
+            if bundle is None or bundle.version != version:
+                with open(path, 'r', encoding='utf-8') as f:
+                    bundle = TranslationBundle(version, json.load(f))
+                self._bundles[language] = bundle
+                print(f"Loaded translations: {language}")
+            return bundle
+
+    def get(self, language):
+        """Translations dict for language (shared - do not modify)"""
+        return self.get_bundle(language).translations
+
+    def resolve_table(self, language, name, defaults):
+        """
+        {key: translated text} for every key in defaults, falling back to the default
+        Resolved once per bundle version; English defaults if the file is unreadable
+        """
+        try:
+            bundle = self.get_bundle(language)
+        except Exception as e:
+            print(f"Error loading translations: {e}")
+            return dict(defaults)
+
+        table = bundle.tables.get(name)
+        if table is None:
+            table = {key: bundle.translations.get(key, default) for key, default in defaults.items()}
+            bundle.tables[name] = table
+        return table
+
+
+# Shared process-wide instance
+translation_registry = TranslationRegistry()
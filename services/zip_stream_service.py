@@ -0,0 +1,165 @@
+"""
+ZIP Stream Service
+Streams result folders as ZIP archives chunk by chunk (bounded memory)
+Finished archives are cached on disk per folder until any file in it changes
+"""
+
+import hashlib
+import os
+import tempfile
+import zipfile
+from urllib.parse import quote
+from config import app_config
+
+CHUNK_SIZE = 64 * 1024
+
+# Already compressed - deflating again only costs CPU
+COMPRESSED_EXTENSIONS = {
+    '.zip', '.gz', '.bz2', '.xz', '.7z', '.rar',
+    '.png', '.jpg', '.jpeg', '.gif', '.webp', '.pdf', '.docx', '.xlsx', '.pptx'
+}
+
+
+class _ChunkBuffer:
+    """Write-only, non-seekable sink for ZipFile - collects bytes until drained"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        """Return and forget everything written so far"""
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def list_zip_entries(base_path):
+    """
+    Files under base_path as (file_path, arcname, size, mtime_ns), sorted by arcname
+    The stat data doubles as the folder signature for the archive cache
+    """
+    entries = []
+    for root, dirs, files in os.walk(base_path):
+        for file in files:
+            file_path = os.path.join(root, file)
+            stat = os.stat(file_path)
+            arcname = os.path.relpath(file_path, base_path)
+            entries.append((file_path, arcname, stat.st_size, stat.st_mtime_ns))
+    entries.sort(key=lambda entry: entry[1])
+    return entries
+
+
+def choose_compression(arcname, size, store_max_size):
+    """ZIP_STORED for small or already compressed files, ZIP_DEFLATED otherwise"""
+    if size <= store_max_size:
+        return zipfile.ZIP_STORED
+    if os.path.splitext(arcname)[1].lower() in COMPRESSED_EXTENSIONS:
+        return zipfile.ZIP_STORED
+    return zipfile.ZIP_DEFLATED
+
+
+def stream_zip(entries, store_max_size=None):
+    """
+    Generate a ZIP archive as byte chunks, one file at a time
+    Memory use is bounded by CHUNK_SIZE plus the compressor state
+    """
+    if store_max_size is None:
+        store_max_size = app_config.ZIP_STORE_MAX_BYTES
+
+    buffer = _ChunkBuffer()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as zipf:
+        for file_path, arcname, size, mtime_ns in entries:
+            zinfo = zipfile.ZipInfo.from_file(file_path, arcname)
+            zinfo.compress_type = choose_compression(arcname, size, store_max_size)
+            with open(file_path, 'rb') as src, zipf.open(zinfo, 'w', force_zip64=size > zipfile.ZIP64_LIMIT) as dst:
+                while True:
+                    chunk = src.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    dst.write(chunk)
+                    data = buffer.drain()
+                    if data:
+                        yield data
+            data = buffer.drain()
+            if data:
+                yield data
+    # Central directory
+    data = buffer.drain()
+    if data:
+        yield data
+
+
+def content_disposition(filename):
+    """Attachment header that keeps Hebrew/Russian folder names (RFC 5987)"""
+    ascii_name = filename.encode('ascii', 'replace').decode('ascii').replace('?', '_').replace('"', '')
+    return f"attachment; filename=\"{ascii_name}\"; filename*=UTF-8''{quote(filename)}"
+
+
+class ZipArchiveCache:
+    """On-disk cache of streamed archives, keyed by folder and its file signature"""
+
+    def __init__(self, cache_dir=None):
+        if cache_dir is None:
+            cache_dir = app_config.ZIP_CACHE_DIR
+        self.cache_dir = cache_dir
+
+    @staticmethod
+    def _digest(value):
+        return hashlib.sha1(repr(value).encode('utf-8')).hexdigest()[:16]
+
+    def _prefix(self, key):
+        return self._digest(key) + '-'
+
+    def _path(self, key, entries):
+        # Only arcname, size and mtime - the absolute path is part of the key
+        signature = [(arcname, size, mtime_ns) for _, arcname, size, mtime_ns in entries]
+        return os.path.join(self.cache_dir, self._prefix(key) + self._digest(signature) + '.zip')
+
+    def get(self, key, entries):
+        """Path of a cached archive matching the current files, or None"""
+        path = self._path(key, entries)
+        return path if os.path.exists(path) else None
+
+    def stream(self, key, entries):
+        """Stream the archive and save a copy in the cache once it is complete"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        final_path = self._path(key, entries)
+        fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        complete = False
+        try:
+            with os.fdopen(fd, 'wb') as cache_file:
+                for chunk in stream_zip(entries):
+                    cache_file.write(chunk)
+                    yield chunk
+            os.replace(temp_path, final_path)
+            complete = True
+            self._remove_stale(key, keep=final_path)
+        finally:
+            # Client disconnected or error - never keep a partial archive
+            if not complete and os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def invalidate(self, key):
+        """Drop cached archives of a folder (after delete)"""
+        self._remove_stale(key, keep=None)
+
+    def _remove_stale(self, key, keep):
+        prefix = self._prefix(key)
+        try:
+            names = os.listdir(self.cache_dir)
+        except FileNotFoundError:
+            return
+        for name in names:
+            path = os.path.join(self.cache_dir, name)
+            if name.startswith(prefix) and name.endswith('.zip') and path != keep:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
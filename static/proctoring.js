@@ -11,6 +11,12 @@ let totalSeconds = 0;
 let timerInterval = null;
 let focusCheckInterval = null;
 
+// NEW v5: Proctoring events are buffered and sent in batches
+// REMARK: Previously every blur/copy/paste sent its own request
+const PROCTORING_FLUSH_MS = 3000;
+let proctoringBuffer = [];
+let proctoringFlushTimeout = null;
+
 // ============================================================================
 // STAGE 1: PRE-EXAM SCREEN - Initialization
 // ============================================================================
@@ -40,7 +46,9 @@ async function handlePreExamSubmit(e) {
             headers: { 'Content-Type': 'application/json' },
             body: JSON.stringify({
                 first_name: firstName,
-                last_name: lastName
+                last_name: lastName,
+                // Continue an attempt this browser started (page reload)
+                student_session_id: localStorage.getItem(`exam_${examId}_student`)
             })
         });
         
@@ -48,6 +56,7 @@ async function handlePreExamSubmit(e) {
         
         if (data.success) {
             studentSessionId = data.student_session_id;
+            localStorage.setItem(`exam_${examId}_student`, studentSessionId);
             examQuestions = data.exam_data.questions;
             const textDirection = data.exam_data.text_direction || 'ltr';
             
@@ -73,6 +82,11 @@ async function handlePreExamSubmit(e) {
                 displayAllQuestions();
             }
             
+            // Restore autosaved answers and start autosaving (functions from student_exam_session.html)
+            if (typeof startAutosave === 'function') {
+                startAutosave(data.saved_answers || {}, data.autosave_seq || 0);
+            }
+            
             // Start timer (function from student_exam_session.html)
             if (typeof startTimer === 'function') {
                 startTimer();
@@ -80,6 +94,11 @@ async function handlePreExamSubmit(e) {
             
             // Initialize proctoring
             initializeProctoring();
+            
+            // Listen for teacher controls (function from student_exam_session.html)
+            if (typeof connectExamEvents === 'function') {
+                connectExamEvents();
+            }
         } else {
             alert((window.i18n?.t('error_generic') || 'Error') + ': ' + data.message);
         }
@@ -113,6 +132,10 @@ function initializeProctoring() {
     
     // Periodic check for focus
     focusCheckInterval = setInterval(checkFocusStatus, 5000);
+    
+    // Send buffered events when the page is hidden or closed (sendBeacon survives unload)
+    window.addEventListener('pagehide', flushProctoringEventsBeacon);
+    document.addEventListener('visibilitychange', handleVisibilityFlush);
 }
 
 function stopProctoring() {
@@ -132,6 +155,11 @@ function stopProctoring() {
         focusCheckInterval = null;
     }
     
+    // Send what is still buffered
+    flushProctoringEvents();
+    window.removeEventListener('pagehide', flushProctoringEventsBeacon);
+    document.removeEventListener('visibilitychange', handleVisibilityFlush);
+    
     console.log('Proctoring stopped - exam completed');
 }
 
@@ -158,6 +186,13 @@ function handleWindowBlur() {
 function handleBeforeUnload(e) {
     if (examFocusGained && examStarted) {
         logCheatingAttempt('page_unload');
+        flushProctoringEventsBeacon();
+    }
+}
+
+function handleVisibilityFlush() {
+    if (document.visibilityState === 'hidden') {
+        flushProctoringEventsBeacon();
     }
 }
 
@@ -274,33 +309,64 @@ function logCheatingAttempt(attemptType, details = null) {
         return;
     }
     
-    const examId = getExamIdFromURL();
-    
-    fetch(`/api/exam/${examId}/log-cheating`, {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({
-            student_session_id: studentSessionId,
-            attempt_type: attemptType,
-            details: details,
-            timestamp: new Date().toISOString()
-        })
-    }).catch(error => console.error('Error logging cheating attempt:', error));
+    queueProctoringEvent('cheating', attemptType, details);
 }
 
 function logEvent(eventType, eventData = null) {
-    const examId = getExamIdFromURL();
+    queueProctoringEvent('event', eventType, eventData);
+}
+
+function queueProctoringEvent(kind, type, details) {
+    proctoringBuffer.push({
+        kind: kind,
+        type: type,
+        details: details,
+        timestamp: new Date().toISOString()  // Time of the event, not of the batch
+    });
+    if (!proctoringFlushTimeout) {
+        proctoringFlushTimeout = setTimeout(flushProctoringEvents, PROCTORING_FLUSH_MS);
+    }
+}
+
+function takeProctoringBatch() {
+    if (proctoringFlushTimeout) {
+        clearTimeout(proctoringFlushTimeout);
+        proctoringFlushTimeout = null;
+    }
+    if (proctoringBuffer.length === 0 || !studentSessionId) {
+        return null;
+    }
+    const events = proctoringBuffer;
+    proctoringBuffer = [];
+    return JSON.stringify({student_session_id: studentSessionId, events: events});
+}
+
+function flushProctoringEvents() {
+    const body = takeProctoringBatch();
+    if (!body) {
+        return Promise.resolve();
+    }
     
-    fetch(`/api/exam/${examId}/log-event`, {
+    return fetch(`/api/exam/${getExamIdFromURL()}/log-batch`, {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({
-            student_session_id: studentSessionId,
-            event_type: eventType,
-            event_data: eventData,
-            timestamp: new Date().toISOString()
-        })
-    }).catch(error => console.error('Error logging event:', error));
+        body: body,
+        keepalive: true
+    }).catch(error => console.error('Error logging proctoring events:', error));
+}
+
+function flushProctoringEventsBeacon() {
+    const body = takeProctoringBatch();
+    if (!body) {
+        return;
+    }
+    
+    const url = `/api/exam/${getExamIdFromURL()}/log-batch`;
+    const blob = new Blob([body], { type: 'application/json' });
+    if (!(navigator.sendBeacon && navigator.sendBeacon(url, blob))) {
+        fetch(url, { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: body, keepalive: true })
+            .catch(error => console.error('Error logging proctoring events:', error));
+    }
 }
 
 // ============================================================================
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Test Autosave - sequenced answer deltas and coalesced store writes
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services.autosave_service import AutosaveWriter
+from services.exam_session_service import ExamSessionManager
+from services.exam_session_store import ExamSessionStore
+
+
+class CountingStore(ExamSessionStore):
+    """Session store that counts autosave writes"""
+
+    def __init__(self, db_path):
+        super().__init__(db_path)
+        self.autosave_writes = 0
+
+    def save_autosave(self, student_session_id, entries):
+        self.autosave_writes += 1
+        return super().save_autosave(student_session_id, entries)
+
+
+def _new_exam(store=None):
+    manager = ExamSessionManager(store=store)
+    exam_id = manager.start_exam('teacher_1', 'Quiz.txt', 'Quiz')
+    session = manager.get_session(exam_id)
+    student_id = session.add_student('Dana', 'Levi')
+    return manager, session, student_id
+
+
+def test_merge_by_sequence():
+    """Deltas merge per question; an older seq never overwrites a newer answer"""
+    print("💾 Testing autosave merge...")
+    _, session, student_id = _new_exam()
+
+    assert session.autosave_answers(student_id, 2, {'Q1': 'b', 'Q2': 'x'}) == {'Q1': (2, 'b'), 'Q2': (2, 'x')}
+    # Late request sent before the one above
+    assert session.autosave_answers(student_id, 1, {'Q1': 'a', 'Q3': 'y'}) == {'Q3': (1, 'y')}
+
+    student = session.get_student(student_id)
+    assert student['answers'] == {'Q1': 'b', 'Q2': 'x', 'Q3': 'y'}
+    assert student['autosave_seq'] == 2
+
+    session.submit_student_exam(student_id, {'Q1': 'final'}, 100)
+    assert session.autosave_answers(student_id, 3, {'Q1': 'late'}) is None
+    assert session.autosave_answers('unknown', 1, {'Q1': 'a'}) is None
+    print("  ✓ Out-of-order deltas merged, submitted students rejected")
+
+
+def test_resume_same_name_only():
+    """Only an in-progress student with the same name can be resumed"""
+    print("\n🔁 Testing resume...")
+    _, session, student_id = _new_exam()
+    assert session.find_resumable_student(student_id, 'dana', 'LEVI') is not None
+    assert session.find_resumable_student(student_id, 'Other', 'Levi') is None
+    assert session.find_resumable_student(None, 'Dana', 'Levi') is None
+    session.submit_student_exam(student_id, {}, 0)
+    assert session.find_resumable_student(student_id, 'Dana', 'Levi') is None
+    print("  ✓ Name checked, submitted attempts not resumable")
+
+
+def test_coalesced_writes():
+    """Many deltas within the interval become one store write per student"""
+    print("\n✍️ Testing coalesced writer...")
+    store = CountingStore(os.path.join(tempfile.mkdtemp(), 'sessions.db'))
+    _, session, student_id = _new_exam(store)
+    writer = AutosaveWriter(store=store, flush_interval=0.3)
+
+    # First delta of an idle student is written right away
+    writer.save(student_id, session.autosave_answers(student_id, 1, {'Q1': 'a'}))
+    time.sleep(0.1)
+    assert store.autosave_writes == 1
+
+    for seq in range(2, 52):
+        writer.save(student_id, session.autosave_answers(student_id, seq, {'Q1': f'answer {seq}'}))
+    assert writer.pending() == 1
+    answers, seq = writer.saved_answers(student_id, session.get_student(student_id))
+    assert answers == {'Q1': 'answer 51'} and seq == 51
+
+    time.sleep(0.5)
+    assert store.autosave_writes == 2, store.autosave_writes
+    assert store.get_autosave(student_id) == {'Q1': (51, 'answer 51')}
+
+    # A restarted worker sees the flushed answers
+    reloaded = ExamSessionManager(store=store).get_session(session.exam_id)
+    student = reloaded.get_student(student_id)
+    assert student['answers'] == {'Q1': 'answer 51'} and student['autosave_seq'] == 51
+    writer.close()
+    print(f"  ✓ 51 deltas -> {store.autosave_writes} writes")
+
+
+def test_store_keeps_submission():
+    """A flush arriving after the submission does not overwrite final answers"""
+    print("\n🔒 Testing flush after submit...")
+    store = ExamSessionStore(os.path.join(tempfile.mkdtemp(), 'sessions.db'))
+    _, session, student_id = _new_exam(store)
+    entries = session.autosave_answers(student_id, 1, {'Q1': 'draft'})
+    session.submit_student_exam(student_id, {'Q1': 'final'}, 100)
+
+    assert store.save_autosave(student_id, entries) is False
+    assert store.get_autosave(student_id) == {'Q1': (0, 'final')}
+
+    writer = AutosaveWriter(store=store, flush_interval=10)
+    writer.save(student_id, {'Q1': (5, 'draft')})
+    writer.discard(student_id)
+    writer.flush()
+    assert writer.pending() == 0 and writer.flushes == 0
+    print("  ✓ Final answers kept")
+
+
+if __name__ == '__main__':
+    print("=" * 60)
+    print("AUTOSAVE TEST")
+    print("=" * 60)
+
+    test_merge_by_sequence()
+    test_resume_same_name_only()
+    test_coalesced_writes()
+    test_store_keeps_submission()
+
+    print("\n" + "=" * 60)
+    print("✅ ALL TESTS PASSED")
+    print("=" * 60)
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Test DB Pool - thread-local SQLite connections used by AuthService and stores
+"""
+
+import os
+import sys
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services.auth_service import AuthService
+from services.db_pool import ConnectionPool
+
+
+def test_one_connection_per_thread():
+    """Same thread reuses its connection, other threads get their own"""
+    print("🔌 Testing connection pool...")
+    pool = ConnectionPool(os.path.join(tempfile.mkdtemp(), 'pool.db'))
+    conn = pool.connection()
+    assert pool.connection() is conn
+    assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    assert conn.execute('PRAGMA synchronous').fetchone()[0] == 1  # NORMAL
+
+    others = []
+    thread = threading.Thread(target=lambda: others.append(pool.connection()))
+    thread.start()
+    thread.join()
+    assert others[0] is not conn
+    assert pool.opened == 2
+
+    pool.close_all()
+    assert pool.connection() is not conn
+    print("  ✓ Reused per thread, WAL + synchronous=NORMAL")
+
+
+def test_finished_threads_release_connections():
+    """Thread-per-request servers do not pile up connections of ended threads"""
+    print("\n🧵 Testing connections of finished threads...")
+    auth = AuthService(os.path.join(tempfile.mkdtemp(), 'users.db'))
+    auth.add_user('teacher_t', 'secret123', 'T', 'T')
+    fds_before = len(os.listdir('/proc/self/fd')) if os.path.isdir('/proc/self/fd') else None
+
+    for _ in range(300):
+        thread = threading.Thread(target=auth.authenticate, args=('teacher_t', 'secret123'))
+        thread.start()
+        thread.join()
+
+    assert auth.pool.opened == 301
+    assert auth.pool.open_connections() <= 2  # This thread's and the last request thread's
+    if fds_before is not None:
+        assert len(os.listdir('/proc/self/fd')) <= fds_before + 4
+    print(f"  ✓ 300 request threads, {auth.pool.open_connections()} connections held")
+
+
+def test_auth_service_reuses_connection():
+    """Login storm uses one connection per thread, errors do not poison it"""
+    print("\n🔐 Testing AuthService on pooled connections...")
+    auth = AuthService(os.path.join(tempfile.mkdtemp(), 'users.db'))
+    assert auth.add_user('teacher_a', 'secret123', 'A', 'B')['success']
+    assert not auth.add_user('teacher_a', 'secret123', 'A', 'B')['success']  # Rolled back
+
+    for _ in range(20):
+        result = auth.authenticate('teacher_a', 'secret123')
+        assert result['success']
+        assert auth.get_user(result['user']['id'])['username'] == 'teacher_a'
+
+    assert auth.change_password('teacher_a', 'secret123', 'newsecret')['success']
+    assert auth.authenticate('teacher_a', 'newsecret')['success']
+    assert auth.pool.opened == 1
+    print("  ✓ 40+ queries on a single connection")
+
+
+def test_user_cache():
+    """get_user hits SQLite once, change_password invalidates the record"""
+    print("\n👤 Testing user cache...")
+    auth = AuthService(os.path.join(tempfile.mkdtemp(), 'users.db'))
+    user_id = auth.add_user('teacher_b', 'secret123', 'B', 'C')['user_id']
+
+    first = auth.get_user(user_id)
+    first['first_name'] = 'changed by caller'
+    assert auth.get_user(user_id)['first_name'] == 'B'
+    assert user_id in auth._user_cache
+
+    # Edit the row behind the cache's back - still cached until invalidated
+    with auth.pool.connection() as conn:
+        conn.execute("UPDATE users SET first_name = 'Bee' WHERE id = ?", (user_id,))
+    assert auth.get_user(user_id)['first_name'] == 'B'
+
+    assert auth.change_password('teacher_b', 'secret123', 'newsecret')['success']
+    assert auth.get_user(user_id)['first_name'] == 'Bee'
+    assert auth.get_user(9999) is None
+    print("  ✓ Cached copies, invalidated on password change")
+
+
+if __name__ == '__main__':
+    print("=" * 60)
+    print("DB POOL TEST")
+    print("=" * 60)
+
+    test_one_connection_per_thread()
+    test_finished_threads_release_connections()
+    test_auth_service_reuses_connection()
+    test_user_cache()
+
+    print("\n" + "=" * 60)
+    print("✅ ALL TESTS PASSED")
+    print("=" * 60)
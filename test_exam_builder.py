@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Test Exam Builder - parsing and exam cache
+"""
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services.exam_builder_service import ExamBuilder
+from services.exam_cache_service import ExamCache, exam_cache
+from services.language_service import detect_language
+from services.answer_key import AnswerKey
+from services.exam_tokenizer import (
+    tokenize, scan_exam, TOKEN_QUESTION, TOKEN_ANSWER, TOKEN_OPEN_MARKER, TOKEN_BLANK
+)
+
+SAMPLE_EXAM = """1. What is 2+2?
+4
+3
+5
+
+2. Capital of France?
+Paris
+London
+
+3. Write a function that adds two numbers
+Programming task:
+def add(a, b):
+"""
+
+
+def _write_exam(content):
+    fd, path = tempfile.mkstemp(suffix='.txt')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        f.write(content)
+    return path
+
+
+def test_parse_exam_file():
+    """Parsed structure matches exam file"""
+    print("📝 Testing parse_exam_file...")
+    path = _write_exam(SAMPLE_EXAM)
+    try:
+        data = ExamBuilder.parse_exam_file(path)
+        assert data['total_questions'] == 3
+        assert data['text_direction'] == 'ltr'
+        assert data['language'] == 'en'
+        assert data['question_answer_dict']['What is 2+2?'] == '4'
+        assert data['questions'][2]['type'] == 'open'
+        assert ExamBuilder.parse_exam_file(path, max_questions=2)['total_questions'] == 2
+        print("  ✓ Questions, answers and direction parsed")
+    finally:
+        os.remove(path)
+
+
+def test_tokenizer_token_types():
+    """Every line becomes exactly one typed token"""
+    print("\n🔤 Testing tokenizer...")
+    lines = SAMPLE_EXAM.split('\n')
+    tokens = list(tokenize(lines))
+    assert len(tokens) == len(lines)
+    assert tokens[0].kind == TOKEN_QUESTION
+    assert tokens[0].text == 'What is 2+2?'
+    assert tokens[0].number == 1
+    assert tokens[1].kind == TOKEN_ANSWER
+    assert tokens[4].kind == TOKEN_BLANK
+    assert tokens[10].kind == TOKEN_OPEN_MARKER
+
+    # Bidi marks before the number are allowed (Hebrew exams)
+    rtl_token = next(tokenize(['\u200F12. שאלה?']))
+    assert rtl_token.kind == TOKEN_QUESTION and rtl_token.number == 12
+    assert rtl_token.text == 'שאלה?'
+    print("  ✓ Question, answer, open-marker and blank tokens emitted")
+
+
+def test_scan_exam_blocks():
+    """One pass builds question blocks and the answer dictionary"""
+    print("\n📦 Testing scan_exam...")
+    blocks, qa_dict = scan_exam(SAMPLE_EXAM.split('\n'))
+    assert [b.number for b in blocks] == [1, 2, 3]
+    assert blocks[0].answers == ['4', '3', '5']
+    assert blocks[2].marker_indexes == [0]
+    assert qa_dict == {
+        'What is 2+2?': '4',
+        'Capital of France?': 'Paris',
+        'Write a function that adds two numbers': 'Programming task:'
+    }
+    assert blocks[1].raw_text == '2. Capital of France?\nParis\nLondon\n'
+    print("  ✓ Blocks, raw text and qa dict built together")
+
+
+def test_preview_and_validation():
+    """Preview and validation share the tokenizer output"""
+    print("\n🔍 Testing preview and validation...")
+    questions = ExamBuilder.parse_exam_content(SAMPLE_EXAM, shuffle=False)
+    assert [q['type'] for q in questions] == ['multiple_choice', 'multiple_choice', 'open']
+    assert questions[2]['task_content'] == 'def add(a, b):'
+
+    metadata = ExamBuilder.validate_exam_content(SAMPLE_EXAM + "\n4. Lonely option?\nOnly one\n")
+    assert metadata['total_questions'] == 4
+    assert metadata['exam_type'] == 'Mixed'
+    assert metadata['errors'][0]['type'] == 'insufficient_options'
+    assert metadata['errors'][0]['text'].startswith('4. Lonely option?')
+    print("  ✓ Question objects and validation errors correct")
+
+
+def test_exam_cache_parses_once():
+    """Same file version is parsed only once"""
+    print("\n🗄  Testing exam cache...")
+    cache = ExamCache(max_entries=2)
+    calls = []
+
+    def loader(path):
+        calls.append(path)
+        return {'path': path}
+
+    path = _write_exam(SAMPLE_EXAM)
+    try:
+        first = cache.get(path, loader)
+        second = cache.get(path, loader)
+        assert first is second
+        assert len(calls) == 1
+
+        # Changing the file (size changes) creates a new version
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write("\n4. New question?\nYes\nNo\n")
+        cache.get(path, loader)
+        assert len(calls) == 2
+
+        # Explicit invalidation forces a re-parse
+        assert cache.invalidate(path)
+        cache.get(path, loader)
+        assert len(calls) == 3
+        print("  ✓ Parsed once per version, invalidation works")
+    finally:
+        os.remove(path)
+
+
+def test_exam_cache_lru_eviction():
+    """Least recently used entry is evicted first"""
+    print("\n♻️  Testing LRU eviction...")
+    cache = ExamCache(max_entries=2)
+    paths = [_write_exam(SAMPLE_EXAM) for _ in range(3)]
+    try:
+        for path in paths:
+            cache.get(path, lambda p: p)
+        assert cache.stats()['entries'] == 2
+        assert not cache.invalidate(paths[0])
+        print("  ✓ Oldest entry evicted")
+    finally:
+        for path in paths:
+            os.remove(path)
+
+
+def test_cached_questions_are_copies():
+    """Shuffling a parsed exam must not corrupt the cached copy"""
+    print("\n🔀 Testing cached copies...")
+    path = _write_exam(SAMPLE_EXAM)
+    try:
+        data = ExamBuilder.parse_exam_file(path)
+        ExamBuilder.shuffle_exam(data['questions'], True)
+        data['questions'][0]['answers'].append('tampered')
+
+        fresh = ExamBuilder.parse_exam_file(path)
+        assert fresh['questions'][0]['answers'] == ['4', '3', '5']
+        assert [q['number'] for q in fresh['questions']] == [1, 2, 3]
+        print("  ✓ Cached exam untouched by caller mutations")
+    finally:
+        exam_cache.invalidate(path)
+        os.remove(path)
+
+
+def test_language_detection():
+    """Byte-counting detector matches the per-character 5% threshold rule"""
+    print("\n🌐 Testing language detection...")
+
+    def reference(text):
+        if not text:
+            return 'en'
+        hebrew = sum(1 for c in text if "\u0590" <= c <= "\u05FF")
+        russian = sum(1 for c in text if "\u0400" <= c <= "\u04FF")
+        if hebrew * 100.0 / len(text) >= 5.0:
+            return 'he'
+        if russian * 100.0 / len(text) >= 5.0:
+            return 'ru'
+        return 'en'
+
+    samples = [
+        '', 'plain english text',
+        'מה זה פייתון? שפת תכנות',
+        'Что такое Python? Язык программирования',
+        'Russian manual ' + 'слово ' * 50 + 'עברית',
+        'English ' * 20 + 'שלום',               # Hebrew below 5%
+        'Armenian \u0580\u0585 is not Hebrew',  # D6 80..8F lead byte range
+        'Ӿ Ѐ ӿ edges \u0590\u05ff',
+    ]
+    for text in samples:
+        assert detect_language(text) == reference(text), text
+        assert ExamBuilder.detect_language(text) == reference(text), text
+    print("  ✓ Same result as the per-character reference")
+
+    path = _write_exam('1. מה זה?\n+כן\nלא\n')
+    try:
+        data = ExamBuilder.parse_exam_file(path)
+        assert data['language'] == 'he'
+        assert data['text_direction'] == 'rtl'
+        print("  ✓ Language cached with the compiled exam")
+    finally:
+        exam_cache.invalidate(path)
+        os.remove(path)
+
+
+def test_answer_key_scoring():
+    """Compiled answer key grades like the original per-answer loop"""
+    print("\n🔑 Testing answer key...")
+
+    def reference(submitted, qa_dict):
+        correct = 0
+        for text, answer in submitted.items():
+            key = ExamBuilder.remove_number(text)
+            if key in qa_dict:
+                if ExamBuilder.is_open_question_marker(qa_dict[key]):
+                    return -1
+                if qa_dict[key].strip() == answer.strip():
+                    correct += 1
+        return round(correct / len(submitted) * 100) if submitted else 0
+
+    _, qa_dict = scan_exam(SAMPLE_EXAM.split('\n'))
+    key = AnswerKey(qa_dict)
+    assert len(key) == len(qa_dict)
+    assert key.has_open_questions
+
+    cases = [
+        {},
+        {'What is 2+2?': '4'},
+        {'What is 2+2?': ' 4 ', 'Capital of France?': 'Rome'},
+        {'1. What is 2+2?': '4', 'Unknown question': 'x'},
+        {'What is 2+2?': '4', 'Write a function that adds two numbers': 'def f(): pass'},
+    ]
+    for submitted in cases:
+        assert key.score(submitted) == reference(submitted, qa_dict), submitted
+        assert ExamBuilder.calculate_score(submitted, qa_dict) == reference(submitted, qa_dict)
+    print("  ✓ Same scores as the original algorithm")
+
+    assert key.resolve('1. What is 2+2?') == key.resolve('What is 2+2?') == 0
+    assert key.resolve('Unknown question') is None
+    assert key.score_ids([(0, '4'), (None, 'x')]) == 50
+    print("  ✓ Integer ids resolve numbered and plain question texts")
+
+
+if __name__ == '__main__':
+    print("=" * 60)
+    print("EXAM BUILDER TEST")
+    print("=" * 60)
+
+    test_parse_exam_file()
+    test_tokenizer_token_types()
+    test_scan_exam_blocks()
+    test_preview_and_validation()
+    test_exam_cache_parses_once()
+    test_exam_cache_lru_eviction()
+    test_cached_questions_are_copies()
+    test_language_detection()
+    test_answer_key_scoring()
+
+    print("\n" + "=" * 60)
+    print("✅ ALL TESTS PASSED")
+    print("=" * 60)
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Test Exam Events - fan-out of teacher controls to connected students
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services.exam_events_service import ExamEventBroadcaster
+from services.exam_session_store import ExamSessionStore
+
+
+def test_publish_and_events_since():
+    """In-memory events get increasing ids and are returned after an id"""
+    print("📣 Testing publish / events_since...")
+    events = ExamEventBroadcaster()
+    first = events.publish(1, 'announcement', {'message': 'Hello'})
+    second = events.publish(1, 'pause')
+    events.publish(2, 'end')
+
+    assert second['id'] > first['id']
+    assert [e['type'] for e in events.events_since(1, 0)] == ['announcement', 'pause']
+    assert [e['type'] for e in events.events_since(1, first['id'])] == ['pause']
+    assert events.last_event_id(1) == second['id']
+    assert events.last_event_id(3) == 0
+
+    try:
+        events.publish(1, 'explode')
+        assert False, "Unknown event type accepted"
+    except ValueError:
+        pass
+    print("  ✓ Events ordered per exam, unknown types rejected")
+
+
+def test_wait_wakes_all_subscribers():
+    """One publish wakes every waiting client of the exam"""
+    print("\n⏰ Testing wait wake-up...")
+    events = ExamEventBroadcaster()
+    results = []
+
+    def subscriber():
+        results.append(events.wait(7, 0, timeout=5))
+
+    threads = [threading.Thread(target=subscriber) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+    started = time.monotonic()
+    events.publish(7, 'extend_time', {'minutes': 10})
+    for thread in threads:
+        thread.join()
+
+    assert time.monotonic() - started < 1
+    assert len(results) == 20
+    assert all(r and r[0]['data'] == {'minutes': 10} for r in results)
+    assert events.wait(7, results[0][-1]['id'], timeout=0.05) == []
+    print("  ✓ 20 subscribers woken by one event, timeout returns []")
+
+
+def test_store_shared_between_broadcasters():
+    """With a store, events published by one worker reach another"""
+    print("\n🗄️ Testing store-backed events...")
+    store = ExamSessionStore(os.path.join(tempfile.mkdtemp(), 'sessions.db'))
+    worker_a = ExamEventBroadcaster(store=store, poll_interval=0.05)
+    worker_b = ExamEventBroadcaster(store=store, poll_interval=0.05)
+
+    assert worker_b.last_event_id(3) == 0
+    event = worker_a.publish(3, 'announcement', {'message': 'שלום'})
+    assert event['data'] == {'message': 'שלום'}
+
+    received = worker_b.wait(3, 0, timeout=2)
+    assert [e['id'] for e in received] == [event['id']]
+    assert store.list_events(3, 0)[0]['type'] == 'announcement'
+    assert store.list_events(3, event['id']) == []
+    assert store.list_events(4, 0) == []
+    print("  ✓ Other worker sees the event through the events table")
+
+
+if __name__ == '__main__':
+    print("=" * 60)
+    print("EXAM EVENTS TEST")
+    print("=" * 60)
+
+    test_publish_and_events_since()
+    test_wait_wakes_all_subscribers()
+    test_store_shared_between_broadcasters()
+
+    print("\n" + "=" * 60)
+    print("✅ ALL TESTS PASSED")
+    print("=" * 60)
@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+"""
+Test Exam Routes - the exam API through the Flask test client
+The app runs on throwaway data, teacher and log folders (set before app is imported)
+"""
+
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config import app_config
+
+TEST_ROOT = tempfile.mkdtemp()
+app_config.DATA_DIR = os.path.join(TEST_ROOT, 'data')
+app_config.TEACHERS_DIR = os.path.join(TEST_ROOT, 'teachers')
+app_config.LOGS_DIR = os.path.join(TEST_ROOT, 'logs')
+app_config.ZIP_CACHE_DIR = os.path.join(app_config.DATA_DIR, 'zip_cache')
+app_config.RESULTS_JOURNAL_DIR = os.path.join(app_config.DATA_DIR, 'results_journal')
+app_config.REGRADE_JOBS_DIR = os.path.join(app_config.DATA_DIR, 'regrade_jobs')
+for _name in ('DATABASE_PATH', 'SESSIONS_DB_PATH', 'RESULTS_INDEX_DB_PATH', 'ITEM_STATS_DB_PATH',
+              'EXAM_ID_SEQUENCE_DB_PATH', 'PROCTORING_INDEX_DB_PATH'):
+    setattr(app_config, _name, os.path.join(app_config.DATA_DIR, os.path.basename(getattr(app_config, _name))))
+
+import app as exam_app
+
+EXAM_TEXT = "1. What is 2+2?\n4\n5\n\n2. What is 3+3?\n6\n7\n"
+
+
+def _teacher_client(username):
+    """Logged-in test client of a new teacher with one exam file (Quiz.txt)"""
+    exam_app.auth_service.add_user(username, 'TestPass123', 'Test', 'Teacher')
+    user_id = exam_app.auth_service.authenticate(username, 'TestPass123')['user']['id']
+    client = exam_app.app.test_client()
+    with client.session_transaction() as flask_session:
+        flask_session['user_id'] = user_id
+    exams_dir = os.path.join(app_config.TEACHERS_DIR, f'teacher_{user_id}', 'exams')
+    os.makedirs(exams_dir, exist_ok=True)
+    with open(os.path.join(exams_dir, 'Quiz.txt'), 'w', encoding='utf-8') as f:
+        f.write(EXAM_TEXT)
+    return client
+
+
+def _start_exam(client, first_name='Dana', last_name='Levi'):
+    """Start Quiz.txt and join one student; returns (exam_id, student_session_id)"""
+    exam_id = client.post('/api/exam/start-with-settings', json={'exam_filename': 'Quiz.txt'}).get_json()['exam_id']
+    student = client.post(f'/api/exam/{exam_id}/start-student',
+                          json={'first_name': first_name, 'last_name': last_name}).get_json()
+    return exam_id, student['student_session_id']
+
+
+def _submit(client, exam_id, student_id, answers):
+    """Submit answers and wait for the writer thread (files, counters); returns the results folder name"""
+    response = client.post(f'/api/exam/{exam_id}/submit', json={
+        'student_session_id': student_id, 'first_name': 'Dana', 'last_name': 'Levi', 'answers': answers,
+        'questions': [{'text': text} for text in answers]})
+    assert response.status_code == 200
+    exam_app.results_writer.sync()
+    return os.path.basename(exam_app.exam_session_manager.get_session(exam_id).results_folder)
+
+
+def test_log_cheating_without_type():
+    """A cheating report without attempt_type is logged, not a server error"""
+    print("🚨 Testing log-cheating without a type...")
+    client = _teacher_client('routes_cheating')
+    exam_id, student_id = _start_exam(client)
+
+    response = client.post(f'/api/exam/{exam_id}/log-cheating', json={'student_session_id': student_id})
+    assert response.status_code == 200 and response.get_json()['success']
+    response = client.post(f'/api/exam/{exam_id}/log-cheating',
+                           json={'student_session_id': student_id, 'attempt_type': 'focus_lost'})
+    assert response.status_code == 200
+
+    student = exam_app.exam_session_manager.get_session(exam_id).get_student(student_id)
+    assert student['cheating_attempts'] == 2
+    assert [event['type'] for event in student['cheating_log']] == ['None', 'focus_lost']
+    print("  ✓ Missing type logged")
+
+
+def test_memory_report_route():
+    """Memory report of an exam - its teacher only"""
+    print("\n🧮 Testing memory report route...")
+    client = _teacher_client('routes_memory')
+    exam_id, student_id = _start_exam(client)
+    client.post(f'/api/exam/{exam_id}/log-cheating', json={'student_session_id': student_id, 'attempt_type': 'x'})
+
+    assert _teacher_client('routes_memory_other').get(f'/api/exam/{exam_id}/memory').status_code == 403
+    assert exam_app.app.test_client().get(f'/api/exam/{exam_id}/memory').status_code == 302  # To login
+    assert client.get('/api/exam/999999/memory').status_code == 404
+
+    report = client.get(f'/api/exam/{exam_id}/memory').get_json()['report']
+    assert report['students'] == 1 and report['cheating_events_total'] == 1
+    assert report['student_bytes'] > 0
+    print("  ✓ Report for the owner, 403/302/404 otherwise")
+
+
+def test_monitor_feed_without_long_requests():
+    """Sync workers: ?wait is ignored and the monitor is told when to poll again"""
+    print("\n📡 Testing monitor feed...")
+    client = _teacher_client('routes_feed')
+    exam_id, student_id = _start_exam(client)
+    app_config.LONG_REQUESTS_ENABLED = False
+
+    data = client.get(f'/api/exam/{exam_id}/students').get_json()
+    assert data['full'] and [s['student_session_id'] for s in data['students']] == [student_id]
+    started = time.monotonic()
+    data = client.get(f"/api/exam/{exam_id}/students?since={data['version']}&wait=25").get_json()
+    assert time.monotonic() - started < 1 and data['students'] == []
+    assert data['poll_seconds'] == app_config.MONITOR_POLL_SECONDS
+
+    client.post(f'/api/exam/{exam_id}/log-cheating', json={'student_session_id': student_id, 'attempt_type': 'x'})
+    delta = client.get(f"/api/exam/{exam_id}/students?since={data['version']}").get_json()
+    assert not delta['full'] and delta['students'][0]['cheating_attempts'] == 1
+    print("  ✓ Answers at once with poll_seconds, delta after a change")
+
+
+def test_monitor_feed_bad_input():
+    """Unknown exams are 404; a bad or future since falls back to the full list"""
+    print("\n📡 Testing monitor feed input...")
+    client = _teacher_client('routes_feed_input')
+    exam_id, student_id = _start_exam(client)
+
+    assert client.get('/api/exam/999999/students').status_code == 404
+    for since in ('abc', '-', str(10 ** 9)):
+        data = client.get(f'/api/exam/{exam_id}/students?since={since}&wait=oops').get_json()
+        assert data['success'] and data['full']
+        assert [s['student_session_id'] for s in data['students']] == [student_id]
+    print("  ✓ 404 and full list fallbacks")
+
+
+def test_monitor_long_poll_wakes_on_change():
+    """Long requests enabled: a waiting monitor returns as soon as a student changes"""
+    print("\n⏳ Testing monitor long-poll...")
+    client = _teacher_client('routes_long_poll')
+    exam_id, student_id = _start_exam(client)
+    version = client.get(f'/api/exam/{exam_id}/students').get_json()['version']
+    app_config.LONG_REQUESTS_ENABLED = True
+    try:
+        timer = threading.Timer(0.3, lambda: exam_app.exam_session_manager.get_session(exam_id)
+                                .log_cheating_attempt(student_id, 'focus_lost'))
+        timer.start()
+        started = time.monotonic()
+        data = client.get(f'/api/exam/{exam_id}/students?since={version}&wait=10').get_json()
+        timer.join()
+    finally:
+        app_config.LONG_REQUESTS_ENABLED = False
+    assert 0.2 < time.monotonic() - started < 5
+    assert data['poll_seconds'] == 0 and data['students'][0]['cheating_attempts'] == 1
+    print("  ✓ Woken by the change")
+
+
+def test_event_stream_without_long_requests():
+    """Sync workers: the event stream sends state and pending events, then closes"""
+    print("\n📨 Testing event stream...")
+    client = _teacher_client('routes_events')
+    exam_id, _ = _start_exam(client)
+    app_config.LONG_REQUESTS_ENABLED = False
+
+    first = client.get(f'/api/exam/{exam_id}/events').get_data(as_text=True)
+    assert f"retry: {app_config.EXAM_EVENTS_POLL_SECONDS * 1000}" in first and 'event: state' in first
+    client.post(f'/api/exam/{exam_id}/control', json={'action': 'announce', 'message': 'Hello'})
+    body = client.get(f'/api/exam/{exam_id}/events', headers={'Last-Event-ID': '0'}).get_data(as_text=True)
+    assert 'event: announcement' in body and 'Hello' in body
+    print("  ✓ Stream closes after pending events")
+
+
+def test_log_batch_route():
+    """One batch logs its cheating events; bad batches, exams and students are rejected"""
+    print("\n📦 Testing log-batch route...")
+    client = _teacher_client('routes_log_batch')
+    exam_id, student_id = _start_exam(client)
+    log_batch = f'/api/exam/{exam_id}/log-batch'
+
+    assert client.post(log_batch, json={'student_session_id': student_id, 'events': {}}).status_code == 400
+    too_many = [{'kind': 'event', 'type': 'x'}] * (app_config.PROCTORING_BATCH_MAX_EVENTS + 1)
+    assert client.post(log_batch, json={'student_session_id': student_id, 'events': too_many}).status_code == 400
+    assert client.post('/api/exam/999999/log-batch',
+                       json={'student_session_id': student_id, 'events': []}).status_code == 404
+    assert client.post(log_batch, json={'student_session_id': 'nobody', 'events': []}).status_code == 404
+
+    events = [
+        {'kind': 'cheating', 'type': 'focus_lost', 'timestamp': '2026-01-01T10:00:00Z'},
+        {'kind': 'cheating', 'type': 'paste', 'details': {'chars': 12}, 'timestamp': 'not a time'},
+        {'kind': 'event', 'type': 'question_viewed'},
+        {'kind': 'cheating', 'type': 7},
+        'junk'
+    ]
+    # sendBeacon body - JSON without the JSON content type
+    response = client.post(log_batch, data=json.dumps({'student_session_id': student_id, 'events': events}),
+                           content_type='text/plain')
+    assert response.status_code == 200 and response.get_json()['cheating_logged'] == 2
+    student = exam_app.exam_session_manager.get_session(exam_id).get_student(student_id)
+    assert [event['type'] for event in student['cheating_log']] == ['focus_lost', 'paste']
+    print("  ✓ Valid events logged once, bad input rejected")
+
+
+def test_autosave_route():
+    """Autosave validates input, keeps the newest seq per answer and stops after submit"""
+    print("\n💾 Testing autosave route...")
+    client = _teacher_client('routes_autosave')
+    exam_id, student_id = _start_exam(client)
+    autosave = f'/api/exam/{exam_id}/autosave'
+
+    for payload in ({'answers': {}}, {'seq': True, 'answers': {}}, {'seq': 0, 'answers': {}},
+                    {'seq': 1, 'answers': ['4']}, {'seq': 1, 'answers': {'What is 2+2?': 4}},
+                    {'seq': 1, 'answers': {'What is 2+2?': 'x' * (app_config.AUTOSAVE_MAX_ANSWER_CHARS + 1)}}):
+        assert client.post(autosave, json=dict(payload, student_session_id=student_id)).status_code == 400
+    response = client.post('/api/exam/999999/autosave',
+                           json={'student_session_id': student_id, 'seq': 1, 'answers': {}})
+    assert response.status_code == 404
+
+    response = client.post(autosave, json={'student_session_id': student_id, 'seq': 2,
+                                           'answers': {'What is 2+2?': '5', 'What is 3+3?': '6'}})
+    assert response.status_code == 200 and response.get_json()['accepted'] == 2
+    response = client.post(autosave, json={'student_session_id': student_id, 'seq': 1,
+                                           'answers': {'What is 2+2?': '4'}})
+    assert response.get_json()['accepted'] == 0  # Older request arriving late
+    student = exam_app.exam_session_manager.get_session(exam_id).get_student(student_id)
+    assert student['answers']['What is 2+2?'] == '5'
+
+    client.post(f'/api/exam/{exam_id}/submit', json={'student_session_id': student_id, 'answers': {}})
+    response = client.post(autosave, json={'student_session_id': student_id, 'seq': 3,
+                                           'answers': {'What is 2+2?': '4'}})
+    assert response.status_code == 409
+    print("  ✓ Bad input rejected, newest answer kept, closed after submit")
+
+
+def test_control_pause_extend_and_auth():
+    """Only the exam's teacher controls it; paused exams refuse autosave and submit"""
+    print("\n⏸️  Testing exam control...")
+    client = _teacher_client('routes_control')
+    exam_id, student_id = _start_exam(client)
+    control = f'/api/exam/{exam_id}/control'
+
+    other = _teacher_client('routes_control_other')
+    assert other.post(control, json={'action': 'pause'}).status_code == 403
+    assert exam_app.app.test_client().post(control, json={'action': 'pause'}).status_code == 302  # To login
+
+    for minutes in (0, 601, 'ten'):
+        response = client.post(control, json={'action': 'extend_time', 'minutes': minutes})
+        assert response.status_code == 400
+    assert client.post(control, json={'action': 'dance'}).status_code == 400
+    assert client.post(control, json={'action': 'announce', 'message': ' '}).status_code == 400
+
+    response = client.post(control, json={'action': 'pause'})
+    assert response.status_code == 200 and response.get_json()['status'] == 'paused'
+    response = client.post(f'/api/exam/{exam_id}/autosave',
+                           json={'student_session_id': student_id, 'seq': 1, 'answers': {'What is 2+2?': '4'}})
+    assert response.status_code == 409 and response.get_json()['paused']
+    response = client.post(f'/api/exam/{exam_id}/submit',
+                           json={'student_session_id': student_id, 'answers': {'What is 2+2?': '4'}})
+    assert response.status_code == 409 and response.get_json()['paused']
+
+    assert client.post(control, json={'action': 'resume'}).get_json()['status'] == 'running'
+    settings = exam_app.exam_session_manager.get_session(exam_id).settings
+    before = int(settings.get('exam_duration') or 0)
+    response = client.post(control, json={'action': 'extend_time', 'minutes': 15})
+    assert response.status_code == 200
+    assert response.get_json()['event']['data']['exam_duration'] == before + 15
+
+    body = client.get(f'/api/exam/{exam_id}/events', headers={'Last-Event-ID': '0'}).get_data(as_text=True)
+    assert [line for line in body.split('\n') if line.startswith('event: ')][-3:] == [
+        'event: pause', 'event: resume', 'event: extend_time']
+    print("  ✓ Auth, bad input, 409 while paused and events checked")
+
+
+def test_regrade_route_runs_as_job():
+    """Regrade returns a job id at once; the job's report is polled by its teacher only"""
+    print("\n🔁 Testing regrade route...")
+    client = _teacher_client('routes_regrade')
+    exam_id, student_id = _start_exam(client)
+    folder_name = _submit(client, exam_id, student_id, {'What is 2+2?': '4', 'What is 3+3?': '7'})
+    regrade = f'/api/results/{folder_name}/regrade'
+
+    assert client.post('/api/results/No Such Folder/regrade').status_code == 404
+    assert client.post(regrade, json={'exam_filename': '../Quiz.txt'}).status_code == 400
+    assert client.post(regrade, json={'exam_filename': 'Missing.txt'}).status_code == 404
+
+    # Answer key fixed: 7 is right for the second question
+    teacher_id = exam_app.exam_session_manager.get_session(exam_id).teacher_id
+    with open(exam_app.get_exam_path(teacher_id, 'Quiz.txt'), 'w', encoding='utf-8') as f:
+        f.write(EXAM_TEXT.replace("6\n7\n", "7\n6\n"))
+    response = client.post(regrade)
+    assert response.status_code == 202
+    status_url = response.get_json()['status_url']
+
+    deadline = time.monotonic() + 10
+    status = client.get(status_url).get_json()
+    while status['status'] == 'running':
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
+        status = client.get(status_url).get_json()
+    assert status['status'] == 'done' and status['folder_name'] == folder_name
+    assert status['report']['students'] == 1 and len(status['report']['changed']) == 1
+
+    assert _teacher_client('routes_regrade_other').get(status_url).status_code == 404
+    assert client.get('/api/results/regrade-jobs/not-a-job').status_code == 404
+    print("  ✓ 202 with a job, report polled, other teachers see nothing")
+
+
+def test_stats_route():
+    """Live item statistics of a results folder after real submits"""
+    print("\n📊 Testing stats route...")
+    client = _teacher_client('routes_stats')
+    exam_id, first_id = _start_exam(client)
+    second_id = client.post(f'/api/exam/{exam_id}/start-student',
+                            json={'first_name': 'Noa', 'last_name': 'Cohen'}).get_json()['student_session_id']
+    _submit(client, exam_id, first_id, {'What is 2+2?': '4', 'What is 3+3?': '6'})
+    folder_name = _submit(client, exam_id, second_id, {'What is 2+2?': '5', 'What is 3+3?': '6'})
+
+    assert client.get('/api/results/No Such Folder/stats').status_code == 404
+    assert exam_app.app.test_client().get(f'/api/results/{folder_name}/stats').status_code == 302  # To login
+    assert _teacher_client('routes_stats_other').get(f'/api/results/{folder_name}/stats').status_code == 404
+
+    data = client.get(f'/api/results/{folder_name}/stats?full=1').get_json()
+    assert data['summary']['submissions'] == 2 and data['summary']['mean_score'] == 75
+    items = {item['question']: item for item in data['items']}
+    assert items['What is 2+2?']['difficulty'] == 0.5 and items['What is 3+3?']['difficulty'] == 1
+    assert {o['answer']: o['count'] for o in items['What is 2+2?']['options']} == {'4': 1, '5': 1}
+    assert 'discrimination_index' in items['What is 2+2?']
+    print("  ✓ Counters served for the owner, 404/302 otherwise")
+
+
+def test_current_user_copy_per_caller():
+    """The per-request user lookup hands out copies, not the shared cached dict"""
+    print("\n👤 Testing current user cache...")
+    exam_app.auth_service.add_user('routes_user', 'TestPass123', 'Test', 'Teacher')
+    user_id = exam_app.auth_service.authenticate('routes_user', 'TestPass123')['user']['id']
+    with exam_app.app.test_request_context():
+        exam_app.session['user_id'] = user_id
+        first = exam_app.get_current_user()
+        first['username'] = 'changed'
+        assert exam_app.get_current_user()['username'] == 'routes_user'
+    print("  ✓ Edits stay local to the caller")
+
+
+if __name__ == '__main__':
+    print("=" * 60)
+    print("EXAM ROUTES TEST")
+    print("=" * 60)
+
+    test_log_cheating_without_type()
+    test_memory_report_route()
+    test_monitor_feed_without_long_requests()
+    test_monitor_feed_bad_input()
+    test_monitor_long_poll_wakes_on_change()
+    test_event_stream_without_long_requests()
+    test_log_batch_route()
+    test_autosave_route()
+    test_control_pause_extend_and_auth()
+    test_regrade_route_runs_as_job()
+    test_stats_route()
+    test_current_user_copy_per_caller()
+
+    print("\n" + "=" * 60)
+    print("✅ ALL TESTS PASSED")
+    print("=" * 60)
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Test Exam Session Concurrency - many threads start exams, join, log cheating and submit
+No update may be lost and no exam ID handed out twice
+"""
+
+import os
+import sys
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services.exam_session_service import ExamSessionManager
+from services.exam_session_store import ExamSessionStore, ExamIdSequence
+
+THREADS = 16
+
+
+def _hammer(target, count=THREADS):
+    """Run target(thread_index) in count threads released at the same moment"""
+    barrier = threading.Barrier(count)
+    errors = []
+
+    def run(index):
+        barrier.wait()
+        try:
+            target(index)
+        except Exception as e:  # Surfaced by the assert below
+            errors.append(e)
+
+    old_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)  # Switch threads as often as possible
+    try:
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(old_interval)
+    assert not errors, errors
+
+
+def test_concurrent_start_unique_ids():
+    """Concurrent starts never share an exam ID"""
+    print("🆔 Testing concurrent exam starts...")
+    for label, manager in (
+        ('counter', ExamSessionManager()),
+        ('sequence', ExamSessionManager(id_sequence=ExamIdSequence(
+            os.path.join(tempfile.mkdtemp(), 'exam_ids.db')))),
+        ('store', ExamSessionManager(store=ExamSessionStore(
+            os.path.join(tempfile.mkdtemp(), 'sessions.db'))))
+    ):
+        exam_ids = [[] for _ in range(THREADS)]
+        per_thread = 50 if label == 'counter' else 10
+        _hammer(lambda i: exam_ids[i].extend(
+            manager.start_exam(f'teacher_{i}', 'A.txt', 'A') for _ in range(per_thread)
+        ))
+        all_ids = [exam_id for ids in exam_ids for exam_id in ids]
+        assert len(all_ids) == len(set(all_ids)) == THREADS * per_thread
+        assert len(manager.get_all_active_sessions()) == THREADS * per_thread
+        print(f"  ✓ {label}: {len(all_ids)} unique IDs")
+
+
+def test_no_lost_updates():
+    """Joins, cheating logs and submits from many threads are all applied"""
+    print("\n🔨 Testing concurrent student updates...")
+    manager = ExamSessionManager()
+    exam_id = manager.start_exam('teacher_1', 'A.txt', 'A')
+    session = manager.get_session(exam_id)
+    students_per_thread, attempts = 10, 20
+    version = session.version
+    stop = threading.Event()
+    summaries = []
+
+    def monitor():
+        while not stop.is_set():
+            summaries.append(len(manager.get_session_students_summary(exam_id)))
+
+    def student_thread(index):
+        for n in range(students_per_thread):
+            student_id = session.add_student(f'S{index}', str(n))
+            for _ in range(attempts // 2):
+                session.log_cheating_attempt(student_id, 'focus_lost')
+            session.log_cheating_attempts(student_id, [('copy_blocked', None, None)] * (attempts // 2))
+            session.autosave_answers(student_id, 1, {'Q1': 'a'})
+            session.submit_student_exam(student_id, {'Q1': 'a'}, 100)
+
+    watcher = threading.Thread(target=monitor)
+    watcher.start()
+    try:
+        _hammer(student_thread)
+    finally:
+        stop.set()
+        watcher.join()
+
+    total = THREADS * students_per_thread
+    assert len(session.students) == total
+    for student in session.students.values():
+        assert student.status == 'completed' and student.score == 100
+        assert student.cheating_attempts == attempts and len(student.cheating_log) == attempts
+    # add + 10 single logs + 1 batch + submit per student, each exactly one version bump
+    assert session.version == version + total * (attempts // 2 + 3)
+    assert summaries and max(summaries) <= total
+    print(f"  ✓ {total} students, {total * attempts} cheating events, version exact")
+
+
+def test_no_lost_updates_with_store():
+    """Same with write-through to the store - a reload sees every update"""
+    print("\n🗄️ Testing concurrent updates with store...")
+    store = ExamSessionStore(os.path.join(tempfile.mkdtemp(), 'sessions.db'))
+    manager = ExamSessionManager(store=store)
+    exam_id = manager.start_exam('teacher_1', 'A.txt', 'A')
+
+    def student_thread(index):
+        for n in range(3):
+            student_id = manager.add_student_to_exam(exam_id, f'S{index}', str(n))
+            manager.get_session(exam_id).log_cheating_attempts(student_id, [('focus_lost', None, None)] * 4)
+            manager.get_session(exam_id).submit_student_exam(student_id, {'Q1': 'a'}, 50)
+
+    _hammer(student_thread, count=8)
+
+    reloaded = ExamSessionManager(store=store).get_session(exam_id)
+    assert len(reloaded.students) == 24
+    assert all(s.status == 'completed' and s.cheating_attempts == 4 for s in reloaded.students.values())
+    assert reloaded.version == store.get_version(exam_id) == 24 * 3  # One write per update
+    print("  ✓ 24 students and 96 events in the store")
+
+
+if __name__ == '__main__':
+    print("=" * 60)
+    print("EXAM SESSION CONCURRENCY TEST")
+    print("=" * 60)
+
+    test_concurrent_start_unique_ids()
+    test_no_lost_updates()
+    test_no_lost_updates_with_store()
+
+    print("\n" + "=" * 60)
+    print("✅ ALL TESTS PASSED")
+    print("=" * 60)
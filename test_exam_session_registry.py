@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Test Exam Session Registry - durable exam IDs, per-teacher active index, eviction
+"""
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services.exam_session_service import ExamSessionManager
+from services.exam_session_store import ExamSessionStore, ExamIdSequence
+
+
+def test_ids_survive_restart():
+    """A restarted in-memory manager never hands out an old exam ID again"""
+    print("🔢 Testing durable exam IDs...")
+    db_path = os.path.join(tempfile.mkdtemp(), 'exam_ids.db')
+    before = ExamSessionManager(id_sequence=ExamIdSequence(db_path))
+    old_ids = {before.start_exam('teacher_1', 'A.txt', 'A') for _ in range(3)}
+
+    # Restart, plus a second worker on the same sequence
+    after = ExamSessionManager(id_sequence=ExamIdSequence(db_path))
+    other = ExamSessionManager(id_sequence=ExamIdSequence(db_path))
+    new_ids = {after.start_exam('teacher_2', 'B.txt', 'B'), other.start_exam('teacher_3', 'C.txt', 'C')}
+    assert len(new_ids) == 2 and not old_ids & new_ids
+    assert min(new_ids) > max(old_ids)
+    assert after.get_session(min(old_ids)) is None
+    print(f"  ✓ {sorted(old_ids)} before restart, {sorted(new_ids)} after")
+
+
+def test_active_index_per_teacher():
+    """Active listing follows status changes, per teacher"""
+    print("\n👩‍🏫 Testing active index...")
+    manager = ExamSessionManager()
+    a1 = manager.start_exam('teacher_a', 'A.txt', 'A')
+    a2 = manager.start_exam('teacher_a', 'A.txt', 'A')
+    b1 = manager.start_exam('teacher_b', 'B.txt', 'B')
+
+    assert list(manager.get_active_sessions('teacher_a')) == [a1, a2]
+    assert list(manager.get_active_sessions('teacher_b')) == [b1]
+    assert manager.get_active_sessions('teacher_c') == {}
+
+    manager.get_session(a1).pause()
+    assert list(manager.get_active_sessions('teacher_a')) == [a1, a2]
+    manager.end_session(a1)
+    assert list(manager.get_active_sessions('teacher_a')) == [a2]
+    assert list(manager.get_all_active_sessions()) == [a2, b1]
+    print("  ✓ Paused stays active, ended leaves the index")
+
+
+def test_store_active_by_teacher():
+    """With a store, listing uses the teacher/status query"""
+    print("\n🗄️ Testing store listing...")
+    store = ExamSessionStore(os.path.join(tempfile.mkdtemp(), 'sessions.db'))
+    manager = ExamSessionManager(store=store)
+    a1 = manager.start_exam('teacher_a', 'A.txt', 'A')
+    b1 = manager.start_exam('teacher_b', 'B.txt', 'B')
+    a2 = manager.start_exam('teacher_a', 'A.txt', 'A')
+    manager.end_session(a2)
+
+    assert store.list_session_ids(status=('running', 'paused'), teacher_id='teacher_a') == [a1]
+    assert store.list_session_ids(teacher_id='teacher_a') == [a1, a2]
+    other_worker = ExamSessionManager(store=store)
+    assert list(other_worker.get_active_sessions('teacher_b')) == [b1]
+    print("  ✓ Other worker lists only teacher_b's running exam")
+
+
+def test_ended_sessions_evicted():
+    """Ended sessions leave memory after the retention period"""
+    print("\n🧹 Testing eviction...")
+    manager = ExamSessionManager(retention_seconds=0)
+    ended = manager.start_exam('teacher_a', 'A.txt', 'A')
+    running = manager.start_exam('teacher_a', 'A.txt', 'A')
+    manager.end_session(ended)
+
+    assert manager.evict_ended() == 1
+    assert ended not in manager.sessions and running in manager.sessions
+    assert manager.evict_ended() == 0
+
+    kept = ExamSessionManager(retention_seconds=3600)
+    exam_id = kept.start_exam('teacher_a', 'A.txt', 'A')
+    kept.end_session(exam_id)
+    assert kept.evict_ended() == 0 and kept.get_session(exam_id).status == 'ended'
+
+    # Persisted sessions come back from the store on demand
+    store = ExamSessionStore(os.path.join(tempfile.mkdtemp(), 'sessions.db'))
+    persisted = ExamSessionManager(store=store, retention_seconds=0)
+    exam_id = persisted.start_exam('teacher_a', 'A.txt', 'A')
+    persisted.end_session(exam_id)
+    persisted.evict_ended()
+    assert exam_id not in persisted.sessions
+    assert persisted.get_session(exam_id).status == 'ended'
+    print("  ✓ Evicted after retention, persisted ones reload")
+
+
+if __name__ == '__main__':
+    print("=" * 60)
+    print("EXAM SESSION REGISTRY TEST")
+    print("=" * 60)
+
+    test_ids_survive_restart()
+    test_active_index_per_teacher()
+    test_store_active_by_teacher()
+    test_ended_sessions_evicted()
+
+    print("\n" + "=" * 60)
+    print("✅ ALL TESTS PASSED")
+    print("=" * 60)
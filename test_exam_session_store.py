@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+Test Exam Session Store - sessions shared between processes and restarts
+Two ExamSessionManager instances on one DB simulate two worker processes
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services.exam_session_service import ExamSessionManager
+from services.exam_session_store import ExamSessionStore
+
+
+def _new_store():
+    db_dir = tempfile.mkdtemp()
+    return ExamSessionStore(os.path.join(db_dir, 'exam_sessions.db'))
+
+
+def test_sessions_shared_between_workers():
+    """Changes made by one worker are visible to another"""
+    print("🔄 Testing shared sessions...")
+    store = _new_store()
+    worker_a = ExamSessionManager(store=ExamSessionStore(store.db_path))
+    worker_b = ExamSessionManager(store=ExamSessionStore(store.db_path))
+
+    exam_id = worker_a.start_exam('teacher_1', 'Basic.txt', 'Basic', {'shuffle_exam': True})
+    student_id = worker_a.add_student_to_exam(exam_id, 'Dana', 'Levi')
+
+    session_b = worker_b.get_session(exam_id)
+    assert session_b is not None
+    assert session_b.settings == {'shuffle_exam': True}
+    assert session_b.get_student(student_id)['first_name'] == 'Dana'
+
+    # Worker B logs cheating, worker A sees it
+    session_b.log_cheating_attempt(student_id, 'focus_lost', {'count': 1})
+    student_a = worker_a.get_session(exam_id).get_student(student_id)
+    assert student_a['cheating_attempts'] == 1
+    assert student_a['cheating_log'][0]['type'] == 'focus_lost'
+    assert student_a['cheating_log'][0]['details'] == {'count': 1}
+    print("  ✓ Students and cheating events shared")
+
+    # Worker A submits, worker B sees the score
+    worker_a.get_session(exam_id).submit_student_exam(student_id, {'Q1': 'A'}, 85)
+    summary = worker_b.get_session_students_summary(exam_id)
+    assert summary[0]['status'] == 'completed'
+    assert summary[0]['score'] == 85
+    print("  ✓ Submission shared")
+
+
+def test_sessions_survive_restart():
+    """A new manager on the same DB sees running exams"""
+    print("\n💾 Testing restart...")
+    store = _new_store()
+    manager = ExamSessionManager(store=store)
+    exam_id = manager.start_exam('teacher_2', 'Mixed.txt', 'Mixed')
+    manager.get_session(exam_id).set_results_folder('/tmp/Mixed 2026-01-01 10-00')
+    manager.add_student_to_exam(exam_id, 'Yoav', 'M')
+
+    restarted = ExamSessionManager(store=ExamSessionStore(store.db_path))
+    session = restarted.get_session(exam_id)
+    assert session.results_folder == '/tmp/Mixed 2026-01-01 10-00'
+    assert len(session.students) == 1
+    assert exam_id in restarted.get_all_active_sessions()
+
+    # IDs keep growing after restart
+    assert restarted.start_exam('teacher_2', 'Mixed.txt', 'Mixed') > exam_id
+
+    restarted.end_session(exam_id)
+    assert exam_id not in manager.get_all_active_sessions()
+    print("  ✓ Session restored, IDs not reused, end shared")
+
+
+def test_student_payload_stable_order():
+    """Each student keeps one shuffled order, shared with other workers"""
+    print("\n🔀 Testing per-student shuffle seed...")
+    store = _new_store()
+    worker_a = ExamSessionManager(store=ExamSessionStore(store.db_path))
+    worker_b = ExamSessionManager(store=ExamSessionStore(store.db_path))
+    exam_data = {
+        'questions': [
+            {'number': i, 'text': f'Q{i}?', 'type': 'multiple_choice', 'answers': ['a', 'b', 'c', 'd']}
+            for i in range(1, 21)
+        ],
+        'text_direction': 'ltr',
+        'question_answer_dict': {}
+    }
+
+    exam_id = worker_a.start_exam('teacher_3', 'Big.txt', 'Big', {'shuffle_exam': True, 'max_questions': 10})
+    session_a = worker_a.get_session(exam_id)
+    session_a.set_exam_data(exam_data)
+    student_id = worker_a.add_student_to_exam(exam_id, 'Noa', 'K')
+
+    first = session_a.get_student_payload(student_id)
+    assert first['total_questions'] == 10
+    assert session_a.get_student_payload(student_id) is first
+
+    # Another worker compiles its own copy and rebuilds the same order from the stored seed
+    session_b = worker_b.get_session(exam_id)
+    session_b.set_exam_data(exam_data)
+    second = session_b.get_student_payload(student_id)
+    assert [q['text'] for q in second['questions']] == [q['text'] for q in first['questions']]
+    assert [q['answers'] for q in second['questions']] == [q['answers'] for q in first['questions']]
+
+    # Compiled exam itself is never shuffled
+    assert [q['number'] for q in exam_data['questions']] == list(range(1, 21))
+    assert exam_data['questions'][0]['answers'] == ['a', 'b', 'c', 'd']
+    print("  ✓ Order fixed per student and identical across workers")
+
+
+def test_monitor_delta_feed():
+    """Monitors receive only students changed since their last version"""
+    print("\n📡 Testing monitor delta feed...")
+    manager = ExamSessionManager()
+    exam_id = manager.start_exam('teacher_4', 'Basic.txt', 'Basic')
+    first = manager.add_student_to_exam(exam_id, 'A', 'One')
+    second = manager.add_student_to_exam(exam_id, 'B', 'Two')
+    version = manager.get_session(exam_id).version
+
+    assert len(manager.get_session_students_summary(exam_id)) == 2
+    assert manager.get_session_students_summary(exam_id, since=version) == []
+
+    manager.get_session(exam_id).log_cheating_attempt(second, 'tab_switch')
+    changed = manager.get_session_students_summary(exam_id, since=version)
+    assert [s['student_session_id'] for s in changed] == [second]
+    print("  ✓ Only the changed student returned")
+
+    # Long-poll wakes up as soon as a student changes
+    version = manager.get_session(exam_id).version
+    threading.Timer(0.2, manager.add_student_to_exam, (exam_id, 'C', 'Three')).start()
+    started = time.monotonic()
+    session = manager.wait_for_change(exam_id, version, timeout=5)
+    assert time.monotonic() - started < 2
+    assert session.version > version
+
+    # Nothing changes - returns after timeout with the same version
+    session = manager.wait_for_change(exam_id, session.version, timeout=0.2)
+    assert session.version == version + 1
+    print("  ✓ Long-poll returns on change and on timeout")
+
+
+def test_delta_feed_across_workers():
+    """Student versions written by one worker are seen by another"""
+    print("\n🛰  Testing delta feed across workers...")
+    store = _new_store()
+    worker_a = ExamSessionManager(store=ExamSessionStore(store.db_path))
+    worker_b = ExamSessionManager(store=ExamSessionStore(store.db_path))
+    exam_id = worker_a.start_exam('teacher_5', 'Basic.txt', 'Basic')
+    student_id = worker_a.add_student_to_exam(exam_id, 'A', 'One')
+    worker_a.add_student_to_exam(exam_id, 'B', 'Two')
+    version = worker_b.get_session(exam_id).version
+
+    threading.Timer(0.2, lambda: worker_a.get_session(exam_id).submit_student_exam(student_id, {}, 100)).start()
+    session = worker_b.wait_for_change(exam_id, version, timeout=5, poll_interval=0.1)
+    assert session.version > version
+    changed = worker_b.get_session_students_summary(exam_id, since=version)
+    assert [s['student_session_id'] for s in changed] == [student_id]
+    assert changed[0]['status'] == 'completed'
+    print("  ✓ Other worker's change picked up by polling the store")
+
+
+def test_cheating_batch_one_write():
+    """A batch of cheating attempts is one version bump and keeps event times"""
+    print("\n📦 Testing cheating batch...")
+    store = _new_store()
+    manager = ExamSessionManager(store=store)
+    exam_id = manager.start_exam('teacher_6', 'Basic.txt', 'Basic')
+    student_id = manager.add_student_to_exam(exam_id, 'A', 'One')
+    session = manager.get_session(exam_id)
+    version = session.version
+
+    earlier = datetime(2026, 1, 1, 10, 0, 5)
+    logged = session.log_cheating_attempts(student_id, [
+        ('focus_lost', None, earlier),
+        ('copy_blocked', {'key': 'c'}, None),
+        ('focus_lost', None, None)
+    ])
+    assert logged == 3
+    assert session.version == version + 1
+    assert store.get_version(exam_id) == version + 1
+    assert session.log_cheating_attempts('unknown', [('focus_lost', None, None)]) == 0
+
+    student = ExamSessionManager(store=store).get_session(exam_id).get_student(student_id)
+    assert student['cheating_attempts'] == 3
+    assert [e['type'] for e in student['cheating_log']] == ['focus_lost', 'copy_blocked', 'focus_lost']
+    assert student['cheating_log'][0]['timestamp'] == earlier.isoformat()
+    print("  ✓ 3 attempts, 1 version bump, event time kept")
+
+
+def test_incremental_sync_between_workers():
+    """Another worker's change reloads only the changed student, without the manager lock"""
+    print("\n🧩 Testing incremental sync...")
+    store = _new_store()
+    worker_a = ExamSessionManager(store=ExamSessionStore(store.db_path))
+    worker_b = ExamSessionManager(store=ExamSessionStore(store.db_path))
+    exam_id = worker_a.start_exam('teacher_8', 'Basic.txt', 'Basic')
+    quiet_id = worker_a.add_student_to_exam(exam_id, 'A', 'Quiet')
+    busy_id = worker_a.add_student_to_exam(exam_id, 'B', 'Busy')
+    session_a = worker_a.get_session(exam_id)
+    quiet = session_a.get_student(quiet_id)
+    busy = session_a.get_student(busy_id)
+
+    session_a.autosave_answers(busy_id, 1, {'Q1': 'typed'})  # Not flushed to the store yet
+    worker_b.get_session(exam_id).log_cheating_attempt(busy_id, 'focus_lost')
+    worker_b.get_session(exam_id).pause()
+
+    loads, manager_lock_free = [], []
+    load_changes = worker_a.store.load_changes
+
+    def spy(exam_id, since_version):
+        result = load_changes(exam_id, since_version)
+        loads.append(sorted(result[1]))
+        probe = threading.Thread(target=probe_manager_lock)
+        probe.start()
+        probe.join()
+        return result
+
+    def probe_manager_lock():
+        acquired = worker_a._lock.acquire(timeout=1)
+        manager_lock_free.append(acquired)
+        if acquired:
+            worker_a._lock.release()
+
+    worker_a.store.load_changes = spy
+    worker_a.store.load_session = None  # A full reload would fail
+    assert worker_a.get_session(exam_id) is session_a
+    assert loads == [[busy_id]] and manager_lock_free == [True]
+    assert session_a.get_student(busy_id) is busy and busy['cheating_attempts'] == 1
+    assert busy['answers'] == {'Q1': 'typed'} and busy['autosave_seq'] == 1
+    assert session_a.get_student(quiet_id) is quiet
+    assert session_a.status == 'paused' and session_a.version == store.get_version(exam_id)
+
+    worker_a.get_session(exam_id)  # In sync - nothing read
+    assert len(loads) == 1
+    print("  ✓ 1 of 2 students reloaded, records kept, manager lock free")
+
+
+def test_migrates_database_without_new_columns():
+    """A DB from before versioning, shuffle seeds and autosave gets the columns added"""
+    print("\n🧬 Testing schema migration...")
+    db_path = os.path.join(tempfile.mkdtemp(), 'exam_sessions.db')
+    conn = sqlite3.connect(db_path)
+    conn.executescript('''
+        CREATE TABLE exam_sessions (
+            exam_id INTEGER PRIMARY KEY AUTOINCREMENT, teacher_id TEXT NOT NULL,
+            exam_filename TEXT NOT NULL, exam_title TEXT NOT NULL, start_time TEXT NOT NULL,
+            status TEXT NOT NULL, settings_json TEXT, results_folder TEXT
+        );
+        CREATE TABLE exam_students (
+            student_session_id TEXT PRIMARY KEY, exam_id INTEGER NOT NULL,
+            first_name TEXT NOT NULL, last_name TEXT NOT NULL, start_time TEXT NOT NULL,
+            status TEXT NOT NULL, score NUMERIC, answers_json TEXT,
+            refresh_attempts INTEGER NOT NULL DEFAULT 0, cheating_attempts INTEGER NOT NULL DEFAULT 0,
+            end_time TEXT, time_spent REAL NOT NULL DEFAULT 0
+        );
+        INSERT INTO exam_sessions (teacher_id, exam_filename, exam_title, start_time, status)
+            VALUES ('teacher_7', 'Basic.txt', 'Basic', '2026-01-01T10:00:00', 'running');
+        INSERT INTO exam_students (student_session_id, exam_id, first_name, last_name, start_time, status)
+            VALUES ('old-student', 1, 'Dana', 'Levi', '2026-01-01T10:01:00', 'in_progress');
+    ''')
+    conn.commit()
+    conn.close()
+
+    manager = ExamSessionManager(store=ExamSessionStore(db_path))
+    student = manager.get_session(1).get_student('old-student')
+    assert student['first_name'] == 'Dana' and student['shuffle_seed'] is not None
+    seed = student['shuffle_seed']
+    assert ExamSessionManager(store=ExamSessionStore(db_path)).get_session(1).get_student(
+        'old-student')['shuffle_seed'] == seed  # Backfilled once, not on every open
+
+    manager.get_session(1).log_cheating_attempt('old-student', 'focus_lost')
+    assert manager.store.get_version(1) == 1
+    print("  ✓ Columns added, old student keeps one seed")
+
+
+if __name__ == '__main__':
+    print("=" * 60)
+    print("EXAM SESSION STORE TEST")
+    print("=" * 60)
+
+    test_sessions_shared_between_workers()
+    test_sessions_survive_restart()
+    test_student_payload_stable_order()
+    test_monitor_delta_feed()
+    test_delta_feed_across_workers()
+    test_cheating_batch_one_write()
+    test_incremental_sync_between_workers()
+    test_migrates_database_without_new_columns()
+
+    print("\n" + "=" * 60)
+    print("✅ ALL TESTS PASSED")
+    print("=" * 60)
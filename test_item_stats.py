@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Test Item Stats - live per-question counters and item analysis
+"""
+
+import math
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services.item_stats_service import ItemStatsStore, point_biserial, discrimination_index
+
+
+def _record(score, q1_answer, q1_correct, q2_answer=None, q2_correct=None, time_spent=60):
+    questions = [{'id': 0, 'text': 'What is 2+2?', 'answer': q1_answer, 'correct': q1_correct}]
+    if q2_answer is not None:
+        questions.append({'id': 1, 'text': 'Capital?', 'answer': q2_answer, 'correct': q2_correct})
+    return {'schema_version': 1, 'score': score, 'time_spent_seconds': time_spent,
+            'cheating_attempts': 1, 'questions': questions}
+
+
+RECORDS = [
+    _record(100, '4', True, 'Paris', True, 120),
+    _record(50, '4', True, 'Rome', False, 60),
+    _record(50, '5', False, 'Paris', True, 90),
+    _record(0, '3', False, 'Rome', False, 30),
+]
+
+
+def test_incremental_counters():
+    """Counters after each submit give difficulty, option counts and summary"""
+    print("📊 Testing item counters...")
+    store = ItemStatsStore(os.path.join(tempfile.mkdtemp(), 'item_stats.db'))
+    for record in RECORDS:
+        store.record_submission('teacher_1', 'Quiz 2026-01-01 10-00', record)
+
+    stats = store.get_stats('teacher_1', 'Quiz 2026-01-01 10-00')
+    summary = stats['summary']
+    assert summary['submissions'] == 4 and summary['graded'] == 4
+    assert summary['mean_score'] == 50
+    assert summary['mean_time_seconds'] == 75
+    assert summary['mean_cheating_attempts'] == 1
+
+    first, second = stats['items']
+    assert first['question_id'] == 0 and first['answered'] == 4 and first['correct'] == 2
+    assert first['difficulty'] == 0.5
+    assert first['options'][0] == {'answer': '4', 'count': 2}
+    assert {option['answer'] for option in first['options']} == {'4', '5', '3'}
+    assert second['options'] == [{'answer': 'Paris', 'count': 2}, {'answer': 'Rome', 'count': 2}]
+
+    # Other folders untouched, deleted folder forgotten
+    assert store.get_stats('teacher_1', 'Other')['items'] == []
+    store.folder_deleted('teacher_1', 'Quiz 2026-01-01 10-00')
+    assert store.get_stats('teacher_1', 'Quiz 2026-01-01 10-00')['summary']['submissions'] == 0
+    print("  ✓ Difficulty, distractors and summary from counters")
+
+
+def test_point_biserial_matches_direct():
+    """Running-sum point-biserial equals the correlation computed directly"""
+    print("\n📈 Testing point-biserial...")
+    store = ItemStatsStore(os.path.join(tempfile.mkdtemp(), 'item_stats.db'))
+    store.rebuild('teacher_1', 'Quiz', RECORDS)
+    item = store.get_stats('teacher_1', 'Quiz')['items'][0]
+
+    x = [1, 1, 0, 0]
+    t = [1.0, 0.5, 0.5, 0.0]
+    mean_x, mean_t = sum(x) / 4, sum(t) / 4
+    cov = sum((a - mean_x) * (b - mean_t) for a, b in zip(x, t))
+    direct = cov / math.sqrt(sum((a - mean_x) ** 2 for a in x) * sum((b - mean_t) ** 2 for b in t))
+    assert abs(item['discrimination'] - direct) < 1e-9
+    assert point_biserial(1, 1, 1.0, 1.0, 1.0) is None
+    print(f"  ✓ r = {item['discrimination']:.3f}")
+
+
+def test_discrimination_index():
+    """Upper-lower groups from submissions (open items and pending students ignored)"""
+    print("\n🎯 Testing discrimination index...")
+    records = RECORDS + [_record(None, 'x', None)]
+    index = discrimination_index(records, group_fraction=0.25)
+    assert index == {'What is 2+2?': 1.0, 'Capital?': 1.0}
+    assert discrimination_index([], 0.27) == {}
+    print("  ✓ p_upper - p_lower per question")
+
+
+if __name__ == '__main__':
+    print("=" * 60)
+    print("ITEM STATS TEST")
+    print("=" * 60)
+
+    test_incremental_counters()
+    test_point_biserial_matches_direct()
+    test_discrimination_index()
+
+    print("\n" + "=" * 60)
+    print("✅ ALL TESTS PASSED")
+    print("=" * 60)
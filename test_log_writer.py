@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Test Log Writer - buffered JSON-lines logs with rotation and gzip
+"""
+
+import gzip
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services.log_writer_service import BufferedLogWriter, open_log_segment, fcntl
+from services.proctoring_service import ProctoringService
+
+
+def _read_all(writer):
+    lines = []
+    for path in writer.segments() + [writer.path]:
+        with open_log_segment(path) as f:
+            lines.extend(line.rstrip('\n') for line in f)
+    return lines
+
+
+def test_background_flush():
+    """Lines reach the file within the flush interval without close"""
+    print("⏱  Testing background flush...")
+    path = os.path.join(tempfile.mkdtemp(), 'exam_sessions.log')
+    writer = BufferedLogWriter(path, flush_interval=0.1, max_bytes=0, rotate_daily=False)
+    for i in range(1000):
+        writer.write(f'{{"n": {i}}}\n')
+    time.sleep(0.4)
+    with open(path, encoding='utf-8') as f:
+        assert sum(1 for _ in f) == 1000
+    writer.close()
+    print("  ✓ 1000 lines flushed by the background thread")
+
+
+def test_size_rotation_gzip_and_prune():
+    """Size limit rotates into gzipped segments, oldest pruned beyond backup_count"""
+    print("\n🗜  Testing size rotation...")
+    path = os.path.join(tempfile.mkdtemp(), 'cheating_alerts.log')
+    writer = BufferedLogWriter(path, flush_interval=0.05, max_bytes=2000, rotate_daily=False,
+                               backup_count=100)
+    lines = [json.dumps({'n': i, 'pad': 'x' * 40}) + '\n' for i in range(300)]
+    for line in lines:
+        writer.write(line)
+    writer.close()
+
+    segments = writer.segments()
+    assert writer.rotations == len(segments) > 5
+    assert all(segment.endswith('.gz') for segment in segments)
+    assert os.path.getsize(path) <= 2000
+    with gzip.open(segments[0], 'rt', encoding='utf-8') as f:
+        assert f.readline() == lines[0]
+    assert _read_all(writer) == [line.rstrip('\n') for line in lines]
+    print(f"  ✓ {len(segments)} gzipped segments, order kept")
+
+    writer = BufferedLogWriter(path, max_bytes=2000, rotate_daily=False, backup_count=3)
+    for line in lines:
+        writer.write(line)
+    writer.close()
+    assert len(writer.segments()) == 3
+    print("  ✓ Pruned to backup_count")
+
+
+def test_daily_rotation():
+    """First write of a new day starts a new segment"""
+    print("\n📅 Testing daily rotation...")
+    path = os.path.join(tempfile.mkdtemp(), 'login_history.log')
+    writer = BufferedLogWriter(path, max_bytes=0, rotate_daily=True, compress=False)
+    writer.write('{"day": 1}\n')
+    writer.flush()
+    writer._day = date.today() - timedelta(days=1)  # As if written yesterday
+    writer.write('{"day": 2}\n')
+    writer.close()
+
+    assert writer.rotations == 1
+    assert not writer.segments()[0].endswith('.gz')
+    assert _read_all(writer) == ['{"day": 1}', '{"day": 2}']
+    print("  ✓ Rotated on day change (uncompressed)")
+
+
+def test_proctoring_service_reads_segments():
+    """Entries written across a rotation are all in the log files"""
+    print("\n📋 Testing ProctoringService logs...")
+    logs_dir = tempfile.mkdtemp()
+    service = ProctoringService(logs_dir=logs_dir, index_db_path=os.path.join(logs_dir, 'index.db'))
+    for i in range(5):
+        service.log_cheating_attempt(1, f'Student {i}', 'focus_lost')
+    service.flush()
+    service._writer('cheating_alerts.log')._day = date.today() - timedelta(days=1)
+    service.log_login_attempt('teacher', True)
+    service.log_cheating_attempt(1, 'Student 5', 'copy_blocked')
+
+    service.close()
+    writer = service._writer('cheating_alerts.log')
+    assert len(writer.segments()) == 1
+    assert [json.loads(line)['student_name'] for line in _read_all(writer)] == [f'Student {i}' for i in range(6)]
+    print("  ✓ 6 cheating entries across 2 segments")
+
+
+def _write_from_process(path, worker):
+    writer = BufferedLogWriter(path, flush_interval=0.01, max_bytes=4000, rotate_daily=False,
+                               backup_count=0, buffer_size=512)
+    for i in range(300):
+        writer.write(json.dumps({'worker': worker, 'n': i, 'pad': 'x' * 30}) + '\n')
+    writer.close()
+
+
+def test_processes_share_log():
+    """Worker processes writing and rotating one log never tear or lose a line"""
+    if fcntl is None:
+        print("\n⏭  Skipping shared log test (no fcntl)")
+        return
+    print("\n👥 Testing processes sharing a log...")
+    path = os.path.join(tempfile.mkdtemp(), 'cheating_alerts.log')
+    processes = [multiprocessing.Process(target=_write_from_process, args=(path, w)) for w in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+
+    writer = BufferedLogWriter(path)
+    entries = [json.loads(line) for line in _read_all(writer)]
+    assert len(entries) == 1200
+    for w in range(4):
+        assert [e['n'] for e in entries if e['worker'] == w] == list(range(300))
+    assert all(os.path.getsize(segment) <= 4000 for segment in writer.segments()
+               if not segment.endswith('.gz'))
+    print(f"  ✓ 1200 whole lines in order across {len(writer.segments())} segments")
+
+
+if __name__ == '__main__':
+    print("=" * 60)
+    print("LOG WRITER TEST")
+    print("=" * 60)
+
+    test_background_flush()
+    test_size_rotation_gzip_and_prune()
+    test_daily_rotation()
+    test_proctoring_service_reads_segments()
+    test_processes_share_log()
+
+    print("\n" + "=" * 60)
+    print("✅ ALL TESTS PASSED")
+    print("=" * 60)
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Test Proctoring Index - filtered, paginated and streamed proctoring log queries
+"""
+
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services.proctoring_index_service import ProctoringLogIndex
+from services.proctoring_service import ProctoringService
+
+
+def _new_service(logs_dir=None):
+    logs_dir = logs_dir or tempfile.mkdtemp()
+    return ProctoringService(logs_dir=logs_dir, index_db_path=os.path.join(logs_dir, 'index.db'))
+
+
+def test_filters_and_pagination():
+    """Queries by exam, student, event and time; pages chained by next_after_id"""
+    print("🔎 Testing filters and pagination...")
+    service = _new_service()
+    for i in range(25):
+        service.log_cheating_attempt(1 if i % 5 else 2, f'Student {i % 3}', 'focus_lost')
+    service.log_exam_session(1, 'Student 0', '10.0.0.1', 'UA')
+    service.log_login_attempt('teacher', True)
+
+    exam_1 = service.get_exam_logs('cheating', exam_id=1)
+    assert len(exam_1) == 20 and all(entry['exam_id'] == 1 for entry in exam_1)
+    assert len(service.get_exam_logs(exam_id=1)) == 21  # Session start too
+    assert len(service.get_exam_logs('all')) == 27
+    assert len(service.get_exam_logs('cheating', exam_id=1, student_name='Student 0')) == 7
+    assert service.get_exam_logs(event='login_attempt')[0]['username'] == 'teacher'
+    assert service.get_exam_logs('login', student_name='teacher')[0]['success'] is True
+
+    first = exam_1[0]['timestamp']
+    assert len(service.get_exam_logs('cheating', exam_id=1, since=first)) == 20
+    assert service.get_exam_logs('cheating', exam_id=1, until=first) == []
+
+    pages, after_id = [], 0
+    while True:
+        page = service.query_logs('cheating', limit=8, after_id=after_id, exam_id=1)
+        pages.append(page['events'])
+        if page['next_after_id'] is None:
+            break
+        after_id = page['next_after_id']
+    assert [len(events) for events in pages] == [8, 8, 4]
+    assert [e for events in pages for e in events] == exam_1
+    assert list(service.iter_logs('cheating', exam_id=1, batch_size=3)) == exam_1
+    service.close()
+    print("  ✓ Filters, 3 pages and streamed batches agree")
+
+
+def test_backfill_existing_logs():
+    """Entries written before the index existed are indexed once"""
+    print("\n📥 Testing backfill...")
+    logs_dir = tempfile.mkdtemp()
+    with open(os.path.join(logs_dir, 'cheating_alerts.log'), 'w', encoding='utf-8') as f:
+        for i in range(3):
+            f.write(json.dumps({'timestamp': f'2026-01-01T10:00:0{i}', 'event': 'cheating_attempt',
+                                'exam_id': 9, 'student_name': 'Old', 'attempt_type': 'focus_lost'}) + '\n')
+        f.write('{"torn line\n')
+
+    service = _new_service(logs_dir)
+    assert len(service.get_exam_logs('cheating', exam_id=9)) == 3
+    service.log_cheating_attempt(9, 'New', 'copy_blocked')
+    service.close()
+
+    # Second start (or another worker) does not index the files again
+    again = _new_service(logs_dir)
+    assert [entry['student_name'] for entry in again.get_exam_logs(exam_id=9)] == ['Old', 'Old', 'Old', 'New']
+    again.close()
+    print("  ✓ 3 old entries indexed once")
+
+
+def test_batched_inserts():
+    """Entries are inserted in batches and flushed before queries"""
+    print("\n📦 Testing batched inserts...")
+    index = ProctoringLogIndex(os.path.join(tempfile.mkdtemp(), 'index.db'), flush_interval=60, batch_size=10)
+    for i in range(15):
+        index.add('cheating', {'timestamp': f'2026-01-01T10:00:{i:02d}', 'exam_id': 1, 'event': 'x'})
+    conn = index.pool.connection()
+    deadline = time.monotonic() + 5
+    while conn.execute('SELECT COUNT(*) FROM log_events').fetchone()[0] < 10 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    # A full batch wakes the flusher at once, without waiting for the 60 s interval
+    assert conn.execute('SELECT COUNT(*) FROM log_events').fetchone()[0] >= 10
+    assert index.count(exam_id=1) == 15
+    print("  ✓ Full batch inserted early, queries see pending entries")
+
+
+def test_timed_flushes_one_thread():
+    """Timed flushes run on one flusher thread - no connection per flush"""
+    print("\n🧵 Testing timed flushes...")
+    index = ProctoringLogIndex(os.path.join(tempfile.mkdtemp(), 'index.db'), flush_interval=0.005)
+    for i in range(50):
+        index.add('cheating', {'timestamp': f'2026-01-01T10:00:{i:02d}', 'exam_id': 2, 'event': 'x'})
+        time.sleep(0.01)  # Every entry in its own timed flush
+    index.close()
+    assert index.count(exam_id=2) == 50
+    assert index.pool.opened <= 3  # init_db, flusher thread, this thread's count()
+    print(f"  ✓ 50 timed flushes, {index.pool.opened} connections opened")
+
+
+if __name__ == '__main__':
+    print("=" * 60)
+    print("PROCTORING INDEX TEST")
+    print("=" * 60)
+
+    test_filters_and_pagination()
+    test_backfill_existing_logs()
+    test_batched_inserts()
+    test_timed_flushes_one_thread()
+
+    print("\n" + "=" * 60)
+    print("✅ ALL TESTS PASSED")
+    print("=" * 60)
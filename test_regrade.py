@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Test Regrade - re-scoring a results folder from All_Exams.txt
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services.regrade_service import (RegradeJob, RegradeJobs, iter_student_records,
+                                      RECORD_SEPARATOR, ANSWER_SEPARATOR)
+from services.results_writer_service import ResultsWriter
+from services.translation_service import RESULTS_PAGE_STRINGS
+from services.answer_key import AnswerKey
+from services.submission_log import build_submission_record, dumps_record, iter_submissions, submissions_path
+
+# Fixed key: "Capital of France?" was wrongly "London" before
+NEW_KEY = {'What is 2+2?': '4', 'Capital of France?': 'Paris'}
+
+
+def _record(first, last, time, answers):
+    text = RECORD_SEPARATOR + "\n\n"
+    text += f"Student details: Name-{first}  Last name-{last}  Submitting time-{time}  Cheating attemps-0\n"
+    text += "Device Info: IP-127.0.0.1  Device-d1  Platform-Linux  Screen-1x1\n\n"
+    for question, answer in answers.items():
+        text += f"{question}\n{answer}\n\n{ANSWER_SEPARATOR}\n"
+    return text
+
+
+def _grades_line(first, last, time, score):
+    return (f"2026 October 18 {time} | {first} {last} | Score: {score} | Cheat: 0 | "
+            f"Duration: 1m 0s | IP: 127.0.0.1 | UA: Chrome/Linux | Device: d1 | Screen: 1x1\n")
+
+
+def _make_folder(students):
+    """students: [(first, last, time, answers, old_score_text)]"""
+    folder = tempfile.mkdtemp()
+    with open(os.path.join(folder, 'All_Exams.txt'), 'w', encoding='utf-8') as f:
+        f.write("=" * 80 + "\nEXAM CONTENT\n" + "=" * 80 + "\n\n1. What is 2+2?\n4\n\n")
+        f.write("=" * 80 + "\nSTUDENT RESULTS\n" + "=" * 80 + "\n\n")
+        for first, last, time, answers, _ in students:
+            f.write(_record(first, last, time, answers))
+    with open(os.path.join(folder, 'GRADES.txt'), 'w', encoding='utf-8') as f:
+        for first, last, time, _, old_score in students:
+            f.write(_grades_line(first, last, time, old_score))
+    for first, last, time, _, old_score in students:
+        with open(os.path.join(folder, f"{first}_{last}_{time}.html"), 'w', encoding='utf-8') as f:
+            f.write(f"<div><h2>{first}</h2><ol><h1>Your grade is {old_score.replace('%', ' %')}</h1></ol></div>")
+    return folder
+
+
+def _read(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def test_parse_all_exams():
+    """Records are streamed with multi-line answers and missing answers skipped"""
+    print("📄 Testing All_Exams.txt parsing...")
+    text = _record('Dana', 'Levi', '10-00-00', {'What is 2+2?': '4', 'Explain': 'line 1\n\nline 3'})
+    text += _record('Dana', 'Levi', '10-00-00', {'What is 2+2?': 'No answer'})
+
+    records = list(iter_student_records(text.splitlines(keepends=True)))
+    assert len(records) == 2
+    assert records[0].ref == ('10-00-00', 'Dana Levi', 0)
+    assert records[1].ref == ('10-00-00', 'Dana Levi', 1)
+    assert records[0].answers == {'What is 2+2?': '4', 'Explain': 'line 1\n\nline 3'}
+    assert records[1].answers == {}
+    print("  ✓ 2 records, duplicate names kept apart")
+
+
+def test_regrade_rewrites_changed_grades():
+    """Only students whose score changed are rewritten and reported"""
+    print("\n📝 Testing regrade...")
+    folder = _make_folder([
+        ('Dana', 'Levi', '10-00-00', {'What is 2+2?': '4', 'Capital of France?': 'Paris'}, '50%'),
+        ('Ivan', 'Petrov', '10-01-00', {'What is 2+2?': '4', 'Capital of France?': 'London'}, '100%'),
+        ('Noa', 'Cohen', '10-02-00', {'What is 2+2?': '5', 'Capital of France?': 'Rome'}, '0%'),
+    ])
+    writer = ResultsWriter(max_queue=10)
+    job = RegradeJob(folder, NEW_KEY, RESULTS_PAGE_STRINGS, max_workers=1)
+    report = job.run(writer)
+    writer.close()
+
+    assert report['students'] == 3
+    assert report['unchanged'] == 1
+    assert report['unmatched'] == []
+    assert [(c['student'], c['old_score'], c['new_score']) for c in report['changed']] == [
+        ('Dana Levi', '50%', '100%'), ('Ivan Petrov', '100%', '50%')
+    ]
+    assert report['html_updated'] == 2
+
+    grades = _read(os.path.join(folder, 'GRADES.txt')).splitlines()
+    assert '| Dana Levi | Score: 100% | Cheat: 0 |' in grades[0]
+    assert '| Ivan Petrov | Score: 50% |' in grades[1]
+    assert '| Noa Cohen | Score: 0% |' in grades[2]
+    assert 'Your grade is 100 %</h1>' in _read(os.path.join(folder, 'Dana_Levi_10-00-00.html'))
+    assert not [name for name in os.listdir(folder) if name.endswith('.tmp')]
+    print("  ✓ GRADES.txt and HTML results updated")
+
+
+def test_regrade_process_pool():
+    """Chunks graded by worker processes give the same scores"""
+    print("\n⚙️  Testing parallel regrade...")
+    students = [
+        (f'S{i}', 'X', f'11-00-{i:02d}',
+         {'What is 2+2?': '4', 'Capital of France?': 'Paris' if i % 2 else 'London'}, '50%')
+        for i in range(40)
+    ]
+    folder = _make_folder(students)
+
+    serial = RegradeJob(folder, NEW_KEY, RESULTS_PAGE_STRINGS, max_workers=1).grade()
+    parallel = RegradeJob(folder, NEW_KEY, RESULTS_PAGE_STRINGS, max_workers=2, chunk_size=7).grade()
+    assert parallel == serial
+    assert sum(1 for score, _, _ in parallel.values() if score == 100) == 20
+    print("  ✓ 40 students graded in 6 chunks")
+
+
+def test_regrade_from_submission_log():
+    """submissions.jsonl is preferred over All_Exams.txt and re-scored too"""
+    print("\n🧾 Testing regrade from submissions.jsonl...")
+    old_key = {'What is 2+2?': '4', 'Capital of France?': 'London'}
+    answers = {'What is 2+2?': '4', 'Capital of France?': 'Paris'}
+    folder = _make_folder([('Dana', 'Levi', '10-00-00', {'What is 2+2?': 'garbled'}, '50%')])
+    record = build_submission_record(
+        'exam1', 'stu1', {'first_name': 'Dana', 'last_name': 'Levi'}, 50, answers,
+        [{'text': text} for text in answers], AnswerKey(old_key),
+        submitted_at=1760000000.0, submit_time='10-00-00'
+    )
+    with open(submissions_path(folder), 'w', encoding='utf-8') as f:
+        f.write(dumps_record(record))
+
+    writer = ResultsWriter(max_queue=10)
+    report = RegradeJob(folder, NEW_KEY, RESULTS_PAGE_STRINGS, max_workers=1).run(writer)
+    writer.close()
+
+    assert [(c['old_score'], c['new_score']) for c in report['changed']] == [('50%', '100%')]
+    logged = list(iter_submissions(folder))
+    assert logged[0]['score'] == 100
+    assert [q['correct'] for q in logged[0]['questions']] == [True, True]
+    print("  ✓ Answers read from the log, log rewritten")
+
+
+def test_regrade_reads_snapshot_only():
+    """Bytes appended after the snapshot (a record being written) are not graded"""
+    print("\n📸 Testing regrade snapshot...")
+    folder = _make_folder([('Dana', 'Levi', '10-00-00', {'What is 2+2?': '4'}, '50%')])
+    source = os.path.join(folder, 'All_Exams.txt')
+    size = os.path.getsize(source)
+    with open(source, 'a', encoding='utf-8') as f:
+        f.write(_record('Half', 'Written', '10-05-00', {'What is 2+2?': '4'})[:-40])  # Cut mid-record
+
+    job = RegradeJob(folder, NEW_KEY, RESULTS_PAGE_STRINGS, max_workers=1)
+    assert [ref[1] for ref in job.grade((source, size))] == ['Dana Levi']
+    assert sorted(ref[1] for ref in job.grade()) == ['Dana Levi', 'Half Written']
+    print("  ✓ Half-written record past the snapshot skipped")
+
+
+def _wait_finished(jobs, teacher_id, job_id):
+    deadline = time.monotonic() + 5
+    while jobs.get(teacher_id, job_id)['status'] == 'running':
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    return jobs.get(teacher_id, job_id)
+
+
+def test_regrade_jobs_status():
+    """Background jobs report done/failed through their status file, per teacher only"""
+    print("\n🗂️  Testing regrade jobs...")
+    jobs = RegradeJobs(tempfile.mkdtemp())
+    job_id = jobs.start('teacher_1', 'Quiz 2026-01-01 10-00', lambda: {'students': 2, 'changed': []})
+    status = _wait_finished(jobs, 'teacher_1', job_id)
+    assert status['status'] == 'done' and status['report']['students'] == 2
+    assert jobs.get('teacher_2', job_id) is None and jobs.get('teacher_1', '../x') is None
+
+    def fail():
+        raise ValueError('broken exam file')
+
+    status = _wait_finished(jobs, 'teacher_1', jobs.start('teacher_1', 'Quiz 2026-01-01 10-00', fail))
+    assert status['status'] == 'failed' and status['message'] == 'broken exam file'
+    print("  ✓ Done and failed jobs polled")
+
+
+if __name__ == '__main__':
+    print("=" * 60)
+    print("REGRADE TEST")
+    print("=" * 60)
+
+    test_parse_all_exams()
+    test_regrade_rewrites_changed_grades()
+    test_regrade_process_pool()
+    test_regrade_from_submission_log()
+    test_regrade_reads_snapshot_only()
+    test_regrade_jobs_status()
+
+    print("\n" + "=" * 60)
+    print("✅ ALL TESTS PASSED")
+    print("=" * 60)
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Test Results Index - result folder catalog without directory scans
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services.results_index_service import ResultsIndex, split_folder_name
+
+
+def test_incremental_counts():
+    """Counts follow folder creation, submits and deletion"""
+    print("📇 Testing incremental index...")
+    root = tempfile.mkdtemp()
+    results_dir = os.path.join(root, 'results')
+    index = ResultsIndex(os.path.join(root, 'results_index.db'))
+
+    os.makedirs(os.path.join(results_dir, 'Basic 2026-01-01 10-00'))
+    index.folder_created('teacher_1', 'Basic 2026-01-01 10-00')
+    entry = index.list_folders('teacher_1', results_dir)[0]
+    assert entry['student_count'] == 0 and not entry['has_grades']
+
+    assert index.submission_saved('teacher_1', 'Basic 2026-01-01 10-00')
+    assert index.submission_saved('teacher_1', 'Basic 2026-01-01 10-00')
+    assert index.html_created('teacher_1', 'Basic 2026-01-01 10-00')  # Second HTML had the same name
+    entry = index.list_folders('teacher_1', results_dir)[0]
+    assert entry['student_count'] == 2 and entry['html_count'] == 1
+    assert entry['has_grades'] and entry['has_all_exams']
+
+    # Other teachers are separate
+    assert index.list_folders('teacher_2', os.path.join(root, 'other')) == []
+
+    index.folder_deleted('teacher_1', 'Basic 2026-01-01 10-00')
+    shutil.rmtree(os.path.join(results_dir, 'Basic 2026-01-01 10-00'))
+    assert index.list_folders('teacher_1', results_dir) == []
+    print("  ✓ Created, submitted and deleted folders tracked")
+
+
+def test_reconcile_with_disk():
+    """Folders from before the index are scanned once, removed folders dropped"""
+    print("\n🔁 Testing reconcile...")
+    root = tempfile.mkdtemp()
+    results_dir = os.path.join(root, 'results')
+    folder = os.path.join(results_dir, 'Old Exam 2025-05-05 09-30')
+    os.makedirs(folder)
+    with open(os.path.join(folder, 'GRADES.txt'), 'w', encoding='utf-8') as f:
+        f.write("line 1\nline 2\n\nline 3\n")
+    for name in ('a.html', 'b.html'):
+        open(os.path.join(folder, name), 'w').close()
+
+    index = ResultsIndex(os.path.join(root, 'results_index.db'))
+    entry = index.list_folders('teacher_1', results_dir)[0]
+    assert entry['student_count'] == 3 and entry['html_count'] == 2
+    assert entry['has_grades'] and not entry['has_all_exams']
+
+    # Index answers without reading GRADES.txt again
+    os.remove(os.path.join(folder, 'GRADES.txt'))
+    assert index.list_folders('teacher_1', results_dir)[0]['student_count'] == 3
+
+    shutil.rmtree(folder)
+    assert index.list_folders('teacher_1', results_dir) == []
+    assert split_folder_name('Old Exam 2025-05-05 09-30') == ('Old Exam', '2025-05-05', '09-30')
+    print("  ✓ Backfilled once, deletions on disk dropped")
+
+
+def test_listing_skips_unchanged_directory():
+    """The results directory is listed again only after its mtime changes"""
+    print("\n🕒 Testing reconcile on mtime change...")
+    root = tempfile.mkdtemp()
+    results_dir = os.path.join(root, 'results')
+    os.makedirs(os.path.join(results_dir, 'First 2026-01-01 10-00'))
+    settled = time.time() - 60
+    os.utime(results_dir, (settled, settled))
+
+    index = ResultsIndex(os.path.join(root, 'results_index.db'))
+    assert [e['folder_name'] for e in index.list_folders('teacher_1', results_dir)] == ['First 2026-01-01 10-00']
+
+    # Same mtime - the new folder is not looked for
+    os.makedirs(os.path.join(results_dir, 'Second 2026-01-02 10-00'))
+    os.utime(results_dir, (settled, settled))
+    assert len(index.list_folders('teacher_1', results_dir)) == 1
+
+    os.utime(results_dir, (settled + 1, settled + 1))
+    assert len(index.list_folders('teacher_1', results_dir)) == 2
+    print("  ✓ Listed once per directory change")
+
+
+if __name__ == '__main__':
+    print("=" * 60)
+    print("RESULTS INDEX TEST")
+    print("=" * 60)
+
+    test_incremental_counts()
+    test_reconcile_with_disk()
+    test_listing_skips_unchanged_directory()
+
+    print("\n" + "=" * 60)
+    print("✅ ALL TESTS PASSED")
+    print("=" * 60)
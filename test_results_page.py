@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Test Results Page - precompiled results fragment (escaping, direction, template cache)
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services.results_page_service import ResultsPageRenderer
+from services.translation_service import RESULTS_PAGE_STRINGS
+
+QUESTIONS = [{'text': 'What is 2+2?'}, {'text': 'Write a loop'}, {'text': 'Skipped'}]
+ANSWERS = {'What is 2+2?': '4', 'Write a loop': 'for i in range(3):\n    if i < 2: print("<b>")'}
+
+
+def test_render_ltr_escaped():
+    """Answers in order, escaped, Latin answers left-to-right"""
+    print("📄 Testing LTR results...")
+    renderer = ResultsPageRenderer()
+    html = renderer.render('en', 'ltr', RESULTS_PAGE_STRINGS, 'Dana', 'Levi', QUESTIONS, ANSWERS, '50 %')
+
+    assert html.startswith('<div style="text-align: left;">')
+    assert '<h2>Dana Levi, your exam was submitted successfully</h2>' in html
+    assert "<pre>4</pre>" in html
+    assert "<pre align='left' dir='ltr'>for i in range(3):\n    if i &lt; 2: print(&#34;&lt;b&gt;&#34;)</pre>" in html
+    assert "<pre align='left' dir='ltr'>No answer</pre>" in html
+    assert html.index('What is 2+2?') < html.index('Write a loop') < html.index('Skipped')
+    assert html.endswith('<h1>Your grade is 50 %</h1></ol></div>')
+    print("  ✓ 3 answers, code escaped, grade last")
+
+
+def test_render_rtl_and_cache():
+    """RTL exams keep answers RTL; one compiled template per language and direction"""
+    print("\n↩️  Testing RTL results and template cache...")
+    renderer = ResultsPageRenderer()
+    strings = dict(RESULTS_PAGE_STRINGS, your_grade_is='הציון שלך הוא')
+    html = renderer.render('he', 'rtl', strings, 'דנה', 'לוי', QUESTIONS, ANSWERS, '100 %')
+    assert html.startswith('<div dir="rtl" style="text-align: right; direction: rtl;">')
+    assert "dir='ltr'" not in html
+    assert '<h1>הציון שלך הוא 100 %</h1>' in html
+
+    template = renderer._template('he', True, strings)
+    renderer.render('he', 'rtl', strings, 'A', 'B', [], {}, '0 %')
+    assert renderer._template('he', True, strings) is template
+    assert renderer._template('he', False, strings) is not template
+    # New translation table (reloaded bundle) compiles a new template
+    assert renderer._template('he', True, dict(strings)) is not template
+    print("  ✓ Template reused per language/direction")
+
+
+if __name__ == '__main__':
+    print("=" * 60)
+    print("RESULTS PAGE TEST")
+    print("=" * 60)
+
+    test_render_ltr_escaped()
+    test_render_rtl_and_cache()
+
+    print("\n" + "=" * 60)
+    print("✅ ALL TESTS PASSED")
+    print("=" * 60)
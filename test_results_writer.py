@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Test Results Writer - background write-behind of result files
+"""
+
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services.results_writer_service import ResultsWriter
+
+
+def _read(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def test_writes_in_queue_order():
+    """Header, appends and whole-file writes land in the order queued"""
+    print("📝 Testing write order...")
+    writer = ResultsWriter(max_queue=10)
+    folder = tempfile.mkdtemp()
+    all_exams = os.path.join(folder, 'All_Exams.txt')
+    html = os.path.join(folder, 'Dana_Levi_10-00-00.html')
+
+    writer.append(all_exams, 'first\n', header=lambda: 'HEADER\n')
+    writer.append(all_exams, 'second\n', header=lambda: 'HEADER\n')
+    writer.write_file(html, '<h1>old</h1>')
+    writer.write_file(html, '<h1>new</h1>')
+    writer.flush()
+
+    assert _read(all_exams) == 'HEADER\nfirst\nsecond\n'
+    assert _read(html) == '<h1>new</h1>'
+
+    # on_created only for a file that did not exist
+    created = []
+    writer.write_file(html, '<h1>again</h1>', on_created=lambda: created.append('old'))
+    writer.write_file(os.path.join(folder, 'Dana_Levi_10-00-01.html'), '<h1>new</h1>', on_created=lambda: created.append('new'))
+    writer.flush()
+    assert created == ['new']
+    writer.close()
+    print("  ✓ Header written once, order kept")
+
+
+def test_concurrent_submits_batched():
+    """Many submitting threads - every line written exactly once"""
+    print("\n👥 Testing concurrent appends...")
+    writer = ResultsWriter(max_queue=20)  # Small queue forces backpressure
+    folder = tempfile.mkdtemp()
+    grades = os.path.join(folder, 'GRADES.txt')
+
+    def submit(student):
+        for attempt in range(10):
+            writer.append(grades, f"student-{student}-{attempt}\n")
+
+    threads = [threading.Thread(target=submit, args=(i,)) for i in range(30)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    writer.close()  # Shutdown flushes everything still queued
+
+    lines = _read(grades).splitlines()
+    assert len(lines) == 300
+    assert len(set(lines)) == 300
+    assert writer.batches < 300
+    assert writer.errors == 0
+    print(f"  ✓ 300 appends in {writer.batches} batches")
+
+
+def test_call_runs_after_queued_writes():
+    """call() sees every earlier append and nothing queued after it"""
+    print("\n🔁 Testing writer call...")
+    writer = ResultsWriter(max_queue=10)
+    folder = tempfile.mkdtemp()
+    grades = os.path.join(folder, 'GRADES.txt')
+
+    writer.append(grades, 'one\n')
+    writer.append(grades, 'two\n')
+    future = writer.call(lambda: _read(grades))
+    writer.append(grades, 'three\n')
+    writer.flush()
+
+    assert future.result() == 'one\ntwo\n'
+    assert _read(grades) == 'one\ntwo\nthree\n'
+    writer.close()
+    print("  ✓ Callable ordered between appends")
+
+
+def test_on_written_only_after_success():
+    """on_written runs once the line is on disk, never for a failed append"""
+    print("\n✔️  Testing append callbacks...")
+    writer = ResultsWriter(max_queue=10)
+    folder = tempfile.mkdtemp()
+    grades = os.path.join(folder, 'GRADES.txt')
+    seen = []
+
+    writer.append(grades, 'one\n', on_written=lambda: seen.append(_read(grades)))
+    writer.append(os.path.join(folder, 'missing', 'GRADES.txt'), 'two\n', on_written=lambda: seen.append('bad'))
+    writer.flush()
+
+    assert seen == ['one\n']
+    assert writer.errors == 1
+    writer.close()
+    print("  ✓ Callback after the write, skipped on error")
+
+
+def test_sync_waits_for_earlier_writes_only():
+    """sync() returns under steady appends and times out while the writer is stuck"""
+    print("\n⏱️  Testing writer sync...")
+    writer = ResultsWriter(max_queue=10)
+    folder = tempfile.mkdtemp()
+    grades = os.path.join(folder, 'GRADES.txt')
+    stop = threading.Event()
+
+    def submit():
+        while not stop.is_set():
+            writer.append(grades, 'line\n')
+
+    writer.append(grades, 'first\n')
+    producer = threading.Thread(target=submit)
+    producer.start()
+    try:
+        assert writer.sync(timeout=5)
+        assert _read(grades).startswith('first\n')
+    finally:
+        stop.set()
+        producer.join()
+
+    release = threading.Event()
+    writer.call(release.wait)
+    assert not writer.sync(timeout=0.2)
+    release.set()
+    assert writer.sync(timeout=5)
+    writer.close()
+    print("  ✓ Marker reached under load, timeout reported")
+
+
+def _crash_with_queued_writes(journal_dir, folder):
+    # Child process: the writer thread is stuck, submits are committed, then the process dies
+    writer = ResultsWriter(max_queue=10)
+    writer.enable_journal(journal_dir)
+    writer.append(os.path.join(folder, 'GRADES.txt'), 'applied\n')
+    writer.sync(timeout=5)
+    writer.call(threading.Event().wait)
+    writer.append(os.path.join(folder, 'All_Exams.txt'), 'exam\n', header=lambda: 'HEADER\n')
+    writer.write_file(os.path.join(folder, 'Dana_Levi.html'), '<h1>Dana</h1>')
+    writer.append(os.path.join(folder, 'GRADES.txt'), 'queued\n')
+    writer.commit()
+    os._exit(0)
+
+
+def test_journal_replayed_after_crash():
+    """Writes committed but not applied by a dead process are replayed once on the next start"""
+    print("\n💾 Testing results journal recovery...")
+    journal_dir = tempfile.mkdtemp()
+    folder = tempfile.mkdtemp()
+    if not hasattr(os, 'fork'):
+        print("  ⚠ Skipped (needs fork)")
+        return
+    child = multiprocessing.get_context('fork').Process(target=_crash_with_queued_writes,
+                                                        args=(journal_dir, folder))
+    child.start()
+    child.join(10)
+    assert _read(os.path.join(folder, 'GRADES.txt')) == 'applied\n'
+    assert not os.path.exists(os.path.join(folder, 'Dana_Levi.html'))
+
+    writer = ResultsWriter(max_queue=10)
+    writer.enable_journal(journal_dir)
+    assert _read(os.path.join(folder, 'GRADES.txt')) == 'applied\nqueued\n'
+    assert _read(os.path.join(folder, 'All_Exams.txt')) == 'HEADER\nexam\n'
+    assert _read(os.path.join(folder, 'Dana_Levi.html')) == '<h1>Dana</h1>'
+    assert writer.recover() == 0  # Journal removed - nothing applied twice
+
+    writer.append(os.path.join(folder, 'GRADES.txt'), 'next\n')
+    writer.commit()
+    writer.close()
+    assert _read(os.path.join(folder, 'GRADES.txt')).endswith('queued\nnext\n')
+    assert os.listdir(journal_dir) == ['.lock']  # Clean shutdown leaves no journal
+    print("  ✓ Unapplied writes replayed once")
+
+
+if __name__ == '__main__':
+    print("=" * 60)
+    print("RESULTS WRITER TEST")
+    print("=" * 60)
+
+    test_writes_in_queue_order()
+    test_concurrent_submits_batched()
+    test_call_runs_after_queued_writes()
+    test_on_written_only_after_success()
+    test_sync_waits_for_earlier_writes_only()
+    test_journal_replayed_after_crash()
+
+    print("\n" + "=" * 60)
+    print("✅ ALL TESTS PASSED")
+    print("=" * 60)
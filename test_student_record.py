@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Test Student Record - slotted students, cheating ring buffer, memory report
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services.exam_session_service import ExamSession, ExamSessionManager
+from services.exam_session_store import ExamSessionStore
+from services.student_record import CheatingLog, StudentRecord
+
+
+def test_student_record_is_slotted():
+    """Students are slotted records with float timestamps"""
+    print("🧱 Testing student record...")
+    session = ExamSession(1, 'teacher_1', 'A.txt', 'A')
+    student_id = session.add_student('Dana', 'Levi')
+    student = session.get_student(student_id)
+
+    assert isinstance(student, StudentRecord) and not hasattr(student, '__dict__')
+    assert isinstance(student.start_time, float)
+    assert student['first_name'] == 'Dana' and student.get('missing', 7) == 7
+
+    session.submit_student_exam(student_id, {'Q1': 'a'}, 90)
+    assert student.status == 'completed' and student.time_spent >= 0
+    assert student.end_datetime >= student.start_datetime
+    print("  ✓ No per-instance dict, timestamps are floats")
+
+
+def test_attribute_and_mapping_access():
+    """Attributes and student['key'] give the same values, properties included"""
+    print("\n🔑 Testing student access...")
+    session = ExamSession(1, 'teacher_1', 'A.txt', 'A')
+    student_id = session.add_student('Dana', 'Levi')
+    session.log_cheating_attempt(student_id, 'focus_lost', {'count': 1})
+    session.autosave_answers(student_id, 2, {'Q1': 'b'})
+    student = session.get_student(student_id)
+
+    assert student.first_name == student['first_name'] == 'Dana'
+    assert student.answers == student['answers'] == {'Q1': 'b'}
+    assert student.autosave_seq == student['autosave_seq'] == 2
+    assert student.cheating_attempts == student['cheating_attempts'] == 1
+    assert student.cheating_log[0] == student['cheating_log'][0]
+    assert student.cheating_log[0]['details'] == {'count': 1}
+    try:
+        student['missing']
+        assert False, 'KeyError expected'
+    except KeyError:
+        pass
+    print("  ✓ Same values both ways, unknown key is a KeyError")
+
+
+def test_cheating_ring_buffer():
+    """Only the newest events are kept, the count covers all of them"""
+    print("\n🔁 Testing cheating ring buffer...")
+    log = CheatingLog(capacity=3)
+    start = time.time()
+    for i in range(5):
+        log.append(start + i, ''.join(['focus', '_lost']), {'n': i})
+
+    assert len(log) == 3 and log.total == 5
+    assert [event['details']['n'] for event in log] == [2, 3, 4]
+    assert log[0]['details'] == {'n': 2} and log[-1]['details'] == {'n': 4}
+    assert log._types[0] is log._types[1]  # Interned - one string for all events
+    print("  ✓ 3 of 5 events kept, oldest first")
+
+
+def test_reload_keeps_newest_and_total():
+    """Reloading from the store fills the ring buffer with the newest events"""
+    print("\n🗄️ Testing reload with cap...")
+    store = ExamSessionStore(os.path.join(tempfile.mkdtemp(), 'sessions.db'))
+    manager = ExamSessionManager(store=store)
+    exam_id = manager.start_exam('teacher_1', 'A.txt', 'A')
+    session = manager.get_session(exam_id)
+    student_id = session.add_student('Dana', 'Levi')
+    session.log_cheating_attempts(student_id, [('focus_lost', {'n': i}, None) for i in range(250)])
+
+    student = ExamSessionManager(store=store).get_session(exam_id).get_student(student_id)
+    assert student.cheating_attempts == 250
+    assert len(student.cheating_log) == 200  # CHEATING_LOG_MAX_EVENTS
+    assert student.cheating_log[0]['details'] == {'n': 50}
+    print("  ✓ 250 counted, newest 200 kept")
+
+
+def test_memory_report():
+    """Report covers students, cheating logs and the payload cache"""
+    print("\n📏 Testing memory report...")
+    session = ExamSession(1, 'teacher_1', 'A.txt', 'A')
+    empty = session.memory_report()
+    for i in range(100):
+        student_id = session.add_student(f'Student{i}', 'Test')
+        session.log_cheating_attempt(student_id, 'focus_lost')
+
+    report = session.memory_report()
+    assert report['students'] == 100 and report['cheating_events_total'] == 100
+    assert report['student_bytes'] > empty['student_bytes'] and report['cheating_log_bytes'] > 0
+    assert report['total_bytes'] == (report['student_bytes'] + report['cheating_log_bytes']
+                                     + report['payload_cache_bytes'])
+    print(f"  ✓ 100 students ≈ {report['total_bytes'] // 1024} KB")
+
+
+if __name__ == '__main__':
+    print("=" * 60)
+    print("STUDENT RECORD TEST")
+    print("=" * 60)
+
+    test_student_record_is_slotted()
+    test_attribute_and_mapping_access()
+    test_cheating_ring_buffer()
+    test_reload_keeps_newest_and_total()
+    test_memory_report()
+
+    print("\n" + "=" * 60)
+    print("✅ ALL TESTS PASSED")
+    print("=" * 60)
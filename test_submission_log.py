@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Test Submission Log - structured submissions.jsonl per results folder
+"""
+
+import json
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services.answer_key import AnswerKey
+from services.submission_log import (
+    SCHEMA_VERSION, build_submission_record, dumps_record, iter_submissions,
+    count_submissions, submissions_path
+)
+
+QA_DICT = {
+    'What is 2+2?': '4',
+    'Capital of France?': 'Paris',
+    'Write a function': 'Programming task:'
+}
+QUESTIONS = [{'text': text} for text in QA_DICT]
+STUDENT = {'first_name': 'Dana', 'last_name': 'Levi', 'time_spent': 323.5, 'cheating_attempts': 2}
+
+
+def test_record_fields():
+    """Numeric fields and per-question correctness"""
+    print("🧾 Testing submission record...")
+    answers = {'What is 2+2?': ' 4 ', 'Capital of France?': 'Rome'}
+    record = build_submission_record(
+        'exam1', 'stu1', STUDENT, 50, answers, QUESTIONS, AnswerKey(QA_DICT),
+        submitted_at=1760000000.0, submit_time='10-00-00',
+        device_info={'ip_address': '10.0.0.1', 'screen_resolution': '1920x1080'}
+    )
+
+    assert record['schema_version'] == SCHEMA_VERSION
+    assert record['score'] == 50 and record['pending_review'] is False
+    assert record['time_spent_seconds'] == 323.5
+    assert record['cheating_attempts'] == 2
+    assert record['device']['ip_address'] == '10.0.0.1'
+    assert [(q['id'], q['correct']) for q in record['questions']] == [(0, True), (1, False), (2, None)]
+    assert record['questions'][2]['answer'] is None
+
+    pending = build_submission_record(
+        'exam1', 'stu2', STUDENT, -1, {}, QUESTIONS, AnswerKey(QA_DICT),
+        submitted_at=1760000000.0, submit_time='10-00-01'
+    )
+    assert pending['score'] is None and pending['pending_review'] is True
+    print("  ✓ Score, seconds, cheat count and correctness stored")
+
+
+def test_log_roundtrip():
+    """One JSON line per submission; cut-off and future-schema lines skipped"""
+    print("\n📚 Testing log reading...")
+    folder = tempfile.mkdtemp()
+    assert count_submissions(folder) is None
+    assert list(iter_submissions(folder)) == []
+
+    record = build_submission_record(
+        'exam1', 'stu1', STUDENT, 100, {'What is 2+2?': '4'}, QUESTIONS[:1], AnswerKey(QA_DICT),
+        submitted_at=1760000000.0, submit_time='10-00-00'
+    )
+    with open(submissions_path(folder), 'w', encoding='utf-8') as f:
+        f.write(dumps_record(record))
+        f.write(json.dumps({'schema_version': SCHEMA_VERSION + 1}) + '\n')
+        f.write('{"schema_version": 1, "first_na')  # Crash mid-write
+
+    assert dumps_record(record).count('\n') == 1
+    assert list(iter_submissions(folder)) == [record]
+    assert count_submissions(folder) == 1  # Same records as iter_submissions
+    print("  ✓ Valid records streamed back")
+
+
+if __name__ == '__main__':
+    print("=" * 60)
+    print("SUBMISSION LOG TEST")
+    print("=" * 60)
+
+    test_record_fields()
+    test_log_roundtrip()
+
+    print("\n" + "=" * 60)
+    print("✅ ALL TESTS PASSED")
+    print("=" * 60)
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Test Translation Registry - bundles loaded once, hot reload, ETags
+"""
+
+import json
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services.translation_service import TranslationRegistry, RESULTS_PAGE_STRINGS
+
+
+def _write_bundle(folder, language, data):
+    with open(os.path.join(folder, f'{language}.json'), 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+
+
+def test_bundle_loaded_once_and_hot_reloaded():
+    """Same file version returns the same bundle, edits are picked up"""
+    print("🌐 Testing translation bundles...")
+    folder = tempfile.mkdtemp()
+    _write_bundle(folder, 'he', {'your_answers': 'התשובות שלך:'})
+    registry = TranslationRegistry(folder)
+
+    first = registry.get_bundle('he')
+    assert registry.get_bundle('he') is first
+    assert json.loads(first.body.decode('utf-8')) == {'your_answers': 'התשובות שלך:'}
+
+    _write_bundle(folder, 'he', {'your_answers': 'התשובות שלך:', 'your_grade_is': 'הציון שלך הוא'})
+    second = registry.get_bundle('he')
+    assert second is not first
+    assert second.etag != first.etag
+    print("  ✓ Cached per version, reloaded on change, new ETag")
+
+
+def test_results_page_table():
+    """Pre-resolved table falls back to English per key and when file is missing"""
+    print("\n📋 Testing results page strings...")
+    folder = tempfile.mkdtemp()
+    _write_bundle(folder, 'ru', {'your_grade_is': 'Ваша оценка'})
+    registry = TranslationRegistry(folder)
+
+    table = registry.resolve_table('ru', 'results_page', RESULTS_PAGE_STRINGS)
+    assert table['your_grade_is'] == 'Ваша оценка'
+    assert table['your_answers'] == 'Your Answers:'
+    assert registry.resolve_table('ru', 'results_page', RESULTS_PAGE_STRINGS) is table
+
+    assert registry.resolve_table('en', 'results_page', RESULTS_PAGE_STRINGS) == RESULTS_PAGE_STRINGS
+    print("  ✓ Resolved once, English fallbacks kept")
+
+
+if __name__ == '__main__':
+    print("=" * 60)
+    print("TRANSLATION REGISTRY TEST")
+    print("=" * 60)
+
+    test_bundle_loaded_once_and_hot_reloaded()
+    test_results_page_table()
+
+    print("\n" + "=" * 60)
+    print("✅ ALL TESTS PASSED")
+    print("=" * 60)
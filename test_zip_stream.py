@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Test ZIP Stream - streamed result downloads and archive cache
+"""
+
+import io
+import os
+import sys
+import tempfile
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services.zip_stream_service import ZipArchiveCache, list_zip_entries, stream_zip
+
+
+def _make_folder():
+    folder = tempfile.mkdtemp()
+    with open(os.path.join(folder, 'GRADES.txt'), 'w', encoding='utf-8') as f:
+        f.write("Dana Levi | Score: 90%\n" * 500)
+    with open(os.path.join(folder, 'דנה_לוי.html'), 'w', encoding='utf-8') as f:
+        f.write("<h1>90 %</h1>")
+    os.makedirs(os.path.join(folder, 'files'))
+    with open(os.path.join(folder, 'files', 'photo.png'), 'wb') as f:
+        f.write(os.urandom(5000))
+    return folder
+
+
+def test_stream_zip_valid_archive():
+    """Streamed chunks form a valid archive with the right compression per file"""
+    print("🗜  Testing streamed ZIP...")
+    folder = _make_folder()
+    chunks = list(stream_zip(list_zip_entries(folder), store_max_size=1024))
+    assert len(chunks) > 1
+
+    with zipfile.ZipFile(io.BytesIO(b''.join(chunks))) as zipf:
+        assert zipf.testzip() is None
+        infos = {info.filename: info for info in zipf.infolist()}
+        assert set(infos) == {'GRADES.txt', 'דנה_לוי.html', 'files/photo.png'}
+        assert infos['GRADES.txt'].compress_type == zipfile.ZIP_DEFLATED
+        assert infos['דנה_לוי.html'].compress_type == zipfile.ZIP_STORED
+        assert infos['files/photo.png'].compress_type == zipfile.ZIP_STORED
+        assert zipf.read('דנה_לוי.html') == "<h1>90 %</h1>".encode('utf-8')
+    print("  ✓ Valid archive, small/compressed files stored")
+
+
+def test_archive_cache_until_folder_changes():
+    """Archive is reused until a file in the folder changes"""
+    print("\n🗄  Testing archive cache...")
+    folder = _make_folder()
+    cache = ZipArchiveCache(tempfile.mkdtemp())
+
+    entries = list_zip_entries(folder)
+    assert cache.get(folder, entries) is None
+    streamed = b''.join(cache.stream(folder, entries))
+    cached_path = cache.get(folder, list_zip_entries(folder))
+    with open(cached_path, 'rb') as f:
+        assert f.read() == streamed
+
+    # New submission -> new signature -> rebuilt, old archive removed
+    with open(os.path.join(folder, 'GRADES.txt'), 'a', encoding='utf-8') as f:
+        f.write("Noa Cohen | Score: 80%\n")
+    entries = list_zip_entries(folder)
+    assert cache.get(folder, entries) is None
+    b''.join(cache.stream(folder, entries))
+    assert len(os.listdir(cache.cache_dir)) == 1
+
+    # Abandoned download leaves nothing behind
+    other = _make_folder()
+    generator = cache.stream(other, list_zip_entries(other))
+    next(generator)
+    generator.close()
+    assert len(os.listdir(cache.cache_dir)) == 1
+
+    cache.invalidate(folder)
+    assert os.listdir(cache.cache_dir) == []
+    print("  ✓ Cached, rebuilt on change, partial archives discarded")
+
+
+if __name__ == '__main__':
+    print("=" * 60)
+    print("ZIP STREAM TEST")
+    print("=" * 60)
+
+    test_stream_zip_valid_archive()
+    test_archive_cache_until_folder_changes()
+
+    print("\n" + "=" * 60)
+    print("✅ ALL TESTS PASSED")
+    print("=" * 60)